@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""基准：200 个合成 skill 下，每轮对话构建 skills 上下文的开销
+
+对比：
+  cold  每轮清空索引（等价于旧实现：遍历目录、读取并 YAML 解析全部 SKILL.md）
+  warm  索引命中（只 stat 目录与 SKILL.md）
+
+用法: python scripts/bench_skills_catalog.py [skill 数量] [轮数]
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from agent_skills import loader  # noqa: E402
+from agent_skills.catalog import get_skill_catalog  # noqa: E402
+
+_BODY = "## 用法\n\n" + "按步骤执行脚本，处理参数并回传错误信息。\n" * 60
+
+
+def _make_skills(base: Path, n: int) -> None:
+    for i in range(n):
+        d = base / f"skill-{i:03d}"
+        d.mkdir(parents=True)
+        (d / "SKILL.md").write_text(
+            f"---\nname: skill-{i:03d}\ndescription: 合成 skill {i}，用于基准测试目录索引\n"
+            f"license: MIT\n---\n\n# Skill {i}\n\n{_BODY}",
+            encoding="utf-8",
+        )
+
+
+def _bench(label: str, rounds: int, before_each=None) -> float:
+    t0 = time.perf_counter()
+    for _ in range(rounds):
+        if before_each:
+            before_each()
+        loader.get_agent_skill_context()
+    per_turn = (time.perf_counter() - t0) / rounds * 1000
+    print(f"  {label:<6} {per_turn:8.3f} ms/轮")
+    return per_turn
+
+
+def main() -> int:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    with tempfile.TemporaryDirectory() as tmp:
+        base = Path(tmp) / "skills"
+        _make_skills(base, n)
+        loader._get_skill_directories = lambda: [base]
+        catalog = get_skill_catalog()
+        print(f"=== {n} 个 skill，{rounds} 轮 ===")
+        cold = _bench("cold", rounds, before_each=catalog.invalidate)
+        catalog.refresh([base])
+        warm = _bench("warm", rounds)
+        print(f"  加速   {cold / warm:8.1f}x")
+
+        # 智能体新建的 skill 下一轮即可见
+        d = base / "agent-new"
+        d.mkdir()
+        (d / "SKILL.md").write_text("---\nname: agent-new\ndescription: 新建\n---\n", encoding="utf-8")
+        names = [s["name"] for s in loader.discover_skills()]
+        print(f"  新增 skill 已发现: {'agent-new' in names}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""基准：语音识别端到端延迟 —— 临时 WAV 文件 vs 内存 numpy 直传
+
+对 1s / 5s / 30s 片段分别测量：
+  wav     旧路径：写 NamedTemporaryFile WAV → model.generate(input=path) → 删除
+  memory  新路径：int16 → float32 向量化转换 → model.generate(input=ndarray)
+
+用法: python scripts/bench_stt.py [音频.wav] [重复次数]
+  不给音频时使用合成信号（识别结果可能为空，但仍走完整推理路径）；
+  给出 16k 单声道 WAV 时循环/截取到各目标时长。
+依赖: pip install funasr modelscope（未安装时仅测量格式转换开销）
+"""
+
+import os
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from voice import stt  # noqa: E402
+
+FS = 16000
+DURATIONS = (1, 5, 30)
+
+
+def _source(path: str | None) -> np.ndarray:
+    if path:
+        with wave.open(path, "rb") as w:
+            if w.getframerate() != FS or w.getnchannels() != 1 or w.getsampwidth() != 2:
+                raise SystemExit("请提供 16kHz 单声道 16bit WAV")
+            return np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16)
+    # 合成：带包络的多谐波，近似语音能量分布
+    t = np.arange(FS * 3, dtype=np.float32) / FS
+    sig = sum(np.sin(2 * np.pi * f * t) / i for i, f in enumerate((180, 360, 720, 1440), 1))
+    env = 0.5 * (1 + np.sin(2 * np.pi * 3 * t))
+    return (sig * env * 6000).astype(np.int16)
+
+
+def _clip(src: np.ndarray, seconds: int) -> np.ndarray:
+    n = seconds * FS
+    return np.resize(src, n).reshape(-1, 1)  # 与 sounddevice 录音同形 (n, 1)
+
+
+def _via_wav(model, rec: np.ndarray) -> None:
+    with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
+        path = f.name
+    try:
+        with wave.open(path, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(FS)
+            w.writeframes(rec.tobytes())
+        model.generate(input=path, batch_size_s=0)
+    finally:
+        os.unlink(path)
+
+
+def _via_memory(model, rec: np.ndarray) -> None:
+    model.generate(input=stt._to_float32(rec), fs=FS, batch_size_s=0)
+
+
+def _time(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000
+
+
+def main() -> int:
+    path = sys.argv[1] if len(sys.argv) > 1 else None
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    src = _source(path)
+
+    print("=== 格式转换（int16 → float32） ===")
+    for sec in DURATIONS:
+        rec = _clip(src, sec)
+        ms = _time(lambda: stt._to_float32(rec), 20)
+        print(f"  {sec:>3}s  {ms:8.3f} ms")
+
+    if not stt.preload_funasr_model():
+        print("FunASR 不可用，跳过端到端对比（pip install funasr modelscope）")
+        return 0
+    model = stt._funasr_model
+    _via_memory(model, _clip(src, 1))  # 预热
+
+    print(f"=== 端到端识别（取 {repeat} 次最优） ===")
+    print(f"  {'时长':>4}  {'wav(ms)':>10}  {'memory(ms)':>10}  {'节省':>8}")
+    for sec in DURATIONS:
+        rec = _clip(src, sec)
+        a = _time(lambda: _via_wav(model, rec), repeat)
+        b = _time(lambda: _via_memory(model, rec), repeat)
+        print(f"  {sec:>3}s  {a:10.1f}  {b:10.1f}  {a - b:7.1f}ms")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""基准：STT 后端对比 —— torch（funasr AutoModel） vs onnx（int8 量化 Paraformer + ONNX Runtime）
+
+每个后端在独立子进程中测量，互不影响：
+  加载耗时   构建模型（含 VAD / 标点）所需时间
+  常驻内存   加载后与识别后的 RSS（峰值）
+  RTF       识别耗时 / 音频时长（越小越快），对 5s / 30s 片段分别测量
+
+用法: python scripts/bench_stt_backends.py [音频.wav] [--threads N]
+依赖: torch 后端 pip install funasr modelscope torchaudio；onnx 后端 pip install funasr-onnx onnxruntime
+"""
+
+import json
+import resource
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+FS = 16000
+BACKENDS = ("torch", "onnx")
+
+
+def _rss_mb() -> float:
+    """当前 RSS（Linux 读 /proc），否则退回峰值 RSS"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * resource.getpagesize() / 2**20
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if sys.platform == "darwin" else peak / 1024
+
+
+def _clip(src: np.ndarray | None, seconds: int) -> np.ndarray:
+    if src is None:
+        t = np.arange(seconds * FS, dtype=np.float32) / FS
+        src = (np.sin(2 * np.pi * 200 * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 3 * t)) * 6000).astype(np.int16)
+    return np.resize(src, seconds * FS)
+
+
+def _child(backend: str, wav: str | None, threads: int) -> dict:
+    from voice import stt
+
+    cfg = stt._get_stt_config()
+    cfg["backend"] = backend
+    cfg.setdefault("onnx", {})["intra_op_threads"] = threads
+    stt._get_stt_config = lambda: cfg
+    src = None
+    if wav:
+        import wave
+        with wave.open(wav, "rb") as w:
+            src = np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16)
+
+    rss0 = _rss_mb()
+    t0 = time.perf_counter()
+    if not stt.preload_local_model():
+        return {"backend": backend, "error": "不可用"}
+    load_s = time.perf_counter() - t0
+    rss_loaded = _rss_mb()
+    model = stt._funasr_model
+    model.generate(input=stt._to_float32(_clip(src, 1)), fs=FS, batch_size_s=0)  # 预热
+    rtf = {}
+    for sec in (5, 30):
+        audio = stt._to_float32(_clip(src, sec))
+        t0 = time.perf_counter()
+        model.generate(input=audio, fs=FS, batch_size_s=0)
+        rtf[f"{sec}s"] = round((time.perf_counter() - t0) / sec, 4)
+    return {
+        "backend": backend,
+        "load_s": round(load_s, 2),
+        "rss_loaded_mb": round(rss_loaded - rss0, 1),
+        "rss_after_mb": round(_rss_mb(), 1),
+        "rtf": rtf,
+    }
+
+
+def main() -> int:
+    args = sys.argv[1:]
+    threads = 4
+    if "--threads" in args:
+        i = args.index("--threads")
+        threads = int(args[i + 1])
+        del args[i:i + 2]
+    if args and args[0] == "--child":
+        print(json.dumps(_child(args[1], args[2] or None, threads)))
+        return 0
+    wav = args[0] if args else ""
+    print(f"=== STT 后端对比（intra_op_threads={threads}） ===")
+    print(f"  {'后端':<6} {'加载(s)':>8} {'模型内存(MB)':>12} {'RSS(MB)':>9} {'RTF 5s':>8} {'RTF 30s':>8}")
+    for backend in BACKENDS:
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", backend, wav, "--threads", str(threads)],
+            capture_output=True, text=True,
+        )
+        try:
+            r = json.loads(out.stdout.strip().splitlines()[-1])
+        except (IndexError, ValueError):
+            r = {"backend": backend, "error": (out.stderr.strip().splitlines() or ["失败"])[-1]}
+        if "error" in r:
+            print(f"  {backend:<6} {r['error']}")
+            continue
+        print(
+            f"  {backend:<6} {r['load_s']:>8} {r['rss_loaded_mb']:>12} {r['rss_after_mb']:>9} "
+            f"{r['rtf']['5s']:>8} {r['rtf']['30s']:>8}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
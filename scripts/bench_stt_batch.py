@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""基准：批量转写吞吐 —— 每 CPU 分钟能处理多少小时音频
+
+对比逐个 generate（max_batch=1）与合批 generate（max_batch=N），统计：
+  音频时长合计 / 进程 CPU 时间（含推理线程）→ 小时音频 / CPU 分钟
+  墙钟耗时与实时率
+
+用法: python scripts/bench_stt_batch.py [WAV 目录] [文件数] [批大小]
+  不给目录时合成 10–30s 的测试音频（识别结果可能为空，但推理路径完整）
+依赖: pip install funasr modelscope
+"""
+
+import sys
+import tempfile
+import time
+import wave
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+from voice import stt  # noqa: E402
+from voice.stt_batch import STTBatcher  # noqa: E402
+
+FS = 16000
+
+
+def _synth(dirpath: Path, n: int) -> list[Path]:
+    rng = np.random.default_rng(0)
+    out = []
+    for i in range(n):
+        sec = int(rng.integers(10, 31))
+        t = np.arange(sec * FS, dtype=np.float32) / FS
+        sig = np.sin(2 * np.pi * 200 * t) * (0.5 + 0.5 * np.sin(2 * np.pi * 2 * t))
+        p = dirpath / f"clip{i:03d}.wav"
+        with wave.open(str(p), "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(FS)
+            w.writeframes((sig * 6000).astype(np.int16).tobytes())
+        out.append(p)
+    return out
+
+
+def _run(files: list[Path], max_batch: int) -> None:
+    batcher = STTBatcher(max_batch=max_batch, wait_ms=200)
+    cpu0, wall0 = time.process_time(), time.perf_counter()
+    futs = [batcher.submit(p) for p in files]
+    results = [f.result() for f in futs]
+    cpu = time.process_time() - cpu0
+    wall = time.perf_counter() - wall0
+    audio = sum(r["duration"] or 0 for r in results)
+    print(
+        f"  max_batch={max_batch:<3} 批次 {batcher.batches:>3}  音频 {audio / 60:6.1f} min  "
+        f"墙钟 {wall:6.1f}s  CPU {cpu:6.1f}s  "
+        f"吞吐 {audio / 3600 / (cpu / 60):6.2f} h音频/CPU分钟  RTF {wall / audio:.4f}"
+    )
+
+
+def main() -> int:
+    src = Path(sys.argv[1]) if len(sys.argv) > 1 else None
+    n = int(sys.argv[2]) if len(sys.argv) > 2 else 16
+    batch = int(sys.argv[3]) if len(sys.argv) > 3 else 16
+    if stt.get_offline_model() is None:
+        print("FunASR 不可用（pip install funasr modelscope）")
+        return 1
+    with tempfile.TemporaryDirectory() as tmp:
+        files = sorted(src.glob("*.wav"))[:n] if src else _synth(Path(tmp), n)
+        print(f"=== {len(files)} 个文件 ===")
+        _run(files[:2], 2)  # 预热
+        _run(files, 1)
+        _run(files, batch)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
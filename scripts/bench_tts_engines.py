@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""基准：TTS 引擎对比 —— edge（edge-tts 在线） vs piper（本地 ONNX VITS）
+
+对每条测试语句测量：
+  首块延迟   调用 stream() 到收到第一块音频（即前端最早可开始播放的时间）
+  总耗时     整段合成完成
+  RTF       总耗时 / 音频时长（越小越快，<1 即快于实时）
+本地引擎另报告模型加载耗时（首次合成前单独计时，不计入各句）。
+
+用法: python scripts/bench_tts_engines.py [edge piper ...] [--rounds N]
+依赖: edge 需 pip install edge-tts 且联网；piper 需 pip install piper-tts 并在 config tts.piper.model 配置模型
+"""
+
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+PHRASES = [
+    "好的。",
+    "抱歉，我没有理解你的问题。",
+    "今天北京晴，最高气温二十六度，最低十五度，适合外出，记得带上水杯。",
+    "知式是一个桌面智能体，支持语音对话、调用工具，并通过数字形象实时播报回复内容，"
+    "长回复会按句切分后并发合成，再按顺序播放。",
+]
+
+
+async def _measure(engine, text: str, voice: str, rate: str) -> dict:
+    t0 = time.perf_counter()
+    first = None
+    parts = []
+    async for b in engine.stream(text, voice, rate):
+        if first is None:
+            first = time.perf_counter() - t0
+        parts.append(b)
+    total = time.perf_counter() - t0
+    data = engine.finalize(b"".join(parts))
+    audio_s = engine.audio_seconds(data) if data else 0.0
+    return {
+        "first_ms": (first or total) * 1000,
+        "total_ms": total * 1000,
+        "audio_s": audio_s,
+        "rtf": total / audio_s if audio_s else float("inf"),
+    }
+
+
+async def _bench(name: str, rounds: int) -> None:
+    from voice.tts import _get_rate, _get_voice
+    from voice.tts_engines import get_tts_engine
+
+    print(f"\n== {name} ==")
+    try:
+        engine = get_tts_engine(name)
+    except Exception as e:
+        print(f"  不可用: {e}")
+        return
+    if hasattr(engine, "load"):
+        t0 = time.perf_counter()
+        try:
+            await asyncio.to_thread(engine.load)
+        except Exception as e:
+            print(f"  模型加载失败: {e}")
+            return
+        print(f"  模型加载 {(time.perf_counter() - t0) * 1000:.0f} ms")
+    voice, rate = _get_voice(), _get_rate()
+    print(f"  {'字数':>4} {'首块ms':>8} {'总耗时ms':>9} {'音频s':>6} {'RTF':>6}")
+    for text in PHRASES:
+        rows = []
+        for _ in range(rounds):
+            try:
+                rows.append(await _measure(engine, text, voice, rate))
+            except Exception as e:
+                print(f"  {len(text):>4} 失败: {e}")
+                break
+        if not rows:
+            continue
+        avg = {k: sum(r[k] for r in rows) / len(rows) for k in rows[0]}
+        print(f"  {len(text):>4} {avg['first_ms']:>8.0f} {avg['total_ms']:>9.0f} "
+              f"{avg['audio_s']:>6.2f} {avg['rtf']:>6.3f}")
+
+
+def main() -> None:
+    args = sys.argv[1:]
+    rounds = 3
+    if "--rounds" in args:
+        i = args.index("--rounds")
+        rounds = max(1, int(args[i + 1]))
+        del args[i:i + 2]
+    for name in args or ["edge", "piper"]:
+        asyncio.run(_bench(name, rounds))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""预压缩形象静态资源 —— 为 assets/avatar 下的模型配置、动作与页面生成同目录的 .gz / .br
+
+形象 HTTP 服务在客户端接受对应编码、且预压缩文件不旧于原文件时直接下发（Content-Encoding），
+请求时不做压缩计算。贴图（PNG）本身已压缩，不处理；压缩后节省不到 10% 的文件也跳过。
+原文件更新后重新运行即可（预压缩文件比原文件旧时服务端不会使用）。
+
+用法: python scripts/precompress_avatar_assets.py [--clean]
+依赖: .br 需 pip install brotli（未安装时只生成 .gz）
+"""
+
+import gzip
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+AVATAR_DIR = ROOT / "assets" / "avatar"
+
+SUFFIXES = {".html", ".js", ".css", ".json", ".moc", ".mtn"}
+MIN_SIZE = 1024
+MIN_SAVING = 0.10
+
+
+def _targets():
+    for p in sorted(AVATAR_DIR.rglob("*")):
+        if not p.is_file() or p.suffix.lower() not in SUFFIXES:
+            continue
+        if "tts" in p.relative_to(AVATAR_DIR).parts:
+            continue
+        yield p
+
+
+def _write(dst: Path, data: bytes) -> None:
+    tmp = dst.with_name(dst.name + ".tmp")
+    tmp.write_bytes(data)
+    tmp.replace(dst)
+
+
+def main() -> int:
+    if "--clean" in sys.argv[1:]:
+        n = 0
+        for p in _targets():
+            for suffix in (".gz", ".br"):
+                alt = p.with_name(p.name + suffix)
+                if alt.exists():
+                    alt.unlink()
+                    n += 1
+        print(f"已删除 {n} 个预压缩文件")
+        return 0
+
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+        print("未安装 brotli，只生成 .gz（pip install brotli）")
+
+    total_raw = total_gz = total_br = files = 0
+    for p in _targets():
+        raw = p.read_bytes()
+        if len(raw) < MIN_SIZE:
+            continue
+        variants = [(".gz", gzip.compress(raw, compresslevel=9, mtime=0))]
+        if brotli is not None:
+            variants.append((".br", brotli.compress(raw, quality=11)))
+        wrote = False
+        for suffix, data in variants:
+            alt = p.with_name(p.name + suffix)
+            if len(data) > len(raw) * (1 - MIN_SAVING):
+                alt.unlink(missing_ok=True)  # 不值得压缩，清掉旧版本以免下发过期内容
+                continue
+            _write(alt, data)
+            wrote = True
+            if suffix == ".gz":
+                total_gz += len(data)
+            else:
+                total_br += len(data)
+        if wrote:
+            files += 1
+            total_raw += len(raw)
+
+    print(f"预压缩 {files} 个文件：原始 {total_raw / 1024:.0f} KB，gzip {total_gz / 1024:.0f} KB"
+          + (f"，brotli {total_br / 1024:.0f} KB" if brotli is not None else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,4 +1,24 @@
 """Agent Skills - SKILL.md 动态加载（anthropics/skills 格式）"""
-from agent_skills.loader import get_agent_skill_context, get_writable_skills_dir, discover_skills
+from agent_skills.catalog import SkillCatalog, get_skill_catalog
+from agent_skills.loader import (
+    get_agent_skill_context,
+    get_writable_skills_dir,
+    discover_skills,
+    get_skill_tools,
+    load_skill,
+    rank_skills,
+)
+from agent_skills.index import SkillIndex, tokenize
 
-__all__ = ["get_agent_skill_context", "get_writable_skills_dir", "discover_skills"]
+__all__ = [
+    "get_agent_skill_context",
+    "get_writable_skills_dir",
+    "discover_skills",
+    "get_skill_tools",
+    "load_skill",
+    "rank_skills",
+    "SkillIndex",
+    "tokenize",
+    "SkillCatalog",
+    "get_skill_catalog",
+]
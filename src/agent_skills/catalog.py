@@ -0,0 +1,126 @@
+"""Skills 目录索引 - 缓存解析后的 SKILL.md，按 (path, mtime, size) 增量刷新
+
+每轮对话都要列出 skills，但 SKILL.md 几乎不变。索引只对目录和 SKILL.md 做 stat：
+- skills 根目录 mtime 未变 → 复用上次的子目录列表（新建/删除子目录会改变根目录 mtime）
+- 每个子目录的 SKILL.md 单独 stat，(mtime_ns, size) 未变 → 复用解析结果
+智能体在已有子目录里补写 SKILL.md 也会被下一次 refresh 发现，无需重启或手动失效。
+"""
+
+import os
+import stat
+import threading
+from pathlib import Path
+
+
+def parse_frontmatter(content: str) -> tuple[dict, str]:
+    """解析 YAML frontmatter 与 Markdown body"""
+    body = content
+    meta = {}
+    if content.strip().startswith("---"):
+        parts = content.split("---", 2)
+        if len(parts) >= 3:
+            try:
+                import yaml
+                meta = yaml.safe_load(parts[1] or "{}") or {}
+            except Exception:
+                pass
+            body = (parts[2] or "").strip()
+    return meta, body
+
+
+class SkillCatalog:
+    """线程安全的 skills 索引；version 在任一 skill 新增/修改/删除时递增"""
+
+    def __init__(self) -> None:
+        self._dirs: dict[str, tuple[int, list[str]]] = {}
+        self._entries: dict[str, dict] = {}
+        self._lock = threading.Lock()
+        self.version = 0
+
+    def invalidate(self) -> None:
+        """丢弃全部缓存，下次 refresh 重新读取"""
+        with self._lock:
+            self._dirs.clear()
+            self._entries.clear()
+            self.version += 1
+
+    def _children(self, base: Path) -> list[str] | None:
+        try:
+            mtime = os.stat(base).st_mtime_ns
+        except OSError:
+            return None
+        key = str(base)
+        cached = self._dirs.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            with os.scandir(base) as it:
+                names = sorted(
+                    e.name for e in it if not e.name.startswith(".") and e.is_dir()
+                )
+        except OSError:
+            return None
+        self._dirs[key] = (mtime, names)
+        return names
+
+    def _load(self, md: Path, dir_name: str, sig: tuple[int, int]) -> dict | None:
+        try:
+            content = md.read_text(encoding="utf-8")
+        except Exception:
+            return None
+        meta, body = parse_frontmatter(content)
+        if not isinstance(meta, dict):
+            meta = {}
+        return {
+            "name": meta.get("name") or dir_name,
+            "description": meta.get("description") or "",
+            "path": str(md),
+            "dir": str(md.parent),
+            "body": body,
+            "sig": sig,
+        }
+
+    def refresh(self, bases: list[Path]) -> list[dict]:
+        """按目录顺序返回全部 skill 条目（含 body）；同名子目录以先出现者为准"""
+        with self._lock:
+            out: list[dict] = []
+            seen: set[str] = set()
+            live: set[str] = set()
+            for base in bases:
+                names = self._children(base)
+                if not names:
+                    continue
+                for dir_name in names:
+                    if dir_name in seen:
+                        continue
+                    md = base / dir_name / "SKILL.md"
+                    try:
+                        st = os.stat(md)
+                    except OSError:
+                        continue
+                    if not stat.S_ISREG(st.st_mode):
+                        continue
+                    key = str(md)
+                    sig = (st.st_mtime_ns, st.st_size)
+                    entry = self._entries.get(key)
+                    if entry is None or entry["sig"] != sig:
+                        entry = self._load(md, dir_name, sig)
+                        if entry is None:
+                            self._entries.pop(key, None)
+                            continue
+                        self._entries[key] = entry
+                        self.version += 1
+                    seen.add(dir_name)
+                    live.add(key)
+                    out.append(entry)
+            for key in [k for k in self._entries if k not in live]:
+                del self._entries[key]
+                self.version += 1
+            return out
+
+
+_catalog = SkillCatalog()
+
+
+def get_skill_catalog() -> SkillCatalog:
+    return _catalog
@@ -0,0 +1,183 @@
+"""Skills 相关度检索 - BM25 倒排索引（中英文混合分词）
+
+对 skill 名称、描述、正文建立倒排索引，按当前用户消息取 top-k，仅向模型展示相关 skills。
+索引持久化到 data/skill_index.json，按 SKILL.md 的 (mtime, size) 增量更新：
+新增/修改的 skill 重新分词，删除的 skill 从倒排表移除，其余不动。
+"""
+
+import json
+import math
+import os
+import re
+import tempfile
+import threading
+from collections import Counter
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_INDEX_PATH = ROOT / "data" / "skill_index.json"
+
+_INDEX_VERSION = 1
+_K1 = 1.5
+_B = 0.75
+# 字段权重：名称 > 描述 > 正文（以重复计数实现）
+_NAME_WEIGHT = 3
+_DESC_WEIGHT = 2
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+|[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+_CJK_RE = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]")
+
+
+def tokenize(text: str) -> list[str]:
+    """英文/数字按词切分并小写；中文连续片段切为单字 + 相邻二字组（无需分词词典）"""
+    out: list[str] = []
+    for m in _TOKEN_RE.finditer((text or "").lower()):
+        tok = m.group(0)
+        if not _CJK_RE.match(tok):
+            if len(tok) > 1 or tok.isdigit():
+                out.append(tok)
+            continue
+        out.extend(tok)
+        out.extend(tok[i:i + 2] for i in range(len(tok) - 1))
+    return out
+
+
+def _doc_terms(entry: dict) -> Counter:
+    tf: Counter = Counter()
+    for tok in tokenize(entry.get("name") or ""):
+        tf[tok] += _NAME_WEIGHT
+        # 名称再加前缀词（pptx → ppt），兼顾用户口语中的简写
+        if tok.isascii():
+            for i in range(3, len(tok)):
+                tf[tok[:i]] += _NAME_WEIGHT
+    for tok in tokenize(entry.get("description") or ""):
+        tf[tok] += _DESC_WEIGHT
+    tf.update(tokenize(entry.get("body") or ""))
+    return tf
+
+
+class SkillIndex:
+    """BM25 倒排索引；docs 以 skill 的 SKILL.md 路径为键"""
+
+    def __init__(self, path: Path | None = None) -> None:
+        self.path = Path(path) if path else None
+        self._docs: dict[str, dict] = {}
+        self._postings: dict[str, dict[str, int]] = {}
+        self._total_len = 0
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._synced_version: int | None = None
+
+    def _load(self) -> None:
+        self._loaded = True
+        if self.path is None or not self.path.exists():
+            return
+        try:
+            data = json.loads(self.path.read_text(encoding="utf-8"))
+        except Exception:
+            return
+        if data.get("version") != _INDEX_VERSION:
+            return
+        for key, doc in (data.get("docs") or {}).items():
+            self._add(key, doc["name"], tuple(doc["sig"]), Counter(doc["tf"]))
+
+    def _save(self) -> None:
+        if self.path is None:
+            return
+        data = {
+            "version": _INDEX_VERSION,
+            "docs": {
+                k: {"name": d["name"], "sig": list(d["sig"]), "tf": d["tf"]}
+                for k, d in self._docs.items()
+            },
+        }
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=self.path.parent, prefix=".skill_index-")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp, self.path)
+        except Exception:
+            pass
+
+    def _add(self, key: str, name: str, sig: tuple, tf: Counter) -> None:
+        length = sum(tf.values())
+        self._docs[key] = {"name": name, "sig": sig, "tf": dict(tf), "len": length}
+        self._total_len += length
+        for term, n in tf.items():
+            self._postings.setdefault(term, {})[key] = n
+
+    def _remove(self, key: str) -> None:
+        doc = self._docs.pop(key, None)
+        if doc is None:
+            return
+        self._total_len -= doc["len"]
+        for term in doc["tf"]:
+            posting = self._postings.get(term)
+            if posting is not None:
+                posting.pop(key, None)
+                if not posting:
+                    del self._postings[term]
+
+    def sync(self, entries: list[dict], version: int | None = None) -> bool:
+        """与 skills 索引条目对齐；version 与上次相同时直接跳过。返回是否有变更"""
+        with self._lock:
+            if not self._loaded:
+                self._load()
+            if version is not None and version == self._synced_version:
+                return False
+            changed = False
+            live = set()
+            for e in entries:
+                key = e["path"]
+                live.add(key)
+                sig = tuple(e.get("sig") or ())
+                doc = self._docs.get(key)
+                if doc is not None and doc["sig"] == sig and doc["name"] == e["name"]:
+                    continue
+                self._remove(key)
+                self._add(key, e["name"], sig, _doc_terms(e))
+                changed = True
+            for key in [k for k in self._docs if k not in live]:
+                self._remove(key)
+                changed = True
+            if changed:
+                self._save()
+            self._synced_version = version
+            return changed
+
+    def search(self, query: str, k: int = 5) -> list[tuple[str, float]]:
+        """返回 [(skill 名称, BM25 分数)]，按分数降序，仅含分数 > 0 的结果"""
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._docs)
+            if not terms or not n_docs:
+                return []
+            avgdl = self._total_len / n_docs or 1.0
+            scores: dict[str, float] = {}
+            for term in terms:
+                posting = self._postings.get(term)
+                if not posting:
+                    continue
+                df = len(posting)
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                for key, tf in posting.items():
+                    dl = self._docs[key]["len"]
+                    denom = tf + _K1 * (1 - _B + _B * dl / avgdl)
+                    scores[key] = scores.get(key, 0.0) + idf * tf * (_K1 + 1) / denom
+            ranked = sorted(scores.items(), key=lambda kv: (-kv[1], self._docs[kv[0]]["name"]))
+            return [(self._docs[key]["name"], score) for key, score in ranked[:k]]
+
+
+_indexes: dict[Path, SkillIndex] = {}
+_indexes_lock = threading.Lock()
+
+
+def get_skill_index(path: Path | None = None) -> SkillIndex:
+    """每个索引文件一个实例（skills.index_path 变更后使用新文件）"""
+    path = Path(path or DEFAULT_INDEX_PATH).resolve()
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = _indexes[path] = SkillIndex(path)
+        return index
@@ -1,41 +1,41 @@
 """Agent Skills 动态加载 - 符合 [Agent Skills 规范](https://agentskills.io/)
 
-支持多目录：预置 skills/ + 可写目录（智能体运行时创建）。每次调用重新扫描，实现动态加载/卸载。
+支持多目录：预置 skills/ + 可写目录（智能体运行时创建）。每次调用经索引增量刷新
+（见 agent_skills.catalog），新增/修改/删除的 skill 立即生效，未变化的不再重复读取解析。
 """
 
+import os
 from pathlib import Path
 
+from agent_skills.catalog import get_skill_catalog, parse_frontmatter as _parse_frontmatter
+from agent_skills.index import get_skill_index
+
 ROOT = Path(__file__).resolve().parents[2]
 DEFAULT_SKILLS_DIR = ROOT / "skills"
+_CONFIG_PATH = ROOT / "config" / "zhyx.yaml"
 
-
-def _parse_frontmatter(content: str) -> tuple[dict, str]:
-    """解析 YAML frontmatter 与 Markdown body"""
-    body = content
-    meta = {}
-    if content.strip().startswith("---"):
-        parts = content.split("---", 2)
-        if len(parts) >= 3:
-            try:
-                import yaml
-                meta = yaml.safe_load(parts[1] or "{}") or {}
-            except Exception:
-                pass
-            body = (parts[2] or "").strip()
-    return meta, body
+# (mtime_ns, size) -> skills 配置，配置文件未变时不重复解析 YAML
+_skills_config_cache: tuple[tuple[int, int], dict] | None = None
 
 
 def _get_skills_config() -> dict:
+    global _skills_config_cache
+    try:
+        st = os.stat(_CONFIG_PATH)
+    except OSError:
+        return {}
+    sig = (st.st_mtime_ns, st.st_size)
+    if _skills_config_cache is not None and _skills_config_cache[0] == sig:
+        return _skills_config_cache[1]
     try:
         import yaml
-        cfg = ROOT / "config" / "zhyx.yaml"
-        if cfg.exists():
-            with open(cfg, encoding="utf-8") as f:
-                d = yaml.safe_load(f) or {}
-            return d.get("skills") or {}
+        with open(_CONFIG_PATH, encoding="utf-8") as f:
+            d = yaml.safe_load(f) or {}
+        cfg = d.get("skills") or {}
     except Exception:
-        pass
-    return {}
+        return {}
+    _skills_config_cache = (sig, cfg)
+    return cfg
 
 
 def _get_skill_directories() -> list[Path]:
@@ -75,36 +75,49 @@ def _get_enabled_skills() -> list[str]:
     return []
 
 
-def discover_skills() -> list[dict]:
-    """动态发现所有 skills（每次调用重新扫描，无缓存）"""
-    out = []
-    seen = set()
+def _is_on_demand() -> bool:
+    """skills.load_mode: on_demand 时 system prompt 只放目录，正文由 load_skill 工具按需获取"""
+    return str(_get_skills_config().get("load_mode") or "inline").strip().lower() == "on_demand"
+
+
+def _get_top_k() -> int:
+    """skills.top_k > 0 时按用户消息相关度只展示前 k 个 skill"""
+    try:
+        return max(0, int(_get_skills_config().get("top_k") or 0))
+    except (TypeError, ValueError):
+        return 0
 
-    for base in _get_skill_directories():
-        if not base.is_dir():
-            continue
-        for d in sorted(base.iterdir()):
-            if not d.is_dir() or d.name.startswith("."):
-                continue
-            if d.name in seen:
-                continue
-            md = d / "SKILL.md"
-            if not md.exists() or not md.is_file():
-                continue
-            try:
-                content = md.read_text(encoding="utf-8")
-                meta, _ = _parse_frontmatter(content)
-                name = meta.get("name") or d.name
-                seen.add(d.name)
-                out.append({
-                    "name": name,
-                    "description": meta.get("description") or "",
-                    "path": str(md),
-                    "dir": str(d),
-                })
-            except Exception:
-                pass
-    return out
+
+def _skill_index():
+    """持久化的 BM25 索引，位置 skills.index_path，默认 data/skill_index.json"""
+    p = _get_skills_config().get("index_path")
+    path = None
+    if p:
+        path = Path(p).expanduser()
+        if not path.is_absolute():
+            path = ROOT / path
+    return get_skill_index(path)
+
+
+def _catalog_entries() -> list[dict]:
+    """索引中的全部 skill 条目（含 body），按目录增量刷新"""
+    return get_skill_catalog().refresh(_get_skill_directories())
+
+
+def rank_skills(query: str, k: int = 5) -> list[tuple[str, float]]:
+    """按 BM25 相关度返回与 query 最相关的 k 个 skill [(名称, 分数)]"""
+    entries = _catalog_entries()
+    index = _skill_index()
+    index.sync(entries, version=get_skill_catalog().version)
+    return index.search(query, k)
+
+
+def discover_skills() -> list[dict]:
+    """动态发现所有 skills（每次调用都会 stat 检查变更，仅重新解析变化的 SKILL.md）"""
+    return [
+        {"name": e["name"], "description": e["description"], "path": e["path"], "dir": e["dir"]}
+        for e in _catalog_entries()
+    ]
 
 
 def get_writable_skills_dir() -> Path | None:
@@ -120,18 +133,28 @@ def get_writable_skills_dir() -> Path | None:
     return default
 
 
-def get_agent_skill_context() -> str:
+def get_agent_skill_context(query: str | None = None) -> str:
     """
     动态加载并返回注入 system prompt 的 skills 上下文。
-    每次调用重新扫描目录，支持运行时新增/删除 skill。
+    每次调用经索引检查变更，支持运行时新增/删除 skill。
+    配置 skills.top_k 且传入 query（当前用户消息）时，目录只列出最相关的 top_k 个 skill，
+    inline 模式下也只注入其中 enabled 的正文。
     """
     enabled = _get_enabled_skills()
-    all_skills = discover_skills()
+    all_skills = _catalog_entries()
     if not all_skills:
         return ""
 
+    listed = all_skills
+    top_k = _get_top_k()
+    if top_k and query and query.strip() and len(all_skills) > top_k:
+        ranked = {name for name, _ in rank_skills(query, top_k)}
+        # 无相关结果时退回到 enabled 列表，避免目录为空
+        keep = ranked or set(enabled)
+        listed = [s for s in all_skills if s["name"] in keep] or all_skills[:top_k]
+
     meta_lines = ["## 可用 Skills（动态加载）\n"]
-    for s in all_skills:
+    for s in listed:
         desc = (s["description"] or "")[:150]
         meta_lines.append(f"- **{s['name']}**: {desc}{'...' if len(s.get('description', '')) > 150 else ''}")
 
@@ -144,23 +167,162 @@ def get_agent_skill_context() -> str:
             "新 Skill 会被动态加载，无需重启。"
         )
 
+    if _is_on_demand():
+        meta_lines.append(
+            "\n以上仅为目录。需要使用某个 Skill 时，先调用 `load_skill`（参数 name）获取完整说明；"
+            "说明中引用的文件（如 forms.md、reference.md）用 `load_skill`（参数 name + file）读取。"
+            "与 Skill 无关的问题无需加载。"
+        )
+        return "\n".join(meta_lines)
+
+    # 正文只注入目录中列出的（top_k 时即相关度排名内的）enabled skill
     load_bodies = len(enabled) > 0
     parts = []
-    for s in all_skills:
+    for s in listed:
         if not load_bodies or s["name"] not in enabled:
             continue
-        md_path = Path(s["path"])
-        if not md_path.exists():
-            continue
-        try:
-            content = md_path.read_text(encoding="utf-8")
-            _, body = _parse_frontmatter(content)
-            if body:
-                parts.append(f"## Skill: {s['name']}\n{body}")
-        except Exception:
-            pass
+        if s.get("body"):
+            parts.append(f"## Skill: {s['name']}\n{s['body']}")
 
     if not parts:
         return "\n".join(meta_lines)
 
     return "\n".join(meta_lines) + "\n\n---\n\n" + "\n\n---\n\n".join(parts)
+
+
+# 内置工具 load_skill 的 OpenAI function 描述（仅 on_demand 模式下提供给模型）
+LOAD_SKILL_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "load_skill",
+        "description": (
+            "加载 Skill 的完整说明（SKILL.md 正文）及文件列表；"
+            "传 file 时读取该 Skill 目录下的指定文件，如 forms.md、reference.md。"
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "name": {"type": "string", "description": "Skill 名称，见可用 Skills 目录"},
+                "file": {"type": "string", "description": "可选，Skill 目录内的相对路径"},
+            },
+            "required": ["name"],
+        },
+    },
+}
+
+_MAX_SKILL_FILE_CHARS = 200_000
+_MAX_LISTED_FILES = 50
+
+
+# 内置工具 run_skill_script：在预热的 worker 池中执行 skill 目录下的 Python 脚本（skill_runner.enabled）
+RUN_SKILL_SCRIPT_TOOL = {
+    "type": "function",
+    "function": {
+        "name": "run_skill_script",
+        "description": (
+            "执行 Skill 目录下的 Python 脚本（如 pdf/scripts/check_fillable_fields.py），"
+            "常用库已预加载，比通过 shell 启动 python 快。返回退出码、stdout、stderr。"
+        ),
+        "parameters": {
+            "type": "object",
+            "properties": {
+                "script": {"type": "string", "description": "脚本路径：绝对路径，或相对 skills 目录，如 pdf/scripts/x.py"},
+                "args": {"type": "array", "items": {"type": "string"}, "description": "命令行参数"},
+                "cwd": {"type": "string", "description": "可选，工作目录"},
+                "timeout": {"type": "number", "description": "可选，超时秒数"},
+            },
+            "required": ["script"],
+        },
+    },
+}
+
+
+def get_skill_tools() -> list[dict]:
+    """需要额外提供给模型的内置 skill 工具（OpenAI tools 格式）"""
+    tools = []
+    if _is_on_demand() and _catalog_entries():
+        tools.append(LOAD_SKILL_TOOL)
+    try:
+        from skill_runner import is_enabled
+        if is_enabled():
+            tools.append(RUN_SKILL_SCRIPT_TOOL)
+    except ImportError:
+        pass
+    return tools
+
+
+def resolve_skill_script(script: str) -> Path | None:
+    """把脚本路径解析到某个 skills 目录内；不在 skills 目录下的 .py 一律拒绝"""
+    raw = Path(str(script or "").strip()).expanduser()
+    if not str(raw) or raw.suffix != ".py":
+        return None
+    for base in _get_skill_directories():
+        base = base.resolve()
+        target = (raw if raw.is_absolute() else base / raw).resolve()
+        if base in target.parents and target.is_file():
+            return target
+    return None
+
+
+def run_skill_script(args: dict) -> dict:
+    """内置工具：在 skill_runner 池中执行 skill 脚本并返回汇总输出"""
+    target = resolve_skill_script(args.get("script") or "")
+    if target is None:
+        return {"error": f"script not found in skills directories: {args.get('script')}"}
+    try:
+        from skill_runner import get_skill_runner
+    except ImportError as e:
+        return {"error": str(e)}
+    argv = args.get("args") or []
+    if not isinstance(argv, list):
+        argv = [str(argv)]
+    return get_skill_runner().run_collect(
+        str(target), [str(a) for a in argv], cwd=args.get("cwd") or None, timeout=args.get("timeout"),
+    )
+
+
+def _find_skill(name: str) -> dict | None:
+    for e in _catalog_entries():
+        if e["name"] == name or Path(e["dir"]).name == name:
+            return e
+    return None
+
+
+def _list_skill_files(skill_dir: Path) -> list[str]:
+    out = []
+    for p in sorted(skill_dir.rglob("*")):
+        if len(out) >= _MAX_LISTED_FILES:
+            break
+        rel = p.relative_to(skill_dir)
+        if p.is_file() and not any(part.startswith(".") for part in rel.parts) and rel.name != "SKILL.md":
+            out.append(rel.as_posix())
+    return out
+
+
+def load_skill(args: dict) -> dict:
+    """内置工具：返回 skill 正文，或 skill 目录内某个文件的内容"""
+    name = str(args.get("name") or "").strip()
+    entry = _find_skill(name) if name else None
+    if entry is None:
+        return {"error": f"skill not found: {name}"}
+    skill_dir = Path(entry["dir"]).resolve()
+    rel = str(args.get("file") or "").strip()
+    if not rel or rel == "SKILL.md":
+        return {
+            "name": entry["name"],
+            "dir": str(skill_dir),
+            "content": entry.get("body") or "",
+            "files": _list_skill_files(skill_dir),
+        }
+    target = (skill_dir / rel).resolve()
+    if skill_dir not in target.parents or not target.is_file():
+        return {"error": f"file not found in skill {entry['name']}: {rel}"}
+    try:
+        content = target.read_text(encoding="utf-8", errors="replace")
+    except Exception as e:
+        return {"error": str(e)}
+    truncated = len(content) > _MAX_SKILL_FILE_CHARS
+    out = {"name": entry["name"], "file": rel, "content": content[:_MAX_SKILL_FILE_CHARS]}
+    if truncated:
+        out["truncated"] = True
+    return out
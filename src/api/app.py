@@ -1,12 +1,25 @@
 """FastAPI 应用"""
 
-from fastapi import FastAPI
+import asyncio
+import json
+import shutil
+import tempfile
+import uuid
+from pathlib import Path
+
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
 
-from core.chat import chat, run_skill
+from core.chat import chat_with_mcp_tools, run_skill
 from core.routing import get_mcp
 from skills import get_registry
 
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ModuleNotFoundError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
 app = FastAPI(title="知式 Zhyx", description="Local-first Digital Human")
 
 
@@ -29,9 +42,17 @@ class SkillIn(BaseModel):
     args: dict = {}
 
 
+class SkillScriptIn(BaseModel):
+    script: str
+    args: list[str] = []
+    cwd: str | None = None
+    timeout: float | None = None
+
+
 @app.post("/chat")
 async def api_chat(body: ChatIn):
-    return {"reply": await chat(body.message)}
+    # 与语音对话共用 MCP 工具调度；caller 区分来源，同一 MCP 服务器满载时 api 与 voice 轮转排队
+    return {"reply": await chat_with_mcp_tools(body.message, caller="api")}
 
 
 @app.post("/skill")
@@ -44,6 +65,166 @@ async def api_skills():
     return [{"name": s.name, "description": s.description} for s in get_registry().list_all()]
 
 
+@app.post("/skills/run")
+async def api_skills_run(body: SkillScriptIn):
+    """在预热 worker 池中执行 skill 脚本，以 NDJSON 流式返回 stdout/stderr，最后一行为 exit"""
+    from agent_skills.loader import resolve_skill_script
+    from skill_runner import get_skill_runner, is_enabled
+    if not is_enabled():
+        raise HTTPException(status_code=403, detail="skill_runner is disabled (skill_runner.enabled)")
+    target = resolve_skill_script(body.script)
+    if target is None:
+        raise HTTPException(status_code=404, detail=f"script not found in skills directories: {body.script}")
+
+    def _events():
+        for kind, data in get_skill_runner().run(str(target), body.args, cwd=body.cwd, timeout=body.timeout):
+            yield json.dumps({"stream": kind, "data": data}, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(_events(), media_type="application/x-ndjson")
+
+
+_AUDIO_SUFFIX = {
+    "audio/wav": ".wav", "audio/x-wav": ".wav", "audio/wave": ".wav",
+    "audio/mpeg": ".mp3", "audio/mp3": ".mp3", "audio/flac": ".flac",
+    "audio/ogg": ".ogg", "audio/webm": ".webm", "audio/mp4": ".m4a",
+}
+
+
+def _upload_suffix(filename: str | None, content_type: str | None) -> str:
+    suffix = Path(filename or "").suffix.lower()
+    if suffix:
+        return suffix
+    return _AUDIO_SUFFIX.get((content_type or "").split(";")[0].strip().lower(), ".wav")
+
+
+async def _save_multipart_files(request: Request, tmpdir: Path) -> list[tuple[str, Path]]:
+    """边接收边解析 multipart，文件字段直接写入 tmpdir（不经 request.form() 的临时文件再拷贝一次）"""
+    _, params = parse_options_header(request.headers.get("content-type", ""))
+    boundary = params.get(b"boundary")
+    if not boundary:
+        raise HTTPException(status_code=400, detail="multipart boundary missing")
+    saved: list[tuple[str, Path]] = []
+    part = {"headers": {}, "field": b"", "value": b"", "file": None, "name": "", "path": None}
+
+    def on_part_begin():
+        part.update(headers={}, field=b"", value=b"", file=None)
+
+    def on_header_field(data, start, end):
+        part["field"] += data[start:end]
+
+    def on_header_value(data, start, end):
+        part["value"] += data[start:end]
+
+    def on_header_end():
+        part["headers"][part["field"].lower()] = part["value"]
+        part.update(field=b"", value=b"")
+
+    def on_headers_finished():
+        _, disp = parse_options_header(part["headers"].get(b"content-disposition", b""))
+        filename = disp.get(b"filename")
+        if filename is None:
+            return  # 普通表单字段，忽略
+        name = filename.decode("utf-8", "replace")
+        ctype = part["headers"].get(b"content-type", b"").decode("latin-1")
+        path = tmpdir / f"{uuid.uuid4().hex}{_upload_suffix(name, ctype)}"
+        part.update(file=open(path, "wb"), name=name or path.name, path=path)
+
+    def on_part_data(data, start, end):
+        if part["file"] is not None:
+            part["file"].write(data[start:end])
+
+    def on_part_end():
+        if part["file"] is not None:
+            part["file"].close()
+            part["file"] = None
+            saved.append((part["name"], part["path"]))
+
+    parser = MultipartParser(boundary, {
+        "on_part_begin": on_part_begin, "on_header_field": on_header_field,
+        "on_header_value": on_header_value, "on_header_end": on_header_end,
+        "on_headers_finished": on_headers_finished, "on_part_data": on_part_data,
+        "on_part_end": on_part_end,
+    })
+    try:
+        async for chunk in request.stream():
+            parser.write(chunk)
+        parser.finalize()
+    finally:
+        if part["file"] is not None:
+            part["file"].close()
+    return saved
+
+
+async def _save_stt_uploads(request: Request, tmpdir: Path) -> list[tuple[str, Path]]:
+    """上传逐块写入磁盘：multipart 取全部文件字段，否则把请求体本身当作一个音频文件"""
+    saved: list[tuple[str, Path]] = []
+    ctype = request.headers.get("content-type", "")
+    if ctype.startswith("multipart/form-data"):
+        saved = await _save_multipart_files(request, tmpdir)
+    else:
+        path = tmpdir / f"{uuid.uuid4().hex}{_upload_suffix(request.headers.get('x-filename'), ctype)}"
+        size = 0
+        with open(path, "wb") as f:
+            async for chunk in request.stream():
+                f.write(chunk)
+                size += len(chunk)
+        if size:
+            saved.append((request.headers.get("x-filename") or path.name, path))
+    return saved
+
+
+@app.post("/stt")
+async def api_stt(request: Request, response_format: str = Query("json", alias="format")):
+    """批量语音转写：multipart 多文件或原始音频请求体；排队请求合批送入模型。
+    format=ndjson（或 Accept: application/x-ndjson）时每完成一个文件输出一行"""
+    from voice.stt_batch import UPLOAD_DIR, get_stt_batcher
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    tmpdir = Path(tempfile.mkdtemp(prefix="stt-", dir=UPLOAD_DIR))
+    try:
+        uploads = await _save_stt_uploads(request, tmpdir)
+    except Exception:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+        raise
+    if not uploads:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+        raise HTTPException(status_code=400, detail="no audio uploaded")
+    batcher = get_stt_batcher()
+    pending = [(name, asyncio.wrap_future(batcher.submit(path))) for name, path in uploads]
+
+    async def _result(name, fut) -> dict:
+        try:
+            return {"file": name, **(await fut)}
+        except Exception as e:
+            return {"file": name, "error": str(e)}
+
+    ndjson = response_format == "ndjson" or "application/x-ndjson" in request.headers.get("accept", "")
+    if ndjson:
+        async def _lines():
+            try:
+                for coro in asyncio.as_completed([_result(n, f) for n, f in pending]):
+                    yield json.dumps(await coro, ensure_ascii=False) + "\n"
+            finally:
+                shutil.rmtree(tmpdir, ignore_errors=True)
+
+        return StreamingResponse(_lines(), media_type="application/x-ndjson")
+    try:
+        results = await asyncio.gather(*[_result(n, f) for n, f in pending])
+    finally:
+        shutil.rmtree(tmpdir, ignore_errors=True)
+    return {"results": results}
+
+
+@app.get("/stt/health")
+async def api_stt_health():
+    """批量转写队列状态与独立模型服务（若启用）的健康状态"""
+    from voice import stt_server
+    from voice.stt_batch import get_stt_batcher
+    return {
+        "batch": get_stt_batcher().stats(),
+        "server": stt_server.health() if stt_server.is_enabled() else None,
+    }
+
+
 @app.post("/mcp/reload")
 async def api_mcp_reload():
     """重新加载 MCP 服务器配置，下次对话使用新配置（动态更新）"""
@@ -53,3 +234,28 @@ async def api_mcp_reload():
         return {"ok": True, "message": "MCP 配置已失效，下次对话将按新配置重连"}
     except ImportError:
         return {"ok": False, "message": "mcp_client 未就绪"}
+
+
+def _mcp_metrics_source():
+    """全局 MCP 会话（含服务器并发指标）；未连接时仅返回工具指标"""
+    from mcp_client.client import get_global_mcp_session
+    from mcp_client.metrics import get_tool_metrics
+    sess = get_global_mcp_session()
+    servers = sess.get_server_stats() if sess is not None else []
+    return get_tool_metrics(), servers
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def api_metrics():
+    """MCP 工具调用指标（Prometheus 文本格式）"""
+    metrics, servers = _mcp_metrics_source()
+    return PlainTextResponse(
+        metrics.render_prometheus(servers), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+
+@app.get("/metrics/json")
+async def api_metrics_json():
+    """MCP 工具调用指标 JSON 快照"""
+    metrics, servers = _mcp_metrics_source()
+    return metrics.snapshot(servers)
@@ -6,7 +6,7 @@ import sys
 import threading
 import time
 from pathlib import Path
-from http.server import HTTPServer, SimpleHTTPRequestHandler
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
 
 ROOT = Path(__file__).resolve().parents[2]
 AVATAR_DIR = ROOT / "assets" / "avatar"
@@ -20,6 +20,16 @@ BALL_HEIGHT = 96
 
 _port = [0]
 _collapsed = [True]
+# SSE 连接空闲时的心跳间隔：及时发现已断开的前端，释放订阅
+_EVENTS_KEEPALIVE_S = 15
+# 播放队列只由一处取出：取出的分段与随后的本轮状态依次广播给所有 SSE 连接
+_dispatch_lock = threading.Lock()
+# 静态资源缓存策略：模型文件一天内直接用本地缓存，过期后凭 ETag 条件请求（304）；
+# tts/cache 按内容寻址，文件名即内容，永久缓存；页面与模型清单每次都验证
+_MODEL_MAX_AGE = 86400
+_NO_CACHE = ("app.html", "debug_arcs.html", "models/registry.json")
+# scripts/precompress_avatar_assets.py 生成的预压缩文件，按 Accept-Encoding 优先级选用
+_PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
 
 
 def _start_server():
@@ -31,10 +41,27 @@ def _start_server():
             pass
 
         def do_GET(self):
+            if self.path == "/api/events" or self.path.startswith("/api/events?"):
+                self._handle_events()
+                return
             if self.path == "/api/speak" or self.path.startswith("/api/speak?"):
                 self._handle_speak()
                 return
-            super().do_GET()
+            if self.path == "/api/metrics" or self.path.startswith("/api/metrics?"):
+                self._handle_metrics()
+                return
+            if self.path == "/api/status" or self.path.startswith("/api/status?"):
+                self._handle_status()
+                return
+            if self.path.startswith("/tts/") and self.path.split("?", 1)[0].endswith("/mouth"):
+                self._handle_tts_mouth()
+                return
+            if self.path.startswith("/tts/") and self._handle_tts_segment():
+                return
+            if self.path.startswith("/blobs/"):
+                self._handle_blob()
+                return
+            self._handle_static()
 
         def do_POST(self):
             if self.path == "/api/playback-done" or self.path.startswith("/api/playback-done?"):
@@ -49,6 +76,8 @@ def _start_server():
         def _handle_playback_done(self):
             try:
                 from voice.tts import schedule_clear_on_next_push
+                from voice.tts_stream import get_segment_store
+                get_segment_store().release_played()
                 schedule_clear_on_next_push()
             except Exception:
                 pass
@@ -64,6 +93,8 @@ def _start_server():
                 data = json.loads(body) if body.strip() else {}
                 url = (data.get("url") or "").strip()
                 if url:
+                    from voice.speech_queue import get_speech_queue
+                    get_speech_queue().segment_done(url)
                     try:
                         from voice.tts import _is_debug
                         if _is_debug():
@@ -76,33 +107,404 @@ def _start_server():
             self.send_header("Access-Control-Allow-Origin", "*")
             self.end_headers()
 
+        def _handle_blob(self):
+            """MCP 工具产出的图片等 blob，按 sha256 直接 sendfile，不经用户态拷贝"""
+            sha = self.path[len("/blobs/"):].split("?", 1)[0].split(".", 1)[0]
+            try:
+                from mcp_client.blobs import get_blob_store
+                p = get_blob_store().find(sha)
+            except Exception:
+                p = None
+            if p is None:
+                self.send_response(404)
+                self.end_headers()
+                return
+            with open(p, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                self.send_response(200)
+                self.send_header("Content-Type", self.guess_type(str(p)))
+                self.send_header("Content-Length", str(size))
+                self.send_header("Cache-Control", "public, max-age=31536000, immutable")
+                self.send_header("Access-Control-Allow-Origin", "*")
+                self.end_headers()
+                try:
+                    self.wfile.flush()
+                    self.connection.sendfile(f)
+                except Exception:
+                    pass
+
+        def _handle_static(self):
+            """静态文件：带 ETag / Last-Modified / Cache-Control，条件请求命中返回 304，
+            有预压缩文件且客户端接受时直接下发 .br / .gz。目录等其他情况交给 SimpleHTTPRequestHandler"""
+            path = Path(self.translate_path(self.path))
+            try:
+                st = path.stat()
+            except OSError:
+                st = None
+            if st is None or not path.is_file():
+                super().do_GET()
+                return
+            rel = path.relative_to(AVATAR_DIR).as_posix() if path.is_relative_to(AVATAR_DIR) else path.name
+            encoding, body_path, body_st = _pick_precompressed(path, st, self.headers.get("Accept-Encoding", ""))
+            etag = _static_etag(st, encoding)
+            headers = [
+                ("ETag", etag),
+                ("Last-Modified", self.date_time_string(int(st.st_mtime))),
+                ("Cache-Control", _static_cache_control(rel)),
+                ("Vary", "Accept-Encoding"),
+                ("Access-Control-Allow-Origin", "*"),
+            ]
+            if _not_modified(self.headers, etag, st.st_mtime):
+                self.send_response(304)
+                for k, v in headers:
+                    self.send_header(k, v)
+                self.end_headers()
+                return
+            try:
+                f = open(body_path, "rb")
+            except OSError:
+                self.send_error(404)
+                return
+            with f:
+                self.send_response(200)
+                self.send_header("Content-Type", self.guess_type(str(path)))
+                self.send_header("Content-Length", str(body_st.st_size))
+                if encoding:
+                    self.send_header("Content-Encoding", encoding)
+                for k, v in headers:
+                    self.send_header(k, v)
+                self.end_headers()
+                try:
+                    self.wfile.flush()
+                    self.connection.sendfile(f)
+                except Exception:
+                    pass
+
+        def _handle_metrics(self):
+            import json
+            try:
+                from mcp_client.client import get_global_mcp_session
+                from mcp_client.metrics import get_tool_metrics
+                sess = get_global_mcp_session()
+                snap = get_tool_metrics().snapshot(sess.get_server_stats() if sess else [])
+            except Exception as e:
+                snap = {"error": str(e)}
+            try:
+                from voice.tts_cache import get_tts_cache
+                from voice.tts_engines import get_tts_engine
+                from voice.tts_stream import get_segment_store
+                snap["tts_stream"] = get_segment_store().stats()
+                from voice.tts_worker import peek_tts_worker
+                worker = peek_tts_worker()
+                if worker is not None:
+                    snap["tts_worker"] = worker.stats()
+                engine = get_tts_engine()
+                snap["tts_cache"] = {"engine": engine.name, **get_tts_cache(engine.suffix).stats()}
+            except Exception:
+                pass
+            from core.events import get_event_bus
+            snap["events"] = get_event_bus().stats()
+            body = json.dumps(snap, ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _handle_tts_segment(self) -> bool:
+            """内存中的 TTS 分段：合成中以 chunked 边到达边下发，已完成则带长度并支持 Range。
+            不是分段 id（如 tts/cache/ 下的缓存文件）时返回 False，交给静态文件处理"""
+            from voice.tts_stream import get_segment_store, segment_id_from_url
+            seg_id = segment_id_from_url(self.path)
+            if seg_id is None:
+                return False
+            store = get_segment_store()
+            seg = store.acquire(seg_id)
+            if seg is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return True
+            try:
+                if seg.done and not seg.error:
+                    self._send_segment_body(seg)
+                else:
+                    self._send_segment_chunked(seg)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+            finally:
+                store.release(seg_id)
+            return True
+
+        def _handle_tts_mouth(self):
+            """仍在合成的分段的口型包络：等合成结束后返回（/api/speak 取出时尚未算好的情况）"""
+            import json
+            from voice.lipsync import encode
+            from voice.tts_stream import get_segment_store, segment_id_from_url
+            seg_id = segment_id_from_url(self.path.split("?", 1)[0][: -len("/mouth")])
+            seg = get_segment_store().get(seg_id) if seg_id else None
+            if seg is not None:
+                seg.wait_done(30)
+            if seg is None or seg.mouth is None:
+                self.send_response(404)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+            body = json.dumps(encode(seg.mouth)).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-store")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _send_segment_body(self, seg):
+            import re
+            data = seg.data()
+            start, end = 0, len(data) - 1
+            m = re.match(r"bytes=(\d*)-(\d*)$", self.headers.get("Range", "").strip())
+            if m and (m.group(1) or m.group(2)):
+                if m.group(1):
+                    start = int(m.group(1))
+                    end = min(end, int(m.group(2))) if m.group(2) else end
+                else:
+                    start = max(0, len(data) - int(m.group(2)))
+                if start > end:
+                    self.send_response(416)
+                    self.send_header("Content-Range", f"bytes */{len(data)}")
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(206)
+                self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+            else:
+                self.send_response(200)
+            self.send_header("Content-Type", seg.mime)
+            self.send_header("Content-Length", str(end - start + 1))
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Cache-Control", "no-store")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            self.wfile.write(memoryview(data)[start:end + 1])
+            seg.mark_served()
+
+        def _send_segment_chunked(self, seg):
+            """HTTP/1.1 chunked，每收到一批音频就写出一个 chunk"""
+            self.protocol_version = "HTTP/1.1"
+            self.send_response(200)
+            self.send_header("Content-Type", seg.mime)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.send_header("Cache-Control", "no-store")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            offset = 0
+            while True:
+                data, finished = seg.read_from(offset)
+                if data:
+                    self.wfile.write(b"%x\r\n%b\r\n" % (len(data), data))
+                    self.wfile.flush()
+                    seg.mark_served()
+                    offset += len(data)
+                if finished or (not data and not seg.done):
+                    # 结束，或等待超时仍无新数据
+                    break
+            self.wfile.write(b"0\r\n\r\n")
+
+        def _handle_status(self):
+            import json
+            from core.startup import get_startup
+            body = json.dumps(get_startup().status(), ensure_ascii=False).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("Cache-Control", "no-store")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.end_headers()
+            self.wfile.write(body)
+
         def _handle_speak(self):
+            import json
             url = None
             agent_done = False
+            turn = 0
             try:
-                from voice.tts import pop_queue, is_agent_round_done, _is_debug
-                url = pop_queue()
+                from voice.speech_queue import get_speech_queue
+                from voice.tts import _is_debug
+                url, turn, agent_done = get_speech_queue().poll()
                 if url and _is_debug():
                     print(f"[TTS] 取出供播放: {url}", flush=True)
-                if not url:
-                    agent_done = is_agent_round_done()
             except Exception:
                 pass
             self.send_response(200)
             self.send_header("Content-Type", "application/json")
             self.send_header("Access-Control-Allow-Origin", "*")
             self.end_headers()
+            # turn 变化说明用户已开始新一轮（插话），前端据此停止播放并丢弃本地队列
             if url:
-                body = ('{"url":"' + url.replace("\\", "\\\\").replace('"', '\\"') + '"}').encode()
+                body = _speak_payload(url, turn)
             else:
-                body = ('{"url":null,"agent_done":' + ("true" if agent_done else "false") + "}").encode()
-            self.wfile.write(body)
+                body = {"url": None, "agent_done": agent_done, "turn": turn}
+            self.wfile.write(json.dumps(body).encode())
+
+        def _handle_events(self):
+            """SSE 推送：分段就绪（speak）、轮次与本轮结束（round）、启动状态（status）。
+            分段从播放队列只取出一次并广播给所有连接（见 _dispatch_speech）；
+            最后一个连接写入失败时，未送达的分段放回队首，前端退回轮询 /api/speak 时仍能取到"""
+            import json
+            from core.events import get_event_bus
+            from core.startup import get_startup
+            from voice.speech_queue import get_speech_queue
 
-    httpd = HTTPServer(("127.0.0.1", 0), Handler)
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+            self.send_header("Cache-Control", "no-store")
+            self.send_header("Access-Control-Allow-Origin", "*")
+            self.send_header("X-Accel-Buffering", "no")
+            self.end_headers()
+            self.close_connection = True
+
+            def send(event, data):
+                payload = json.dumps(data, ensure_ascii=False)
+                self.wfile.write(f"event: {event}\ndata: {payload}\n\n".encode("utf-8"))
+
+            bus = get_event_bus()
+            sub = bus.subscribe()
+            last_round = None
+            ev = None
+            try:
+                send("status", get_startup().status())
+                self.wfile.flush()
+                _dispatch_speech()  # 连接建立时先广播已排队的分段与当前轮次
+                while True:
+                    ev = sub.get(_EVENTS_KEEPALIVE_S)
+                    if ev is None:
+                        self.wfile.write(b": ping\n\n")
+                    elif ev[0] == "speech":
+                        _dispatch_speech()
+                    elif ev[0] == "speak":
+                        send("speak", ev[1])
+                    elif ev[0] == "round":
+                        # 每个连接都会触发广播，本连接只转发有变化的轮次状态
+                        if ev[1] != last_round:
+                            last_round = ev[1]
+                            send("round", ev[1])
+                    elif ev[0] == "status":
+                        send("status", ev[1])
+                    self.wfile.flush()
+            except (BrokenPipeError, ConnectionResetError, OSError):
+                bus.unsubscribe(sub)
+                if not bus.stats()["subscribers"]:
+                    undelivered = [ev] if ev else []
+                    while (ev := sub.get(0)) is not None:
+                        undelivered.append(ev)
+                    segs = [e[1] for e in undelivered if e[0] == "speak"]
+                    if segs:
+                        get_speech_queue().requeue([d["url"] for d in segs], segs[-1]["turn"])
+            finally:
+                bus.unsubscribe(sub)
+
+    # 启动编排的组件状态经 /api/events 推送到前端
+    from core.events import publish
+    from core.startup import get_startup
+    get_startup().add_listener(lambda status: publish("status", status))
+
+    # 多线程：流式音频响应与 SSE 连接持续较久，模型贴图与动作并行下载，都不能阻塞 /api/speak 等其他请求
+    httpd = _AvatarServer(("127.0.0.1", 0), Handler)
     _port[0] = httpd.server_port
     httpd.serve_forever()
 
 
+class _AvatarServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # 切换模型时 WebView 同时发起数十个贴图 / 动作请求，默认 backlog（5）会让连接排队重试
+    request_queue_size = 64
+
+
+def _static_cache_control(rel: str) -> str:
+    if rel in _NO_CACHE:
+        return "no-cache"
+    if rel.startswith("tts/cache/"):
+        return "public, max-age=31536000, immutable"
+    if rel.startswith("models/"):
+        return f"public, max-age={_MODEL_MAX_AGE}"
+    return "no-cache"
+
+
+def _static_etag(st: os.stat_result, encoding: str | None = None) -> str:
+    """强校验 ETag：修改时间 + 大小；预压缩版本内容不同，另加编码后缀"""
+    tag = f"{st.st_mtime_ns:x}-{st.st_size:x}"
+    return f'"{tag}-{encoding}"' if encoding else f'"{tag}"'
+
+
+def _pick_precompressed(path: Path, st: os.stat_result, accept_encoding: str):
+    """返回 (Content-Encoding 或 None, 实际下发的文件, 其 stat)；预压缩文件比原文件旧时视为过期不用"""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        if name and params.replace(" ", "") not in ("q=0", "q=0.0"):
+            accepted.add(name.strip().lower())
+    for encoding, suffix in _PRECOMPRESSED:
+        if encoding not in accepted and "*" not in accepted:
+            continue
+        alt = path.with_name(path.name + suffix)
+        try:
+            alt_st = alt.stat()
+        except OSError:
+            continue
+        if alt_st.st_mtime >= st.st_mtime:
+            return encoding, alt, alt_st
+    return None, path, st
+
+
+def _not_modified(headers, etag: str, mtime: float) -> bool:
+    """If-None-Match 优先；没有时才看 If-Modified-Since（RFC 9110 13.2.2）"""
+    inm = headers.get("If-None-Match")
+    if inm is not None:
+        tags = [t.strip() for t in inm.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+    ims = headers.get("If-Modified-Since")
+    if ims:
+        from email.utils import parsedate_to_datetime
+        try:
+            return int(mtime) <= int(parsedate_to_datetime(ims).timestamp())
+        except (TypeError, ValueError, OverflowError):
+            return False
+    return False
+
+
+def _dispatch_speech() -> None:
+    """从播放队列取出全部已入队分段，依次广播 speak 事件，最后广播本轮状态（round），
+    保证“本轮结束”排在最后一段之后；并发调用由锁串行化，每段只被取出一次"""
+    from core.events import publish
+    from voice.speech_queue import get_speech_queue
+
+    queue = get_speech_queue()
+    with _dispatch_lock:
+        while True:
+            url, turn, agent_done = queue.poll()
+            if not url:
+                break
+            publish("speak", _speak_payload(url, turn))
+        publish("round", {"turn": turn, "agent_done": agent_done})
+
+
+def _speak_payload(url: str, turn: int) -> dict:
+    """供播放的分段：url、所属轮次，以及已算好的口型包络（lipsync）"""
+    body = {"url": url, "turn": turn}
+    try:
+        from voice.lipsync import mouth_for_url
+        mouth = mouth_for_url(url)
+        if mouth:
+            body["mouth"] = mouth
+    except Exception:
+        pass
+    return body
+
+
 def _get_model():
     try:
         import yaml
@@ -131,6 +533,51 @@ def _screen_size():
 
 
 
+def _start_background_init():
+    from core.startup import get_startup
+    startup = get_startup()
+
+    def _stt():
+        from voice.stt import preload_funasr_model
+        return preload_funasr_model()
+
+    def _mcp():
+        # 每服务器独立线程，避免 anyio cancel scope 错误；未配置服务器也算就绪
+        import asyncio
+        from mcp_client.client import init_global_mcp_session
+        asyncio.run(init_global_mcp_session())
+
+    def _llm():
+        import asyncio
+        from core.chat import warm_llm
+        return asyncio.run(warm_llm())
+
+    startup.register("stt", _stt)
+    startup.register("mcp", _mcp)
+    startup.register("llm", _llm)
+    startup.start()
+
+    def _prewarm_tts():
+        import asyncio
+        from voice.tts import get_prewarm_phrases, prewarm_tts
+        from voice.tts_engines import get_tts_engine
+        try:
+            engine = get_tts_engine()
+            if hasattr(engine, "load"):
+                engine.load()  # 本地引擎提前加载模型，避免首句等待
+        except Exception as e:
+            print(f"[TTS] 引擎加载失败: {e}", flush=True)
+            return
+        phrases = get_prewarm_phrases()
+        if phrases:
+            try:
+                asyncio.run(prewarm_tts(phrases))
+            except Exception as e:
+                print(f"[TTS] 预热失败: {e}", flush=True)
+
+    threading.Thread(target=_prewarm_tts, daemon=True).start()
+
+
 def run_avatar():
     if sys.platform != "darwin":
         print("形象窗口仅支持 macOS")
@@ -153,19 +600,8 @@ def run_avatar():
     (AVATAR_DIR / "tts").mkdir(exist_ok=True)
     threading.Thread(target=_start_server, daemon=True).start()
     time.sleep(0.3)
-    # 启动时预加载 FunASR 模型（若配置为 funasr），避免首次对话才加载
-    try:
-        from voice.stt import preload_funasr_model
-        preload_funasr_model()
-    except Exception as e:
-        print(f"[STT] 预加载失败: {e}", flush=True)
-    # 启动时连接 MCP 服务器（每服务器独立线程，避免 anyio cancel scope 错误）
-    try:
-        import asyncio
-        from mcp_client.client import init_global_mcp_session
-        asyncio.run(init_global_mcp_session())
-    except Exception as e:
-        print(f"[MCP] 启动时连接失败: {e}", flush=True)
+    # STT 预加载、MCP 连接、LLM 预热在后台并行进行，窗口立即显示
+    _start_background_init()
     model = _get_model()
     url = f"http://127.0.0.1:{_port[0]}/app.html" + (f"?model={model}" if model else "")
 
@@ -310,6 +746,25 @@ def run_avatar():
     )
     _win_ref[0] = win
 
+    # 流式 STT 的部分识别结果推送到前端字幕
+    def _on_partial(text, final):
+        import json
+        try:
+            w = _win_ref[0]
+            if w:
+                w.evaluate_js(
+                    "if(typeof showPartialTranscript==='function')showPartialTranscript("
+                    + json.dumps(text) + "," + ("true" if final else "false") + ")"
+                )
+        except Exception:
+            pass
+
+    try:
+        from voice.stt import add_partial_listener
+        add_partial_listener(_on_partial)
+    except Exception:
+        pass
+
     webview.start(debug=False)
 
 
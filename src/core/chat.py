@@ -1,10 +1,12 @@
 """Core - LLM 对话 + 工具调度"""
 
-import httpx
+import asyncio
 import json
 from pathlib import Path
 from typing import AsyncIterator, Callable
 
+import httpx
+
 ROOT = Path(__file__).resolve().parents[2]
 _DEFAULT_LLM_URL = "http://localhost:11434"
 _DEFAULT_LLM_MODEL = "qwen2.5:latest"
@@ -103,6 +105,12 @@ def register_tool(name: str, fn: Callable[[dict], dict]) -> None:
 
 
 register_tool("read_file", _read_file)
+try:
+    from agent_skills.loader import load_skill as _load_skill, run_skill_script as _run_skill_script
+    register_tool("load_skill", _load_skill)
+    register_tool("run_skill_script", _run_skill_script)
+except ImportError:
+    pass
 
 
 def call_tool(name: str, args: dict) -> dict:
@@ -129,6 +137,23 @@ def _chat_url(cfg: dict) -> str:
     return f"{cfg['url']}/api/chat"
 
 
+async def warm_llm() -> bool:
+    """预热 LLM：Ollama 预先把模型载入内存；OpenAI 兼容接口探测连通性（顺带完成 DNS/TLS）"""
+    cfg = _get_llm_config()
+    try:
+        async with httpx.AsyncClient(timeout=120) as c:
+            if cfg.get("api_format") == "openai":
+                r = await c.get(f"{cfg['url']}/models", headers=_llm_headers(cfg))
+            else:
+                r = await c.post(
+                    f"{cfg['url']}/api/generate",
+                    json={"model": cfg["model"], "keep_alive": "30m"},
+                )
+        return r.status_code < 500
+    except httpx.HTTPError:
+        return False
+
+
 def _parse_ollama_chunk(data: dict) -> str:
     chunk = data.get("response", "")
     if data.get("done") and data.get("message"):
@@ -270,44 +295,61 @@ async def chat_with_mcp_tools(
     message: str,
     history: list[dict] | None = None,
     on_speak=None,
+    caller: str = "default",
 ) -> str:
     async def _speak(t: str) -> None:
         if on_speak and t and t.strip():
             text = t.strip()
             if _is_debug():
                 print(f"[TTS] 请求朗读: {text[:80]}{'...' if len(text) > 80 else ''}", flush=True)
-            import asyncio
             r = on_speak(text)
             if asyncio.iscoroutine(r):
                 await r
             else:
                 await asyncio.get_event_loop().run_in_executor(None, lambda: on_speak(text))
 
+    def _round_done() -> None:
+        # 只有语音对话（带朗读回调）需要通知播放队列本轮结束；API 调用不影响形象播放
+        if on_speak is None:
+            return
+        try:
+            from voice.tts import mark_agent_round_done
+            mark_agent_round_done()
+        except ImportError:
+            pass
+
     try:
         from mcp_client.client import mcp_session as _mcp_ctx
-        from voice.tts import mark_agent_round_done
     except ImportError:
         reply = await chat(message, history)
         if reply:
             await _speak(reply)
-        try:
-            from voice.tts import mark_agent_round_done
-            mark_agent_round_done()
-        except ImportError:
-            pass
+        _round_done()
         return reply or ""
 
+    # 内置工具（如 load_skill），与 MCP 工具一起提供给模型，本地执行
+    local_tools: list[dict] = []
+    try:
+        from agent_skills.loader import get_skill_tools
+        local_tools = get_skill_tools()
+    except ImportError:
+        pass
+    local_names = {(t.get("function") or {}).get("name") for t in local_tools}
+
+    async def _run_tool(name: str, args: dict) -> str:
+        if name in local_names:
+            # 本地工具可能执行脚本（run_skill_script），放到线程池避免阻塞事件循环
+            out = await asyncio.get_event_loop().run_in_executor(None, call_tool, name, args)
+            return json.dumps(out, ensure_ascii=False)
+        return await sess.call_tool(name, args, caller=caller)
+
     async with _mcp_ctx() as sess:
-        mcp_tools = sess.get_openai_tools()
+        mcp_tools = sess.get_openai_tools() + local_tools
         if not mcp_tools:
             reply = await chat(message, history)
             if reply:
                 await _speak(reply)
-            try:
-                from voice.tts import mark_agent_round_done
-                mark_agent_round_done()
-            except ImportError:
-                pass
+            _round_done()
             return reply or ""
 
         cfg = _get_llm_config()
@@ -316,7 +358,7 @@ async def chat_with_mcp_tools(
         extra_system = None
         try:
             from agent_skills.loader import get_agent_skill_context
-            extra_system = get_agent_skill_context()
+            extra_system = get_agent_skill_context(query=message)
         except ImportError:
             pass
         messages: list[dict] = _build_messages(
@@ -351,22 +393,15 @@ async def chat_with_mcp_tools(
                     await _speak(content)
                     if _is_debug():
                         print("[LLM]", content, flush=True)
-                    try:
-                        from voice.tts import mark_agent_round_done
-                        mark_agent_round_done()
-                    except ImportError:
-                        pass
+                    _round_done()
                     return content
 
                 if not tool_calls:
-                    try:
-                        from voice.tts import mark_agent_round_done
-                        mark_agent_round_done()
-                    except ImportError:
-                        pass
+                    _round_done()
                     return content or ""
 
                 messages.append(msg)
+                calls = []
                 for tc in tool_calls:
                     fn = (tc.get("function") or {})
                     name = fn.get("name") or ""
@@ -377,18 +412,17 @@ async def chat_with_mcp_tools(
                         args = {}
                     if _is_debug():
                         print(f"[工具] {name}({json.dumps(args, ensure_ascii=False)[:80]}...)", flush=True)
-                    result = await sess.call_tool(name, args)
+                    calls.append(_run_tool(name, args))
+                # 同一轮的多个工具调用互不依赖，并发发出；结果按 tool_calls 顺序回填
+                results = await asyncio.gather(*calls)
+                for tc, result in zip(tool_calls, results):
                     messages.append({
                         "role": "tool",
                         "tool_call_id": tc.get("id") or "",
                         "content": result,
                     })
 
-    try:
-        from voice.tts import mark_agent_round_done
-        mark_agent_round_done()
-    except ImportError:
-        pass
+    _round_done()
     return ""
 
 
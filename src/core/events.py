@@ -0,0 +1,84 @@
+"""事件总线 - 后台线程发布事件，形象 HTTP 服务经 /api/events（SSE）推送给前端
+
+前端原先每 600ms 轮询 /api/speak，空闲时也要应答，分段就绪到开始播放最多多等 600ms。
+现在状态变化时即时发布事件，每个 SSE 连接一个订阅者：
+  speech   播放队列有变化（新分段入队、新一轮开始、本轮结束）；只是唤醒信号，队列仍是唯一数据源
+  speak    形象服务从队列取出的分段（只取出一次，广播给所有 SSE 连接）
+  round    当前轮次与本轮是否结束，总在同批 speak 之后发布
+  status   启动编排的组件状态
+发布方不关心有没有订阅者；订阅者各自一个有界队列，消费过慢时丢弃最早的事件（speech 只是唤醒信号，丢了不影响正确性；
+speak 积压到丢弃说明前端已停止读取，连接随后会断开）。
+"""
+
+import threading
+from collections import deque
+from typing import Any
+
+_DEFAULT_MAXLEN = 256
+
+
+class Subscription:
+    def __init__(self, maxlen: int = _DEFAULT_MAXLEN) -> None:
+        self._items: deque[tuple[str, Any]] = deque(maxlen=maxlen)
+        self._cond = threading.Condition()
+        self.dropped = 0
+
+    def _put(self, kind: str, data: Any) -> None:
+        with self._cond:
+            if len(self._items) == self._items.maxlen:
+                self.dropped += 1
+            self._items.append((kind, data))
+            self._cond.notify()
+
+    def get(self, timeout: float | None = None) -> tuple[str, Any] | None:
+        """取出下一个事件 (kind, data)；超时返回 None"""
+        with self._cond:
+            if not self._items:
+                self._cond.wait(timeout)
+            return self._items.popleft() if self._items else None
+
+
+class EventBus:
+    def __init__(self) -> None:
+        self._subs: list[Subscription] = []
+        self._lock = threading.Lock()
+        self.published = 0
+
+    def subscribe(self, maxlen: int = _DEFAULT_MAXLEN) -> Subscription:
+        sub = Subscription(maxlen)
+        with self._lock:
+            self._subs.append(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription) -> None:
+        with self._lock:
+            try:
+                self._subs.remove(sub)
+            except ValueError:
+                pass
+
+    def publish(self, kind: str, data: Any = None) -> None:
+        with self._lock:
+            subs = list(self._subs)
+            self.published += 1
+        for sub in subs:
+            sub._put(kind, data)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "subscribers": len(self._subs),
+                "published": self.published,
+                "dropped": sum(s.dropped for s in self._subs),
+            }
+
+
+_bus = EventBus()
+
+
+def get_event_bus() -> EventBus:
+    return _bus
+
+
+def publish(kind: str, data: Any = None) -> None:
+    _bus.publish(kind, data)
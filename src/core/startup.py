@@ -0,0 +1,95 @@
+"""启动编排 - 各组件并行后台初始化，窗口先行显示，按组件上报就绪状态
+
+组件（如 stt / mcp / llm）各在独立线程中初始化，状态依次为
+pending → loading → ready | failed。状态变化会通知监听者（形象窗口转发给前端），
+其他模块用 wait_ready(name) 等待某个组件就绪：例如启动早期录下的语音先排队，
+等 STT 模型加载完成再识别。未注册的组件视为已就绪，因此 API 进程等不使用编排的场景不受影响。
+"""
+
+import threading
+import time
+from typing import Callable
+
+
+class StartupOrchestrator:
+    def __init__(self) -> None:
+        self._tasks: dict[str, Callable[[], object]] = {}
+        self._state: dict[str, dict] = {}
+        self._events: dict[str, threading.Event] = {}
+        self._listeners: list[Callable[[dict], None]] = []
+        self._lock = threading.Lock()
+
+    def register(self, name: str, fn: Callable[[], object]) -> None:
+        """注册组件；fn 返回 False 或抛出异常视为失败"""
+        with self._lock:
+            self._tasks[name] = fn
+            self._state[name] = {"state": "pending", "error": None, "elapsed": None}
+            self._events[name] = threading.Event()
+
+    def add_listener(self, fn: Callable[[dict], None]) -> None:
+        self._listeners.append(fn)
+
+    def _set(self, name: str, **kw) -> None:
+        with self._lock:
+            self._state[name].update(kw)
+        snapshot = self.status()
+        for fn in list(self._listeners):
+            try:
+                fn(snapshot)
+            except Exception:
+                pass
+
+    def _run(self, name: str, fn: Callable[[], object]) -> None:
+        t0 = time.perf_counter()
+        self._set(name, state="loading")
+        try:
+            ok = fn() is not False
+            err = None if ok else "初始化失败"
+        except Exception as e:
+            ok, err = False, str(e) or type(e).__name__
+        elapsed = round(time.perf_counter() - t0, 2)
+        if ok:
+            print(f"[启动] {name} 就绪（{elapsed}s）", flush=True)
+        else:
+            print(f"[启动] {name} 初始化失败: {err}", flush=True)
+        self._set(name, state="ready" if ok else "failed", error=err, elapsed=elapsed)
+        self._events[name].set()
+
+    def start(self) -> None:
+        """所有组件并行启动，立即返回"""
+        with self._lock:
+            pending = [(n, fn) for n, fn in self._tasks.items() if self._state[n]["state"] == "pending"]
+        for name, fn in pending:
+            threading.Thread(target=self._run, args=(name, fn), daemon=True, name=f"startup-{name}").start()
+
+    def is_ready(self, name: str) -> bool:
+        ev = self._events.get(name)
+        return ev is None or ev.is_set()
+
+    def wait(self, name: str, timeout: float | None = None) -> bool:
+        """等待组件结束初始化（成功或失败）；未注册返回 True"""
+        ev = self._events.get(name)
+        return True if ev is None else ev.wait(timeout)
+
+    def status(self) -> dict:
+        with self._lock:
+            components = {n: dict(s) for n, s in self._state.items()}
+        return {
+            "components": components,
+            "ready": all(s["state"] in ("ready", "failed") for s in components.values()),
+        }
+
+
+_orchestrator = StartupOrchestrator()
+
+
+def get_startup() -> StartupOrchestrator:
+    return _orchestrator
+
+
+def is_ready(name: str) -> bool:
+    return _orchestrator.is_ready(name)
+
+
+def wait_ready(name: str, timeout: float | None = None) -> bool:
+    return _orchestrator.wait(name, timeout)
@@ -5,10 +5,12 @@ from mcp_client.client import (
     reload_global_mcp_session,
     MCPToolSession,
 )
+from mcp_client.metrics import get_tool_metrics
 
 __all__ = [
     "init_global_mcp_session",
     "mcp_session",
     "reload_global_mcp_session",
     "MCPToolSession",
+    "get_tool_metrics",
 ]
@@ -0,0 +1,199 @@
+"""MCP 二进制内容落盘 - 内容寻址的本地 blob 存储
+
+图片 / 音频 / 嵌入资源等非文本 block 只解码一次写入 data/blobs/<sha[:2]>/<sha><ext>，
+对话里仅保留紧凑引用（路径、mime、大小、尺寸），避免把整段 base64 塞进 prompt。
+形象或 FileReader 需要时按路径读取，或用 open_blob() 以 mmap 零拷贝访问。
+"""
+
+import base64
+import hashlib
+import json
+import mimetypes
+import mmap
+import os
+import struct
+import tempfile
+from pathlib import Path
+from typing import Any
+
+ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_BLOB_DIR = ROOT / "data" / "blobs"
+
+_EXT_OVERRIDES = {"image/jpeg": ".jpg", "audio/mpeg": ".mp3", "audio/wav": ".wav"}
+
+
+def _get_blob_dir() -> Path:
+    """mcp.blob_dir 配置，默认 data/blobs"""
+    try:
+        import yaml
+        cfg = ROOT / "config" / "zhyx.yaml"
+        if cfg.exists():
+            with open(cfg, encoding="utf-8") as f:
+                d = yaml.safe_load(f) or {}
+            p = (d.get("mcp") or {}).get("blob_dir")
+            if p:
+                p = Path(p).expanduser()
+                return p if p.is_absolute() else ROOT / p
+    except Exception:
+        pass
+    return DEFAULT_BLOB_DIR
+
+
+def _ext_for(mime: str) -> str:
+    if mime in _EXT_OVERRIDES:
+        return _EXT_OVERRIDES[mime]
+    return mimetypes.guess_extension(mime or "") or ".bin"
+
+
+def image_size(data: bytes | memoryview) -> tuple[int, int] | None:
+    """只读文件头解析 PNG / GIF / JPEG / WebP 尺寸，不依赖 PIL"""
+    head = bytes(data[:32])
+    if head.startswith(b"\x89PNG\r\n\x1a\n") and len(head) >= 24:
+        return struct.unpack(">II", head[16:24])
+    if head[:6] in (b"GIF87a", b"GIF89a"):
+        return struct.unpack("<HH", head[6:10])
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        chunk = head[12:16]
+        if chunk == b"VP8X":
+            w = int.from_bytes(head[24:27], "little") + 1
+            h = int.from_bytes(head[27:30], "little") + 1
+            return w, h
+        if chunk == b"VP8 ":
+            w, h = struct.unpack("<HH", head[26:30])
+            return w & 0x3FFF, h & 0x3FFF
+        if chunk == b"VP8L":
+            b = head[21:25]
+            w = 1 + (((b[1] & 0x3F) << 8) | b[0])
+            h = 1 + (((b[3] & 0x0F) << 10) | (b[2] << 2) | ((b[1] & 0xC0) >> 6))
+            return w, h
+        return None
+    if head[:2] == b"\xff\xd8":
+        i, n = 2, len(data)
+        while i + 9 < n:
+            if data[i] != 0xFF:
+                i += 1
+                continue
+            marker = data[i + 1]
+            if marker in (0xD8, 0x01) or 0xD0 <= marker <= 0xD7:
+                i += 2
+                continue
+            seg_len = (data[i + 2] << 8) | data[i + 3]
+            if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+                h = (data[i + 5] << 8) | data[i + 6]
+                w = (data[i + 7] << 8) | data[i + 8]
+                return w, h
+            i += 2 + seg_len
+    return None
+
+
+class BlobStore:
+    """内容寻址存储：同一内容只写一次，重复调用直接返回已有文件"""
+
+    def __init__(self, root: Path | None = None) -> None:
+        self.root = Path(root) if root else _get_blob_dir()
+
+    def path_for(self, sha: str, mime: str = "") -> Path:
+        return self.root / sha[:2] / f"{sha}{_ext_for(mime)}"
+
+    def put(self, data: bytes, mime: str = "application/octet-stream") -> dict:
+        """写入并返回引用 dict：sha256 / path / mime / size / [width, height]"""
+        sha = hashlib.sha256(data).hexdigest()
+        path = self.path_for(sha, mime)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                os.replace(tmp, path)
+            except Exception:
+                try:
+                    os.unlink(tmp)
+                except OSError:
+                    pass
+                raise
+        ref = {"sha256": sha, "path": str(path), "mime": mime, "size": len(data)}
+        if mime.startswith("image/"):
+            size = image_size(data)
+            if size:
+                ref["width"], ref["height"] = int(size[0]), int(size[1])
+        return ref
+
+    def find(self, sha: str) -> Path | None:
+        """按 sha256 查找 blob 文件（扩展名未知时）"""
+        d = self.root / sha[:2]
+        if len(sha) != 64 or not d.is_dir():
+            return None
+        for p in d.glob(f"{sha}.*"):
+            return p
+        return None
+
+    def open(self, sha: str) -> mmap.mmap | None:
+        """以只读 mmap 打开 blob，调用方按 memoryview 使用，不复制内容"""
+        p = self.find(sha)
+        if p is None or p.stat().st_size == 0:
+            return None
+        with open(p, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+_store: BlobStore | None = None
+
+
+def get_blob_store() -> BlobStore:
+    global _store
+    if _store is None:
+        _store = BlobStore()
+    return _store
+
+
+def open_blob(sha: str) -> mmap.mmap | None:
+    """零拷贝读取 blob"""
+    return get_blob_store().open(sha)
+
+
+def _field(block: Any, name: str) -> Any:
+    if isinstance(block, dict):
+        return block.get(name)
+    return getattr(block, name, None)
+
+
+def content_block_to_text(block: Any, store: BlobStore | None = None) -> str:
+    """把一个 MCP content block 转为对话中的文本：文本原样，二进制落盘后给出引用"""
+    btype = _field(block, "type") or ""
+    text = _field(block, "text")
+    if text and btype in ("", "text"):
+        return str(text)
+    store = store or get_blob_store()
+    if btype in ("image", "audio"):
+        data = _field(block, "data")
+        if not data:
+            return ""
+        mime = _field(block, "mimeType") or "application/octet-stream"
+        ref = store.put(base64.b64decode(data), mime)
+        return _ref_text(btype, ref)
+    if btype == "resource":
+        res = _field(block, "resource") or {}
+        uri = str(_field(res, "uri") or "")
+        mime = _field(res, "mimeType") or ""
+        if _field(res, "text") is not None:
+            return str(_field(res, "text"))
+        blob = _field(res, "blob")
+        if not blob:
+            return ""
+        mime = mime or mimetypes.guess_type(uri)[0] or "application/octet-stream"
+        ref = store.put(base64.b64decode(blob), mime)
+        if uri:
+            ref["uri"] = uri
+        return _ref_text("resource", ref)
+    if btype == "resource_link":
+        link = {"type": "resource_link", "uri": str(_field(block, "uri") or "")}
+        for k in ("name", "mimeType"):
+            if _field(block, k):
+                link[k] = _field(block, k)
+        return json.dumps(link, ensure_ascii=False)
+    return str(text) if text else ""
+
+
+def _ref_text(kind: str, ref: dict) -> str:
+    return json.dumps({"type": kind, **ref}, ensure_ascii=False)
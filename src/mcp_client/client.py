@@ -5,14 +5,20 @@
 """
 
 import asyncio
+import concurrent.futures
 import hashlib
 import json
 import os
 import threading
+import time
+from collections import deque
 from contextlib import asynccontextmanager
 from pathlib import Path
 from typing import Any, AsyncIterator
 
+from mcp_client.blobs import content_block_to_text
+from mcp_client.metrics import get_tool_metrics
+
 ROOT = Path(__file__).resolve().parents[2]
 
 # MCP 子进程 stderr 重定向到此，静默其 INFO 等日志
@@ -22,21 +28,39 @@ _DEVNULL = open(os.devnull, "w", encoding="utf-8")
 _global_session: "MCPToolSession | None" = None
 # 创建会话时的配置指纹，用于检测变更
 _config_hash_at_session: str | None = None
+# 每服务器默认允许的并发 in-flight 请求数（可由 mcp.max_in_flight 或单个 server 的 max_in_flight 覆盖）
+_DEFAULT_MAX_IN_FLIGHT = 4
+_CALL_TIMEOUT = 120
 
 
-def _get_mcp_config() -> list[dict]:
-    """从 config/zhyx.yaml 读取 mcp.servers"""
+def _get_mcp_section() -> dict:
+    """从 config/zhyx.yaml 读取 mcp 段"""
     try:
         import yaml
         cfg = ROOT / "config" / "zhyx.yaml"
         if cfg.exists():
             with open(cfg, encoding="utf-8") as f:
                 d = yaml.safe_load(f) or {}
-            servers = (d.get("mcp") or {}).get("servers") or []
-            return servers if isinstance(servers, list) else []
+            mcp = d.get("mcp") or {}
+            return mcp if isinstance(mcp, dict) else {}
     except Exception:
         pass
-    return []
+    return {}
+
+
+def _get_mcp_config() -> list[dict]:
+    """从 config/zhyx.yaml 读取 mcp.servers"""
+    servers = _get_mcp_section().get("servers") or []
+    return servers if isinstance(servers, list) else []
+
+
+def _max_in_flight_for(srv: dict) -> int:
+    """单个服务器的并发上限：server.max_in_flight > mcp.max_in_flight > 默认值"""
+    v = srv.get("max_in_flight") or _get_mcp_section().get("max_in_flight") or _DEFAULT_MAX_IN_FLIGHT
+    try:
+        return max(1, int(v))
+    except (TypeError, ValueError):
+        return _DEFAULT_MAX_IN_FLIGHT
 
 
 def _mcp_config_hash() -> str:
@@ -75,6 +99,107 @@ def _mcp_tool_to_openai(t: Any) -> dict:
     }
 
 
+class _ServerDispatcher:
+    """单个 MCP 服务器的请求调度
+
+    同一 ClientSession 上允许多个 JSON-RPC 请求同时 in-flight（按 request id 复用），
+    超出 max_in_flight 的请求按调用方（voice / api / ...）分队列，轮转出队，避免某一方独占。
+    submit 可在任意线程调用；出队与执行均在服务器自己的 loop 中进行。
+    """
+
+    def __init__(self, name: str, loop: asyncio.AbstractEventLoop, sess: Any, max_in_flight: int) -> None:
+        self.name = name
+        self.loop = loop
+        self.sess = sess
+        self.max_in_flight = max(1, int(max_in_flight))
+        self._queues: dict[str, deque] = {}
+        self._order: deque[str] = deque()
+        self._in_flight = 0
+        self._tasks: dict[concurrent.futures.Future, asyncio.Task] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, tool: str, arguments: dict, caller: str = "default") -> concurrent.futures.Future:
+        """排队一次 call_tool，返回 concurrent Future（结果为 MCP CallToolResult）"""
+        fut: concurrent.futures.Future = concurrent.futures.Future()
+        with self._lock:
+            q = self._queues.get(caller)
+            if q is None:
+                q = self._queues[caller] = deque()
+                self._order.append(caller)
+            q.append((tool, arguments, fut))
+        self.loop.call_soon_threadsafe(self._pump)
+        return fut
+
+    def cancel(self, fut: concurrent.futures.Future) -> None:
+        """取消排队中或执行中的请求（用于调用方超时）"""
+        if fut.cancel():
+            return
+        with self._lock:
+            task = self._tasks.get(fut)
+        if task is not None:
+            self.loop.call_soon_threadsafe(task.cancel)
+
+    def _next_locked(self) -> tuple | None:
+        """轮转取下一个请求：取队首调用方的一项，该调用方仍有积压则移到队尾"""
+        while self._order:
+            caller = self._order.popleft()
+            q = self._queues.get(caller)
+            if not q:
+                self._queues.pop(caller, None)
+                continue
+            item = q.popleft()
+            if q:
+                self._order.append(caller)
+            else:
+                self._queues.pop(caller, None)
+            return item
+        return None
+
+    def _pump(self) -> None:
+        """在服务器 loop 中运行：有空闲槽位就发出排队的请求"""
+        while True:
+            with self._lock:
+                if self._in_flight >= self.max_in_flight:
+                    return
+                item = self._next_locked()
+                if item is None:
+                    return
+                self._in_flight += 1
+            tool, arguments, fut = item
+            if not fut.set_running_or_notify_cancel():
+                with self._lock:
+                    self._in_flight -= 1
+                continue
+            task = self.loop.create_task(self.sess.call_tool(tool, arguments=arguments))
+            with self._lock:
+                self._tasks[fut] = task
+            task.add_done_callback(lambda t, f=fut: self._on_done(f, t))
+
+    def _on_done(self, fut: concurrent.futures.Future, task: asyncio.Task) -> None:
+        with self._lock:
+            self._in_flight -= 1
+            self._tasks.pop(fut, None)
+        if task.cancelled():
+            fut.set_exception(TimeoutError("MCP 请求已取消"))
+        elif task.exception() is not None:
+            fut.set_exception(task.exception())
+        else:
+            fut.set_result(task.result())
+        self._pump()
+
+    def stats(self) -> dict:
+        """并发与排队深度指标"""
+        with self._lock:
+            by_caller = {c: len(q) for c, q in self._queues.items() if q}
+            return {
+                "name": self.name,
+                "in_flight": self._in_flight,
+                "queued": sum(by_caller.values()),
+                "queued_by_caller": by_caller,
+                "max_in_flight": self.max_in_flight,
+            }
+
+
 def _connect_one_server_in_thread(
     idx: int,
     srv: dict,
@@ -194,12 +319,16 @@ async def init_global_mcp_session() -> "MCPToolSession | None":
     session._tools = tools_out
     session._tool_to_session = tool_to_idx
     session._server_holders = [None] * len(servers)
-    for i in range(len(servers)):
+    for i, srv in enumerate(servers):
         if sessions_out[i] is not None and loop_ref[i] is not None:
             h = sessions_out[i]
+            name_srv = srv.get("name") or srv.get("command") or srv.get("cmd") or str(i)
             session._server_holders[i] = {
                 "sess": h["sess"], "sess_ctx": h["sess_ctx"], "stdio_ctx": h["stdio_ctx"],
                 "loop": loop_ref[i],
+                "dispatcher": _ServerDispatcher(
+                    str(name_srv), loop_ref[i], h["sess"], _max_in_flight_for(srv)
+                ),
             }
     if not session._tools:
         print("[MCP] 无可用工具，请检查: 1) pip install mcp  2) Node.js 与 npx  3) uv（Office/ModelScope）", flush=True)
@@ -221,6 +350,11 @@ async def mcp_session() -> AsyncIterator["MCPToolSession"]:
     global _global_session, _config_hash_at_session
     if _global_session is not None and _config_hash_at_session != _mcp_config_hash():
         reload_global_mcp_session()
+    if _global_session is None:
+        # 启动编排仍在连接 MCP 时等它完成，避免重复连接
+        from core.startup import is_ready, wait_ready
+        if not is_ready("mcp"):
+            await asyncio.to_thread(wait_ready, "mcp", 120)
     if _global_session is not None:
         yield _global_session
         return
@@ -241,6 +375,7 @@ class MCPToolSession:
         self._tools: list[dict] = []
         self._tool_to_session: dict[str, int] = {}
         self._server_holders: list[dict] = []
+        self._metrics = get_tool_metrics()
 
     def close_sync(self) -> None:
         """同步关闭（仅用于非全局的临时会话）"""
@@ -258,32 +393,61 @@ class MCPToolSession:
         """返回 OpenAI API 的 tools 格式"""
         return self._tools.copy()
 
-    async def call_tool(self, name: str, arguments: dict) -> str:
-        """调用工具，在对应服务器的 loop 中执行"""
+    def get_server_stats(self) -> list[dict]:
+        """每个已连接服务器的 in-flight 数与排队深度"""
+        out = []
+        for h in self._server_holders or []:
+            if h is not None and h.get("dispatcher") is not None:
+                out.append(h["dispatcher"].stats())
+        return out
+
+    async def call_tool(self, name: str, arguments: dict, caller: str = "default") -> str:
+        """调用工具：提交到对应服务器的调度器，不阻塞当前事件循环。
+
+        caller 标识调用方（如 voice / api），同一服务器满载时各调用方轮转排队。
+        """
         idx = self._tool_to_session.get(name)
         if idx is None:
             return json.dumps({"error": f"工具不存在: {name}"}, ensure_ascii=False)
         if idx >= len(self._server_holders) or self._server_holders[idx] is None:
             return json.dumps({"error": f"服务器 {idx} 不可用"}, ensure_ascii=False)
-        holder = self._server_holders[idx]
-        loop = holder["loop"]
-        sess = holder["sess"]
-
-        def _run():
-            coro = sess.call_tool(name, arguments=arguments or {})
-            future = asyncio.run_coroutine_threadsafe(coro, loop)
-            return future.result(timeout=120)
-
+        dispatcher: _ServerDispatcher = self._server_holders[idx]["dispatcher"]
+        args = arguments or {}
+        req_bytes = len(json.dumps(args, ensure_ascii=False, default=str).encode("utf-8"))
+        t0 = time.perf_counter()
+        fut = dispatcher.submit(name, args, caller=caller or "default")
         try:
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor(max_workers=1) as ex:
-                result = ex.submit(_run).result(timeout=125)
+            result = await asyncio.wait_for(asyncio.wrap_future(fut), timeout=_CALL_TIMEOUT)
+        except asyncio.TimeoutError:
+            dispatcher.cancel(fut)
+            out = json.dumps({"error": f"工具调用超时（{_CALL_TIMEOUT}s）: {name}"}, ensure_ascii=False)
+            self._metrics.record(
+                name, time.perf_counter() - t0, req_bytes, len(out.encode("utf-8")), timeout=True
+            )
+            return out
+        except asyncio.CancelledError:
+            # 本轮被插话打断：排队中或执行中的工具调用一并取消，释放服务器的并发名额
+            dispatcher.cancel(fut)
+            raise
         except Exception as e:
-            return json.dumps({"error": str(e)}, ensure_ascii=False)
+            out = json.dumps({"error": str(e)}, ensure_ascii=False)
+            self._metrics.record(
+                name, time.perf_counter() - t0, req_bytes, len(out.encode("utf-8")), error=True
+            )
+            return out
         content = []
         if hasattr(result, "content"):
             for block in (result.content or []):
-                text = getattr(block, "text", None) or (block.get("text") if isinstance(block, dict) else "")
+                # 文本原样返回；图片/资源等二进制解码落盘，仅回传紧凑引用
+                try:
+                    text = content_block_to_text(block)
+                except Exception as e:
+                    text = json.dumps({"error": f"内容块处理失败: {e}"}, ensure_ascii=False)
                 if text:
-                    content.append(str(text))
-        return "\n".join(content) if content else json.dumps({"result": "ok"}, ensure_ascii=False)
+                    content.append(text)
+        out = "\n".join(content) if content else json.dumps({"result": "ok"}, ensure_ascii=False)
+        self._metrics.record(
+            name, time.perf_counter() - t0, req_bytes, len(out.encode("utf-8")),
+            error=bool(getattr(result, "isError", False)),
+        )
+        return out
@@ -0,0 +1,138 @@
+"""MCP 工具调用指标 - 按工具统计次数、耗时直方图、请求/响应字节、错误与超时
+
+进程内单例，MCP 会话重连后指标不清零。提供 Prometheus 文本格式与 JSON 快照两种导出。
+"""
+
+import threading
+import time
+
+# 耗时直方图桶（秒），与 _CALL_TIMEOUT=120 对齐
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+
+class _ToolStats:
+    __slots__ = (
+        "calls", "errors", "timeouts", "latency_sum", "buckets",
+        "request_bytes", "response_bytes", "max_response_bytes",
+    )
+
+    def __init__(self) -> None:
+        self.calls = 0
+        self.errors = 0
+        self.timeouts = 0
+        self.latency_sum = 0.0
+        self.buckets = [0] * len(LATENCY_BUCKETS)
+        self.request_bytes = 0
+        self.response_bytes = 0
+        self.max_response_bytes = 0
+
+
+class ToolMetrics:
+    """线程安全的工具调用指标表（调用来自不同线程的事件循环）"""
+
+    def __init__(self) -> None:
+        self._tools: dict[str, _ToolStats] = {}
+        self._lock = threading.Lock()
+        self._started = time.time()
+
+    def record(
+        self,
+        tool: str,
+        duration: float,
+        request_bytes: int,
+        response_bytes: int,
+        error: bool = False,
+        timeout: bool = False,
+    ) -> None:
+        with self._lock:
+            st = self._tools.get(tool)
+            if st is None:
+                st = self._tools[tool] = _ToolStats()
+            st.calls += 1
+            st.errors += 1 if (error or timeout) else 0
+            st.timeouts += 1 if timeout else 0
+            st.latency_sum += duration
+            for i, le in enumerate(LATENCY_BUCKETS):
+                if duration <= le:
+                    st.buckets[i] += 1
+            st.request_bytes += request_bytes
+            st.response_bytes += response_bytes
+            st.max_response_bytes = max(st.max_response_bytes, response_bytes)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._tools.clear()
+            self._started = time.time()
+
+    def snapshot(self, servers: list[dict] | None = None) -> dict:
+        """JSON 快照，供形象调试页等使用"""
+        with self._lock:
+            tools = {}
+            for name, st in sorted(self._tools.items()):
+                tools[name] = {
+                    "calls": st.calls,
+                    "errors": st.errors,
+                    "timeouts": st.timeouts,
+                    "latency_avg": (st.latency_sum / st.calls) if st.calls else 0.0,
+                    "latency_sum": st.latency_sum,
+                    "latency_buckets": dict(zip([str(b) for b in LATENCY_BUCKETS], st.buckets)),
+                    "request_bytes": st.request_bytes,
+                    "response_bytes": st.response_bytes,
+                    "max_response_bytes": st.max_response_bytes,
+                }
+            return {"since": self._started, "tools": tools, "servers": list(servers or [])}
+
+    def render_prometheus(self, servers: list[dict] | None = None) -> str:
+        """Prometheus 文本格式（exposition format 0.0.4）"""
+        lines: list[str] = []
+
+        def _head(name: str, typ: str, help_: str) -> None:
+            lines.append(f"# HELP {name} {help_}")
+            lines.append(f"# TYPE {name} {typ}")
+
+        with self._lock:
+            items = sorted(self._tools.items())
+            _head("zhyx_mcp_tool_calls_total", "counter", "MCP tool calls")
+            for name, st in items:
+                lines.append(f'zhyx_mcp_tool_calls_total{{tool="{_esc(name)}"}} {st.calls}')
+            _head("zhyx_mcp_tool_errors_total", "counter", "MCP tool calls that failed (incl. timeouts)")
+            for name, st in items:
+                lines.append(f'zhyx_mcp_tool_errors_total{{tool="{_esc(name)}"}} {st.errors}')
+            _head("zhyx_mcp_tool_timeouts_total", "counter", "MCP tool calls that timed out")
+            for name, st in items:
+                lines.append(f'zhyx_mcp_tool_timeouts_total{{tool="{_esc(name)}"}} {st.timeouts}')
+            _head("zhyx_mcp_tool_request_bytes_total", "counter", "Serialized argument bytes sent")
+            for name, st in items:
+                lines.append(f'zhyx_mcp_tool_request_bytes_total{{tool="{_esc(name)}"}} {st.request_bytes}')
+            _head("zhyx_mcp_tool_response_bytes_total", "counter", "Result bytes returned to the model")
+            for name, st in items:
+                lines.append(f'zhyx_mcp_tool_response_bytes_total{{tool="{_esc(name)}"}} {st.response_bytes}')
+            _head("zhyx_mcp_tool_duration_seconds", "histogram", "MCP tool call latency")
+            for name, st in items:
+                t = _esc(name)
+                for le, n in zip(LATENCY_BUCKETS, st.buckets):
+                    lines.append(f'zhyx_mcp_tool_duration_seconds_bucket{{tool="{t}",le="{le}"}} {n}')
+                lines.append(f'zhyx_mcp_tool_duration_seconds_bucket{{tool="{t}",le="+Inf"}} {st.calls}')
+                lines.append(f'zhyx_mcp_tool_duration_seconds_sum{{tool="{t}"}} {st.latency_sum:.6f}')
+                lines.append(f'zhyx_mcp_tool_duration_seconds_count{{tool="{t}"}} {st.calls}')
+
+        servers = servers or []
+        _head("zhyx_mcp_server_in_flight", "gauge", "In-flight MCP requests per server")
+        for s in servers:
+            lines.append(f'zhyx_mcp_server_in_flight{{server="{_esc(s["name"])}"}} {s["in_flight"]}')
+        _head("zhyx_mcp_server_queue_depth", "gauge", "Queued MCP requests per server")
+        for s in servers:
+            lines.append(f'zhyx_mcp_server_queue_depth{{server="{_esc(s["name"])}"}} {s["queued"]}')
+        return "\n".join(lines) + "\n"
+
+
+def _esc(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+_metrics = ToolMetrics()
+
+
+def get_tool_metrics() -> ToolMetrics:
+    """进程内共享的工具指标"""
+    return _metrics
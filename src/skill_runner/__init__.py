@@ -0,0 +1,4 @@
+"""Skill Runner - 预热 worker 池执行 skill 脚本"""
+from skill_runner.pool import SkillRunnerPool, get_skill_runner, is_enabled
+
+__all__ = ["SkillRunnerPool", "get_skill_runner", "is_enabled"]
@@ -0,0 +1,225 @@
+"""Skill 脚本执行池 - 预热的 worker 进程，免去每次冷启动 Python 与重量级导入
+
+skills/*/scripts/*.py 通过 shell 工具执行时，每次都要启动解释器并导入 lxml / pypdf / PIL /
+openpyxl / pdfplumber，常常 1–2 秒。这里预先启动若干空闲 worker（python -m skill_runner.worker），
+在等待任务期间完成这些导入；每个 worker 只执行一个脚本（runpy，__name__ == "__main__"）后退出，
+池随即补充新的空闲 worker，既保持导入状态的热度又避免脚本之间互相污染全局状态。
+stdout/stderr 为真实管道，按到达逐段回传，支持超时（kill）与内存上限（RLIMIT_AS）。
+"""
+
+import codecs
+import json
+import os
+import selectors
+import signal
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Iterator
+
+ROOT = Path(__file__).resolve().parents[2]
+SRC = ROOT / "src"
+
+DEFAULT_PRELOAD = ["lxml.etree", "pypdf", "PIL.Image", "openpyxl", "pdfplumber", "defusedxml"]
+_DEFAULT_WORKERS = 2
+_DEFAULT_TIMEOUT = 120
+_DEFAULT_MEMORY_MB = 2048
+
+
+def _get_runner_config() -> dict:
+    try:
+        import yaml
+        cfg = ROOT / "config" / "zhyx.yaml"
+        if cfg.exists():
+            with open(cfg, encoding="utf-8") as f:
+                d = yaml.safe_load(f) or {}
+            return d.get("skill_runner") or {}
+    except Exception:
+        pass
+    return {}
+
+
+def _kill_group(proc: subprocess.Popen) -> None:
+    """worker 以 start_new_session 启动，自成进程组：连同脚本派生的子进程一起终止"""
+    try:
+        os.killpg(proc.pid, signal.SIGKILL)
+    except (AttributeError, ProcessLookupError, PermissionError):
+        proc.kill()
+
+
+class SkillRunnerPool:
+    """预热 worker 池；run() 流式返回 (stream, data) 事件，最后一个事件为 ("exit", code)"""
+
+    def __init__(
+        self,
+        workers: int = _DEFAULT_WORKERS,
+        preload: list[str] | None = None,
+        timeout: float = _DEFAULT_TIMEOUT,
+        memory_mb: int = _DEFAULT_MEMORY_MB,
+    ) -> None:
+        self.workers = max(1, int(workers))
+        self.preload = list(DEFAULT_PRELOAD if preload is None else preload)
+        self.timeout = float(timeout)
+        self.memory_mb = int(memory_mb)
+        self._idle: list[subprocess.Popen] = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._closed = False
+
+    def _spawn(self) -> subprocess.Popen:
+        env = os.environ.copy()
+        env["PYTHONPATH"] = os.pathsep.join(p for p in (str(SRC), env.get("PYTHONPATH")) if p)
+        env["PYTHONUNBUFFERED"] = "1"
+        env.setdefault("PYTHONIOENCODING", "utf-8")
+        return subprocess.Popen(
+            [sys.executable, "-m", "skill_runner.worker", *self.preload],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            env=env,
+            cwd=str(ROOT),
+            start_new_session=True,
+        )
+
+    def warm(self) -> None:
+        """补足空闲 worker；预加载模块在 worker 内部异步导入，不阻塞调用方"""
+        with self._lock:
+            self._idle = [p for p in self._idle if p.poll() is None]
+            missing = 0 if self._closed else self.workers - len(self._idle)
+        for _ in range(max(0, missing)):
+            proc = self._spawn()
+            with self._lock:
+                self._idle.append(proc)
+
+    def _take(self) -> subprocess.Popen:
+        with self._lock:
+            while self._idle:
+                proc = self._idle.pop(0)
+                if proc.poll() is None:
+                    return proc
+        return self._spawn()
+
+    def run(
+        self,
+        script: str,
+        argv: list[str] | None = None,
+        cwd: str | None = None,
+        timeout: float | None = None,
+        env: dict | None = None,
+    ) -> Iterator[tuple[str, object]]:
+        """执行脚本，逐段产出 ("stdout"|"stderr", text)，最后产出 ("exit", code)；超时 code 为 -9"""
+        timeout = self.timeout if timeout is None else float(timeout)
+        path = Path(script).resolve()
+        job = {
+            "script": str(path),
+            "argv": [str(a) for a in argv or []],
+            "cwd": cwd or str(path.parent),
+            "memory_mb": self.memory_mb,
+            "env": env or {},
+        }
+        self._slots.acquire()
+        proc = self._take()
+        threading.Thread(target=self.warm, daemon=True).start()
+        deadline = time.monotonic() + timeout
+        code: int | None = None
+        sel = selectors.DefaultSelector()
+        try:
+            proc.stdin.write((json.dumps(job, ensure_ascii=False) + "\n").encode("utf-8"))
+            proc.stdin.close()
+            decoders = {}
+            for name, f in (("stdout", proc.stdout), ("stderr", proc.stderr)):
+                sel.register(f, selectors.EVENT_READ, name)
+                decoders[name] = codecs.getincrementaldecoder("utf-8")(errors="replace")
+            while sel.get_map():
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    code = -9
+                    yield "stderr", f"[skill_runner] 超时 {timeout:.0f}s，已终止\n"
+                    break
+                for key, _ in sel.select(min(remaining, 0.5)):
+                    data = os.read(key.fd, 65536)
+                    if not data:
+                        sel.unregister(key.fileobj)
+                        tail = decoders[key.data].decode(b"", final=True)
+                        if tail:
+                            yield key.data, tail
+                        continue
+                    text = decoders[key.data].decode(data)
+                    if text:
+                        yield key.data, text
+            if code is None:
+                code = proc.wait(timeout=max(0.1, deadline - time.monotonic()))
+        except subprocess.TimeoutExpired:
+            code = -9
+        finally:
+            sel.close()
+            if proc.poll() is None:
+                _kill_group(proc)
+            proc.wait()
+            for f in (proc.stdin, proc.stdout, proc.stderr):
+                try:
+                    f.close()
+                except Exception:
+                    pass
+            self._slots.release()
+        yield "exit", code
+
+    def run_collect(self, script: str, argv: list[str] | None = None, cwd: str | None = None,
+                    timeout: float | None = None) -> dict:
+        """执行脚本并汇总输出"""
+        t0 = time.perf_counter()
+        out, err, code = [], [], -1
+        for kind, data in self.run(script, argv, cwd, timeout):
+            if kind == "stdout":
+                out.append(str(data))
+            elif kind == "stderr":
+                err.append(str(data))
+            elif kind == "exit":
+                code = int(data)
+        return {
+            "exit_code": code,
+            "stdout": "".join(out),
+            "stderr": "".join(err),
+            "timed_out": code == -9,
+            "duration": round(time.perf_counter() - t0, 3),
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for proc in idle:
+            try:
+                proc.stdin.close()
+            except Exception:
+                pass
+            try:
+                proc.wait(timeout=1)
+            except subprocess.TimeoutExpired:
+                _kill_group(proc)
+                proc.wait()
+
+
+_pool: SkillRunnerPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_skill_runner() -> SkillRunnerPool:
+    """全局执行池（按 config skill_runner 段创建，首次使用时启动）"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            cfg = _get_runner_config()
+            _pool = SkillRunnerPool(
+                workers=cfg.get("workers") or _DEFAULT_WORKERS,
+                preload=cfg.get("preload") or DEFAULT_PRELOAD,
+                timeout=cfg.get("timeout") or _DEFAULT_TIMEOUT,
+                memory_mb=cfg.get("memory_mb") or _DEFAULT_MEMORY_MB,
+            )
+        return _pool
+
+
+def is_enabled() -> bool:
+    return bool(_get_runner_config().get("enabled", False))
@@ -0,0 +1,60 @@
+"""Skill Runner worker 进程入口：python -m skill_runner.worker [预加载模块...]
+
+启动后先导入预加载模块，再阻塞等待 stdin 上的一行 JSON 任务
+{"script", "argv", "cwd", "env", "memory_mb"}，以 __main__ 身份执行脚本后退出。
+stdout / stderr 即脚本的真实输出（含 C 扩展直接写 fd 的内容），由父进程流式读取。
+"""
+
+import importlib
+import json
+import os
+import sys
+
+
+def _preload(modules: list[str]) -> None:
+    for name in modules:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass
+
+
+def main() -> int:
+    _preload(sys.argv[1:])
+    line = sys.stdin.readline()
+    if not line.strip():
+        return 0
+    job = json.loads(line)
+    mem = int(job.get("memory_mb") or 0)
+    if mem > 0:
+        try:
+            import resource
+            limit = mem * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except Exception:
+            pass
+    script = str(job["script"])
+    if job.get("cwd"):
+        os.chdir(job["cwd"])
+    for k, v in (job.get("env") or {}).items():
+        os.environ[str(k)] = str(v)
+    sys.argv = [script] + [str(a) for a in job.get("argv") or []]
+    sys.path.insert(0, os.path.dirname(script))
+    sys.stdin = open(os.devnull, encoding="utf-8")
+    import runpy
+    try:
+        runpy.run_path(script, run_name="__main__")
+    except MemoryError:
+        print("MemoryError: 超出 skill_runner.memory_mb 限制", file=sys.stderr)
+        return 137
+    except SystemExit:
+        raise
+    except BaseException:
+        import traceback
+        traceback.print_exc()
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
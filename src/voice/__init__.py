@@ -6,6 +6,8 @@ from voice.stt import (
     listen_sync,
     is_recording,
     preload_funasr_model,
+    add_partial_listener,
+    remove_partial_listener,
 )
 from voice.tts import (
     speak,
@@ -15,7 +17,10 @@ from voice.tts import (
     mark_agent_round_done,
     is_agent_round_done,
     schedule_clear_on_next_push,
+    prewarm_tts,
 )
+from voice.speech_queue import begin_turn, current_turn, get_speech_queue, run_in_turn
+from voice.tts_worker import get_tts_worker, speak_background
 
 __all__ = [
     "start_recording",
@@ -24,6 +29,8 @@ __all__ = [
     "listen_sync",
     "is_recording",
     "preload_funasr_model",
+    "add_partial_listener",
+    "remove_partial_listener",
     "speak",
     "speak_async",
     "push_queue",
@@ -31,4 +38,11 @@ __all__ = [
     "mark_agent_round_done",
     "is_agent_round_done",
     "schedule_clear_on_next_push",
+    "prewarm_tts",
+    "begin_turn",
+    "current_turn",
+    "get_speech_queue",
+    "run_in_turn",
+    "get_tts_worker",
+    "speak_background",
 ]
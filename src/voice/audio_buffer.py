@@ -0,0 +1,69 @@
+"""预分配的 int16 环形录音缓冲
+
+音频回调里每块只做一次（回绕时两次）切片赋值，不分配内存、不持有 Python 列表；
+停止录音后 view() 直接返回底层数组的视图（未回绕时零拷贝）。
+超过容量时覆盖最旧的音频，并在 overflow_samples 中计数。
+"""
+
+import numpy as np
+
+
+class AudioRingBuffer:
+    """单写者（音频回调）环形缓冲；读取在停止写入后进行"""
+
+    def __init__(self, capacity: int, channels: int = 1) -> None:
+        if capacity <= 0:
+            raise ValueError("capacity must be positive")
+        self.capacity = int(capacity)
+        self.channels = int(channels)
+        self._data = np.empty((self.capacity, self.channels), dtype=np.int16)
+        self._pos = 0          # 下一次写入位置
+        self._written = 0      # 累计写入样本数
+        self.overflow_samples = 0
+
+    def __len__(self) -> int:
+        return min(self._written, self.capacity)
+
+    def reset(self) -> None:
+        self._pos = 0
+        self._written = 0
+        self.overflow_samples = 0
+
+    def write(self, block: np.ndarray) -> None:
+        """写入 (frames, channels) 或 (frames,) 的 int16 块"""
+        n = len(block)
+        if n == 0:
+            return
+        if block.ndim == 1:
+            block = block.reshape(-1, 1)
+        # 本次被挤出缓冲的样本数 = 写入后超出容量的部分 - 写入前已超出的部分
+        self.overflow_samples += max(0, self._written + n - self.capacity) - max(
+            0, self._written - self.capacity
+        )
+        self._written += n
+        if n >= self.capacity:
+            # 单块超过容量：只保留最新的 capacity 个样本
+            self._data[:] = block[n - self.capacity:]
+            self._pos = 0
+            return
+        end = self._pos + n
+        if end <= self.capacity:
+            self._data[self._pos:end] = block
+        else:
+            first = self.capacity - self._pos
+            self._data[self._pos:] = block[:first]
+            self._data[:n - first] = block[first:]
+        self._pos = end % self.capacity
+
+    def views(self) -> tuple[np.ndarray, ...]:
+        """按时间顺序返回 1~2 个零拷贝视图（回绕后为 [旧的一段, 新的一段]）"""
+        if self._written <= self.capacity:
+            return (self._data[: self._written],)
+        return (self._data[self._pos:], self._data[: self._pos])
+
+    def view(self) -> np.ndarray:
+        """按时间顺序的全部音频；未回绕时为零拷贝视图，回绕后拼接一次"""
+        parts = self.views()
+        if len(parts) == 1:
+            return parts[0]
+        return np.concatenate(parts, axis=0)
@@ -0,0 +1,146 @@
+"""口型包络 - 合成时在服务端预先算出每 20ms 的张嘴幅度，前端播放时只做插值
+
+前端原先在播放中用 WebAudio 分析音频驱动口型，WebView 每帧都要做频谱分析。
+现在包络随音频 URL 一起下发（/api/speak 的 mouth 字段），前端按播放进度插值设置 PARAM_MOUTH_OPEN_Y：
+  PCM（本地引擎的 WAV）  每帧 RMS → dB，峰值以下 30dB 线性映射到 0..1，再做轻微平滑
+  MP3（edge-tts）        无需解码，按 WordBoundary 的时间把每个字展开为一次开合（正弦）
+包络量化为 uint8 后 base64 编码，10 秒音频约 670 字节。
+"""
+
+import base64
+import io
+import math
+import re
+import wave
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parents[2]
+FRAME_MS = 20
+FPS = 1000 // FRAME_MS
+_DYNAMIC_RANGE_DB = 30.0
+_SYLLABLE_RE = re.compile(r"[\u3400-\u9fff]|[A-Za-z]+|\d")
+
+
+def envelope_from_pcm(samples: np.ndarray, sample_rate: int) -> np.ndarray:
+    """int16 或 float32 单声道 PCM → 每帧 0..1 的张嘴幅度"""
+    x = np.asarray(samples)
+    x = x.astype(np.float32) / 32768.0 if x.dtype == np.int16 else x.astype(np.float32, copy=False)
+    hop = max(1, int(sample_rate * FRAME_MS / 1000))
+    n = -(-len(x) // hop)
+    if n == 0:
+        return np.zeros(0, dtype=np.float32)
+    frames = np.pad(x, (0, n * hop - len(x))).reshape(n, hop)
+    db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    peak = np.percentile(db, 95)
+    v = np.clip((db - (peak - _DYNAMIC_RANGE_DB)) / _DYNAMIC_RANGE_DB, 0.0, 1.0)
+    if n >= 3:
+        v = np.convolve(v, np.array([0.25, 0.5, 0.25], dtype=np.float32), mode="same")
+    return v.astype(np.float32)
+
+
+def envelope_from_wav(data: bytes) -> np.ndarray | None:
+    try:
+        with wave.open(io.BytesIO(data), "rb") as w:
+            if w.getsampwidth() != 2:
+                return None
+            sr, channels = w.getframerate(), w.getnchannels()
+            raw = w.readframes(w.getnframes())
+    except (wave.Error, EOFError):
+        return None
+    pcm = np.frombuffer(raw[: len(raw) // 2 * 2], dtype=np.int16)
+    if channels > 1:
+        pcm = pcm[: len(pcm) // channels * channels].reshape(-1, channels).mean(axis=1).astype(np.int16)
+    return envelope_from_pcm(pcm, sr)
+
+
+def _syllables(word: str) -> int:
+    units = _SYLLABLE_RE.findall(word)
+    return max(1, sum(1 if len(u) == 1 else max(1, round(len(u) / 3)) for u in units))
+
+
+def envelope_from_boundaries(boundaries: list[tuple[float, float, str]], total_s: float | None = None) -> np.ndarray:
+    """词边界 [(起点秒, 时长秒, 文本)] → 每个音节一次 0→1→0 的开合"""
+    if not boundaries:
+        return np.zeros(0, dtype=np.float32)
+    starts, ends = [], []
+    for off, dur, word in boundaries:
+        k = _syllables(word)
+        edges = off + max(dur, 0.04) * np.arange(k + 1) / k
+        starts.append(edges[:-1])
+        ends.append(edges[1:])
+    s = np.concatenate(starts)
+    e = np.concatenate(ends)
+    order = np.argsort(s, kind="stable")
+    s, e = s[order], e[order]
+    total = max(float(total_s or 0.0), float(e.max()))
+    n = int(math.ceil(total * FPS))
+    t = (np.arange(n) + 0.5) / FPS
+    idx = np.searchsorted(s, t, side="right") - 1
+    valid = idx >= 0
+    idx = np.clip(idx, 0, len(s) - 1)
+    phase = (t - s[idx]) / np.maximum(e[idx] - s[idx], 1e-3)
+    inside = valid & (phase < 1.0)
+    return np.where(inside, 0.9 * np.sin(np.pi * np.clip(phase, 0.0, 1.0)), 0.0).astype(np.float32)
+
+
+def envelope_for(engine, data: bytes, boundaries: list | None = None) -> bytes | None:
+    """按引擎输出格式计算包络，返回量化后的 uint8 字节；无法计算时返回 None（前端退回实时分析）"""
+    if not data:
+        return None
+    env = None
+    if getattr(engine, "mime", "") == "audio/wav":
+        env = envelope_from_wav(data)
+    elif boundaries:
+        try:
+            total = engine.audio_seconds(data)
+        except Exception:
+            total = None
+        env = envelope_from_boundaries(boundaries, total)
+    if env is None or not len(env):
+        return None
+    return np.round(np.clip(env, 0.0, 1.0) * 255).astype(np.uint8).tobytes()
+
+
+def encode(mouth: bytes) -> dict:
+    return {"fps": FPS, "data": base64.b64encode(mouth).decode("ascii")}
+
+
+def decode(payload: dict) -> np.ndarray:
+    raw = base64.b64decode(payload.get("data") or "")
+    return np.frombuffer(raw, dtype=np.uint8).astype(np.float32) / 255.0
+
+
+def is_enabled() -> bool:
+    try:
+        import yaml
+        cfg = ROOT / "config" / "zhyx.yaml"
+        if cfg.exists():
+            with open(cfg, encoding="utf-8") as f:
+                d = yaml.safe_load(f) or {}
+            return bool((d.get("tts") or {}).get("lipsync", True))
+    except Exception:
+        pass
+    return True
+
+
+def mouth_for_url(url: str) -> dict | None:
+    """/api/speak 下发的口型信息：已算好则直接给包络；分段仍在合成则给出稍后获取的地址"""
+    from voice.tts_stream import get_segment_store, segment_id_from_url
+    seg_id = segment_id_from_url(url)
+    if seg_id is not None:
+        seg = get_segment_store().get(seg_id)
+        if seg is None:
+            return None
+        if seg.mouth is not None:
+            return encode(seg.mouth)
+        return None if seg.done else {"url": f"{seg.url}/mouth"}
+    if "tts/cache/" in url:
+        from voice.tts_cache import mouth_path_for
+        p = mouth_path_for(url)
+        try:
+            return encode(p.read_bytes()) if p is not None else None
+        except OSError:
+            return None
+    return None
@@ -0,0 +1,210 @@
+"""播放队列 - 按对话轮次（turn）组织待播放的 TTS 分段，支持插话打断
+
+语音线程、asyncio.run 建立的事件循环与形象 HTTP 线程都会读写队列，因此所有状态都由一把锁保护。
+每轮对话有递增的 turn id：用户开始说话（或免按键收音检测到新一句）时 begin_turn，
+上一轮随即作废——已入队未播放的分段被丢弃并释放内存，登记在该轮上的取消回调被调用
+（取消仍在进行的 LLM 请求、工具调用与 TTS 合成），之后作废轮次的 push / 结束标记一律忽略。
+
+轮次通过 contextvars 随协程传递：run_in_turn 把当前轮次绑定到任务上下文，
+speak_async、mark_round_done 等不必显式传参即可知道自己属于哪一轮。
+
+队列状态变化（入队、换轮、本轮结束）时发布 speech 事件（core.events），
+形象服务的 /api/events 据此立即把分段推给前端，不必等下一次轮询。
+"""
+
+import asyncio
+import contextvars
+import threading
+from collections import deque
+from typing import Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+_turn_ctx: contextvars.ContextVar[int | None] = contextvars.ContextVar("speech_turn", default=None)
+
+
+def _release_segment(url: str) -> None:
+    try:
+        from voice.tts_stream import get_segment_store
+        get_segment_store().release_url(url)
+    except Exception:
+        pass
+
+
+def _notify_changed() -> None:
+    try:
+        from core.events import publish
+        publish("speech")
+    except Exception:
+        pass
+
+
+class SpeechQueue:
+    def __init__(self, release: Callable[[str], None] = _release_segment,
+                 notify: Callable[[], None] = _notify_changed) -> None:
+        self._lock = threading.Lock()
+        self._turn = 0
+        self._items: deque[str] = deque()
+        self._issued: dict[str, int] = {}  # 已入队、尚未上报播放完的 url → turn
+        self._cancels: dict[int, list[Callable[[], None]]] = {}
+        self._round_done = False
+        self._pending_clear = False
+        self._release = release
+        self._notify = notify
+
+    @property
+    def turn(self) -> int:
+        with self._lock:
+            return self._turn
+
+    def is_current(self, turn: int | None) -> bool:
+        with self._lock:
+            return turn is None or turn == self._turn
+
+    def begin_turn(self) -> int:
+        """开始新一轮：作废之前所有轮次，丢弃其分段并触发取消回调。返回新 turn id"""
+        with self._lock:
+            self._turn += 1
+            turn = self._turn
+            stale = list(self._issued)
+            self._items.clear()
+            self._issued.clear()
+            cancels = [fn for t, fns in self._cancels.items() if t < turn for fn in fns]
+            self._cancels = {t: fns for t, fns in self._cancels.items() if t >= turn}
+            self._round_done = False
+            self._pending_clear = False
+        for fn in cancels:
+            try:
+                fn()
+            except Exception:
+                pass
+        for url in stale:
+            self._release(url)
+        self._notify()
+        return turn
+
+    def on_cancel(self, turn: int, fn: Callable[[], None]) -> None:
+        """登记 turn 作废时要执行的回调；turn 已作废则立即执行"""
+        with self._lock:
+            if turn >= self._turn:
+                self._cancels.setdefault(turn, []).append(fn)
+                return
+        fn()
+
+    def remove_cancel(self, turn: int, fn: Callable[[], None]) -> None:
+        with self._lock:
+            fns = self._cancels.get(turn)
+            if fns and fn in fns:
+                fns.remove(fn)
+                if not fns:
+                    del self._cancels[turn]
+
+    def push(self, url: str, turn: int | None = None) -> bool:
+        """入队；turn 已作废则释放该分段并返回 False"""
+        url = url.strip()
+        with self._lock:
+            current = turn is None or turn == self._turn
+            if current:
+                self._items.append(url)
+                self._issued[url] = self._turn
+        if current:
+            self._notify()
+        else:
+            self._release(url)
+        return current
+
+    def pop(self) -> str | None:
+        with self._lock:
+            return self._items.popleft() if self._items else None
+
+    def poll(self) -> tuple[str | None, int, bool]:
+        """前端轮询用：原子地取出 (下一段 url, 当前 turn, 本轮是否已结束)"""
+        with self._lock:
+            url = self._items.popleft() if self._items else None
+            return url, self._turn, self._round_done
+
+    def requeue(self, urls: list[str], turn: int) -> int:
+        """把已取出但未送达前端的分段按原顺序放回队首；turn 已作废或分段已释放的跳过。返回放回的个数"""
+        with self._lock:
+            if turn != self._turn:
+                return 0
+            back = [u for u in urls if self._issued.get(u) == turn and u not in self._items]
+            self._items.extendleft(reversed(back))
+        if back:
+            self._notify()
+        return len(back)
+
+    def segment_done(self, url: str) -> None:
+        """前端播放完某段：释放播放方对该分段的引用（前端上报的是完整 URL）"""
+        with self._lock:
+            key = next((u for u in self._issued if url.endswith(u)), None)
+            if key is not None:
+                del self._issued[key]
+        if key is not None:
+            self._release(key)
+
+    def has_pending(self) -> bool:
+        with self._lock:
+            return bool(self._items)
+
+    def mark_round_done(self, turn: int | None = None) -> None:
+        with self._lock:
+            changed = (turn is None or turn == self._turn) and not self._round_done
+            if changed:
+                self._round_done = True
+        if changed:
+            self._notify()
+
+    def is_round_done(self) -> bool:
+        with self._lock:
+            return self._round_done
+
+    def schedule_clear(self) -> None:
+        with self._lock:
+            self._pending_clear = True
+
+    def take_pending_clear(self) -> bool:
+        """取出并复位“下次入队前清理”标记，同时复位本轮结束标记"""
+        with self._lock:
+            pending, self._pending_clear = self._pending_clear, False
+            if pending:
+                self._round_done = False
+            return pending
+
+
+_queue = SpeechQueue()
+
+
+def get_speech_queue() -> SpeechQueue:
+    return _queue
+
+
+def begin_turn() -> int:
+    return _queue.begin_turn()
+
+
+def current_turn() -> int:
+    """当前上下文所属轮次；不在 run_in_turn 内时为最新一轮"""
+    turn = _turn_ctx.get()
+    return _queue.turn if turn is None else turn
+
+
+async def run_in_turn(coro: Awaitable[T], turn: int | None = None) -> T | None:
+    """在 turn 上下文中运行协程（LLM 对话、工具调用、朗读）；turn 被新一轮取代时取消并返回 None"""
+    turn = current_turn() if turn is None else turn
+    _turn_ctx.set(turn)
+    task = asyncio.ensure_future(coro)
+    loop = asyncio.get_running_loop()
+
+    def _cancel() -> None:
+        loop.call_soon_threadsafe(task.cancel)
+
+    _queue.on_cancel(turn, _cancel)
+    try:
+        return await task
+    except asyncio.CancelledError:
+        if task.cancelled() and not _queue.is_current(turn):
+            return None
+        raise
+    finally:
+        _queue.remove_cancel(turn, _cancel)
@@ -1,18 +1,20 @@
 """STT 语音识别 - FunASR（阿里 Paraformer 中文专用）"""
 
-import os
-import tempfile
 import threading
-import wave
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parents[2]
 
 _stream = None
-_buffer = []
+_buffer = None  # AudioRingBuffer，录音开始时按 stt.max_record_s 预分配
+_streamer = None
+_partial_listeners: list = []
 _voice_history: list[dict] = []
 _MAX_HISTORY = 10
 _funasr_model = None
+_SAMPLE_RATE = 16000
+_DEFAULT_MAX_RECORD_S = 120
+_STT_READY_TIMEOUT = 300
 
 
 def _get_stt_config():
@@ -41,6 +43,46 @@ def _is_debug() -> bool:
     return False
 
 
+def _is_streaming_mode() -> bool:
+    return (_get_stt_config().get("mode") or "offline") == "streaming"
+
+
+def add_partial_listener(fn) -> None:
+    """注册部分识别结果监听 fn(text: str, final: bool)；流式模式下边说边回调"""
+    if fn not in _partial_listeners:
+        _partial_listeners.append(fn)
+
+
+def remove_partial_listener(fn) -> None:
+    try:
+        _partial_listeners.remove(fn)
+    except ValueError:
+        pass
+
+
+def _emit_partial(text: str, final: bool = False) -> None:
+    for fn in list(_partial_listeners):
+        try:
+            fn(text, final)
+        except Exception:
+            pass
+
+
+def _start_streamer():
+    """流式模式下为本次录音创建 StreamingRecognizer；模型不可用时返回 None（回退离线识别）"""
+    from voice.stt_stream import StreamingRecognizer, load_streaming_model
+
+    cfg = _get_stt_config()
+    model = load_streaming_model(cfg.get("streaming_model") or "paraformer-zh-streaming")
+    if model is None:
+        return None
+    return StreamingRecognizer(
+        model,
+        on_partial=_emit_partial,
+        punctuate=bool(cfg.get("streaming_punc", True)),
+    )
+
+
 def _maybe_debug_stt(text: str | None):
     if not _is_debug():
         return
@@ -50,21 +92,124 @@ def _maybe_debug_stt(text: str | None):
         print("[STT] (无识别结果)", flush=True)
 
 
-def _recognize(data: bytes, sample_rate: int = 16000) -> str | None:
-    cfg = _get_stt_config()
-    return _recognize_funasr(data, sample_rate)
+def _to_float32(audio, channels: int = 1):
+    """录音缓冲 → 单声道 float32 [-1, 1]（FunASR 读 WAV 后得到的同一表示），全程向量化
+
+    接受 int16 PCM 字节、int16 / float32 ndarray（(n,) 或 (n, channels)）。
+    """
+    import numpy as np
+
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        audio = np.frombuffer(audio, dtype=np.int16)
+        if channels > 1:
+            audio = audio.reshape(-1, channels)
+    arr = np.asarray(audio)
+    if arr.ndim > 1 and arr.shape[1] == 1:
+        arr = arr.reshape(-1)
+    if arr.dtype == np.int16:
+        out = np.empty(arr.shape, dtype=np.float32)
+        np.multiply(arr, np.float32(1.0 / 32768.0), out=out, casting="unsafe")
+    else:
+        out = np.ascontiguousarray(arr, dtype=np.float32)
+    if out.ndim > 1:
+        out = out.mean(axis=1, dtype=np.float32)
+    return out
+
+
+def _wait_stt_ready() -> None:
+    """启动早期录下的语音先排队：等后台编排把 STT 模型加载完（未使用编排时立即返回）"""
+    from core.startup import is_ready, wait_ready
+    if not is_ready("stt"):
+        if _is_debug():
+            print("[STT] 模型加载中，录音已排队", flush=True)
+        wait_ready("stt", timeout=_STT_READY_TIMEOUT)
+
+
+def _recognize(audio, sample_rate: int = 16000) -> str | None:
+    """识别一段录音；audio 为 int16 PCM 字节或 numpy 数组，直接在内存中交给模型。
+    stt.server.enabled 时交给独立进程的模型服务，服务不可达则回退本进程识别。"""
+    _wait_stt_ready()
+    from voice import stt_server
+    if stt_server.is_enabled():
+        try:
+            return stt_server.transcribe(audio, sample_rate)
+        except OSError as e:
+            if _is_debug():
+                print(f"[STT] 模型服务不可达，改用本进程识别: {e}", flush=True)
+        except RuntimeError as e:
+            if _is_debug():
+                print(f"[STT] 模型服务识别失败: {e}", flush=True)
+            return None
+    return _recognize_local(audio, sample_rate)
+
+
+def _recognize_local(audio, sample_rate: int = 16000) -> str | None:
+    """在本进程内识别（模型服务进程也走这里）"""
+    return _recognize_funasr(audio, sample_rate)
 
 
 def preload_funasr_model() -> bool:
-    """启动时预加载 FunASR 模型。"""
+    """启动时预加载 FunASR 模型（流式模式下同时预加载在线模型与标点模型；
+    启用模型服务时只确保服务进程在运行，本进程不加载离线模型）。"""
     cfg = _get_stt_config()
-    try:
-        from funasr import AutoModel
-    except ImportError:
-        return False
+    if _is_streaming_mode():
+        from voice.stt_stream import _load_punc_model, load_streaming_model
+        print("[STT] 正在预加载 FunASR 流式模型...", flush=True)
+        if load_streaming_model(cfg.get("streaming_model") or "paraformer-zh-streaming") is not None:
+            if cfg.get("streaming_punc", True):
+                _load_punc_model()
+            print("[STT] FunASR 流式模型加载完成", flush=True)
+            return True
+    from voice import stt_server
+    if stt_server.is_enabled() and stt_server.ensure_server(wait=stt_server.DEFAULT_SPAWN_WAIT):
+        print(f"[STT] 使用模型服务 {stt_server.get_socket_path()}", flush=True)
+        return True
+    return preload_local_model()
+
+
+_model_lock = threading.Lock()
+
+
+def preload_local_model() -> bool:
+    """在本进程加载离线 FunASR 模型"""
+    with _model_lock:
+        return _load_local_model()
+
+
+def get_offline_model():
+    """本进程的离线 FunASR 模型（首次调用时加载），不可用时返回 None"""
+    if _funasr_model is None:
+        preload_local_model()
+    return _funasr_model
+
+
+def _load_local_model() -> bool:
     global _funasr_model
     if _funasr_model is not None:
         return True
+    cfg = _get_stt_config()
+    if (cfg.get("backend") or "torch") == "onnx":
+        try:
+            from voice.stt_onnx import load_onnx_model
+            print("[STT] 正在加载 ONNX 量化模型...", flush=True)
+            _funasr_model = load_onnx_model(cfg)
+            print("[STT] ONNX 模型加载完成", flush=True)
+            return True
+        except ImportError:
+            print("[STT] ONNX 后端需安装: pip install funasr-onnx onnxruntime", flush=True)
+            return False
+        except Exception as e:
+            print(f"[STT] ONNX 模型加载失败: {e}", flush=True)
+            return False
+    try:
+        from funasr import AutoModel
+    except ImportError as e:
+        if _is_debug():
+            if "torchaudio" in str(e) or "torch" in str(e):
+                print("[STT] FunASR 依赖缺失，请执行: pip install torchaudio", flush=True)
+            else:
+                print("[STT] FunASR 未安装，请执行: pip install funasr modelscope", flush=True)
+        return False
     model_id = cfg.get("funasr_model") or "paraformer-zh"
     try:
         print("[STT] 正在预加载 FunASR 模型...", flush=True)
@@ -82,69 +227,48 @@ def preload_funasr_model() -> bool:
         return False
 
 
-def _recognize_funasr(data: bytes, sample_rate: int) -> str | None:
-    global _funasr_model
-    try:
-        from funasr import AutoModel
-    except ImportError as e:
-        if _is_debug():
-            if "torchaudio" in str(e) or "torch" in str(e):
-                print("[STT] FunASR 依赖缺失，请执行: pip install torchaudio", flush=True)
-            else:
-                print("[STT] FunASR 未安装，请执行: pip install funasr modelscope", flush=True)
+def _recognize_funasr(audio, sample_rate: int) -> str | None:
+    """用离线模型识别（torch AutoModel 或 ONNX 后端，接口相同）"""
+    model = get_offline_model()
+    if model is None:
         return None
 
-    cfg = _get_stt_config()
-    model_id = cfg.get("funasr_model") or "paraformer-zh"
     try:
-        if _funasr_model is None:
-            if _is_debug():
-                print("[STT] 正在加载 FunASR 模型（首次较慢）...", flush=True)
-            _funasr_model = AutoModel(
-                model=model_id,
-                vad_model="fsmn-vad",
-                punc_model="ct-punc",
-                device="cpu",
-                disable_update=True,
-            )
-        model = _funasr_model
+        samples = _to_float32(audio)
     except Exception as e:
         if _is_debug():
-            print("[STT] FunASR 模型加载失败:", str(e), flush=True)
+            print("[STT] 音频格式无法识别:", str(e), flush=True)
         return None
-
-    dur_sec = len(data) / (sample_rate * 2)
+    dur_sec = len(samples) / sample_rate
     if dur_sec < 0.5 and _is_debug():
         print(f"[STT] 录音过短 ({dur_sec:.1f}s)，请说话至少 1 秒", flush=True)
 
     try:
-        with tempfile.NamedTemporaryFile(suffix=".wav", delete=False) as f:
-            path = f.name
-        try:
-            with wave.open(path, "wb") as w:
-                w.setnchannels(1)
-                w.setsampwidth(2)
-                w.setframerate(sample_rate)
-                w.writeframes(data)
-            res = model.generate(input=path, batch_size_s=0)
-            if res and len(res) > 0:
-                text = (res[0].get("text") or "").strip()
-                return text or None
-            if _is_debug():
-                print("[STT] FunASR 识别结果为空（可能是静音或无明显语音）", flush=True)
-        finally:
-            try:
-                os.unlink(path)
-            except Exception:
-                pass
+        res = model.generate(input=samples, fs=sample_rate, batch_size_s=0)
+        if res and len(res) > 0:
+            text = (res[0].get("text") or "").strip()
+            return text or None
+        if _is_debug():
+            print("[STT] FunASR 识别结果为空（可能是静音或无明显语音）", flush=True)
     except Exception as e:
         if _is_debug():
             print("[STT] FunASR 识别异常:", str(e), flush=True)
     return None
 
 
+def _recognize_buffered(rec) -> str | None:
+    """整段识别按键录音；流式模式下（启动早期未能边录边识别）把整段喂给流式识别器"""
+    if _is_streaming_mode():
+        _wait_stt_ready()
+        streamer = _start_streamer()
+        if streamer is not None:
+            streamer.feed(rec)
+            return streamer.finish()
+    return _recognize(rec, _SAMPLE_RATE)
+
+
 def start_recording() -> bool:
-    global _stream, _buffer
+    global _stream, _buffer, _streamer
     try:
         import sounddevice as sd
     except ImportError:
@@ -152,27 +276,44 @@ def start_recording() -> bool:
     if _stream is not None:
         return True
 
-    _buffer = []
+    # 用户开始说话即视为插话：作废上一轮回答（停止其合成、LLM 与工具调用，丢弃待播分段）
+    from voice.speech_queue import begin_turn
+    begin_turn()
+    _buffer = None
+    # STT 尚在后台加载时先整段录进缓冲，松开后再识别，不阻塞开始录音
+    from core.startup import is_ready
+    _streamer = _start_streamer() if _is_streaming_mode() and is_ready("stt") else None
+    streamer = _streamer
+    if streamer is None:
+        from voice.audio_buffer import AudioRingBuffer
+        max_s = float(_get_stt_config().get("max_record_s") or _DEFAULT_MAX_RECORD_S)
+        _buffer = AudioRingBuffer(int(max_s * _SAMPLE_RATE))
+    ring = _buffer
 
     def _audio_callback(indata, frames, time_info, status):
-        _buffer.append(indata.copy())
+        if streamer is not None:
+            streamer.feed(indata)
+        else:
+            ring.write(indata)
 
     try:
         _stream = sd.InputStream(
-            samplerate=16000, channels=1, dtype="int16", callback=_audio_callback
+            samplerate=_SAMPLE_RATE, channels=1, dtype="int16", callback=_audio_callback
         )
         _stream.start()
         return True
     except Exception:
         _stream = None
+        if _streamer is not None:
+            _streamer.cancel()
+            _streamer = None
         return False
 
 
 def stop_recording_and_speak(callback=None) -> bool:
-    global _stream, _buffer
+    global _stream, _buffer, _streamer
     try:
         import sounddevice as sd
-        import numpy as np
     except ImportError:
         if callback:
             callback(None)
@@ -187,21 +328,20 @@ def stop_recording_and_speak(callback=None) -> bool:
     except Exception:
         pass
     _stream = None
-    if not _buffer:
-        if callback:
-            callback(None)
-        return True
-    try:
-        rec = np.concatenate(_buffer, axis=0)
-        data = rec.tobytes()
-    except Exception:
-        if callback:
-            callback(None)
-        _buffer = []
-        return True
-    _buffer = []
-
-    text = _recognize(data, 16000)
+    if _streamer is not None:
+        # 流式：录音期间已逐块解码，这里只需冲刷尾块
+        streamer, _streamer = _streamer, None
+        text = streamer.finish()
+        _emit_partial(text or "", final=True)
+    else:
+        ring, _buffer = _buffer, None
+        if ring is None or not len(ring):
+            if callback:
+                callback(None)
+            return True
+        if ring.overflow_samples and _is_debug():
+            print(f"[STT] 录音超过 max_record_s，丢弃最早的 {ring.overflow_samples / _SAMPLE_RATE:.1f}s", flush=True)
+        text = _recognize_buffered(ring.view())
     _maybe_debug_stt(text)
     if not text or not text.strip():
         if callback:
@@ -211,61 +351,49 @@ def stop_recording_and_speak(callback=None) -> bool:
     if callback:
         callback(user_text)
     else:
-        def _query_and_speak():
-            import asyncio
-            from core.chat import chat_with_mcp_tools
-            from voice.tts import speak_async
-            global _voice_history
-            try:
-                reply = asyncio.run(chat_with_mcp_tools(
-                    user_text, history=_voice_history.copy(), on_speak=speak_async
-                ))
-                if reply and reply.strip():
-                    _voice_history.append({"role": "user", "content": user_text})
-                    _voice_history.append({"role": "assistant", "content": reply.strip()})
-                    if len(_voice_history) > _MAX_HISTORY:
-                        _voice_history = _voice_history[-_MAX_HISTORY:]
-                elif not reply or not reply.strip():
-                    asyncio.run(speak_async("抱歉，我没有理解你的问题。"))
-            except Exception as e:
-                import traceback
-                print("[错误]", str(e), flush=True)
-                traceback.print_exc()
-                asyncio.run(speak_async(f"出错了：{e}" if str(e) else "请求大模型失败，请检查服务是否开启。"))
-
-        threading.Thread(target=_query_and_speak, daemon=True).start()
+        from voice.speech_queue import current_turn
+        threading.Thread(target=_answer, args=(user_text, current_turn()), daemon=True).start()
     return True
 
 
+def _answer(user_text: str, turn: int) -> None:
+    """请求大模型并朗读回复。turn 被新一轮（用户插话）取代时，LLM 请求、工具调用与合成一并取消"""
+    import asyncio
+    from core.chat import chat_with_mcp_tools
+    from voice.speech_queue import get_speech_queue, run_in_turn
+    from voice.tts_worker import speak_background
+    global _voice_history
+    try:
+        # 朗读交给后台合成，LLM 下一轮请求与工具调用不必等待
+        reply = asyncio.run(run_in_turn(chat_with_mcp_tools(
+            user_text, history=_voice_history.copy(), on_speak=speak_background, caller="voice"
+        ), turn))
+        if not get_speech_queue().is_current(turn):
+            if _is_debug():
+                print(f"[对话] 已被打断: {user_text[:30]}", flush=True)
+            return
+        if reply and reply.strip():
+            _voice_history.append({"role": "user", "content": user_text})
+            _voice_history.append({"role": "assistant", "content": reply.strip()})
+            if len(_voice_history) > _MAX_HISTORY:
+                _voice_history = _voice_history[-_MAX_HISTORY:]
+        else:
+            asyncio.run(run_in_turn(speak_background("抱歉，我没有理解你的问题。"), turn))
+    except Exception as e:
+        import traceback
+        print("[错误]", str(e), flush=True)
+        traceback.print_exc()
+        # 排在已提交的朗读之后，保持播放顺序
+        asyncio.run(run_in_turn(
+            speak_background(f"出错了：{e}" if str(e) else "请求大模型失败，请检查服务是否开启。"), turn
+        ))
+
+
 def is_recording() -> bool:
     return _stream is not None
 
 
 def listen_and_speak(callback=None):
-    user_text = [""]
-
-    def _query_and_speak():
-        import asyncio
-        from core.chat import chat_with_mcp_tools
-        from voice.tts import speak_async
-        global _voice_history
-        try:
-            reply = asyncio.run(chat_with_mcp_tools(
-                user_text[0], history=_voice_history.copy(), on_speak=speak_async
-            ))
-            if reply and reply.strip():
-                _voice_history.append({"role": "user", "content": user_text[0]})
-                _voice_history.append({"role": "assistant", "content": reply.strip()})
-                if len(_voice_history) > _MAX_HISTORY:
-                    _voice_history = _voice_history[-_MAX_HISTORY:]
-            elif not reply or not reply.strip():
-                asyncio.run(speak_async("抱歉，我没有理解你的问题。"))
-        except Exception as e:
-            import traceback
-            print("[错误]", str(e), flush=True)
-            traceback.print_exc()
-            asyncio.run(speak_async(f"出错了：{e}" if str(e) else "请求大模型失败，请检查服务是否开启。"))
-
     def _run():
         text = _listen_impl()
         _maybe_debug_stt(text)
@@ -273,16 +401,45 @@ def listen_and_speak(callback=None):
             if callback:
                 callback(None)
             return
-        user_text[0] = text.strip()
+        user_text = text.strip()
         if callback:
-            callback(user_text[0])
+            callback(user_text)
         else:
-            threading.Thread(target=_query_and_speak, daemon=True).start()
+            from voice.speech_queue import begin_turn
+            threading.Thread(target=_answer, args=(user_text, begin_turn()), daemon=True).start()
 
-    user_text = ""
     threading.Thread(target=_run, daemon=True).start()
 
 
+def _listen_vad(sd, fs: int, cfg: dict):
+    """持续收音直到 VAD 判定说完；回调只负责入队，端点检测在当前线程进行"""
+    import queue
+    from voice.vad import Endpointer
+
+    ep = Endpointer(
+        fs,
+        silence_ms=int(cfg.get("vad_silence_ms") or 800),
+        preroll_ms=int(cfg.get("vad_preroll_ms") or 300),
+        max_s=float(cfg.get("vad_max_s") or 30),
+        timeout_s=float(cfg.get("vad_timeout_s") or 8),
+    )
+    blocks: queue.Queue = queue.Queue()
+
+    def _audio_callback(indata, frames, time_info, status):
+        blocks.put(indata.copy())
+
+    try:
+        with sd.InputStream(samplerate=fs, channels=1, dtype="int16",
+                            blocksize=ep.frame_len, callback=_audio_callback):
+            while not ep.feed(blocks.get(timeout=2)):
+                pass
+    except Exception:
+        return None
+    if ep.timed_out and _is_debug():
+        print("[STT] 未检测到说话", flush=True)
+    return ep.audio()
+
+
 def _listen_impl() -> str | None:
     try:
         import sounddevice as sd
@@ -290,16 +447,20 @@ def _listen_impl() -> str | None:
     except ImportError:
         return None
     fs = 16000
+    cfg = _get_stt_config()
+    if (cfg.get("listen_mode") or "fixed") == "vad":
+        rec = _listen_vad(sd, fs, cfg)
+        return _recognize(rec, fs) if rec is not None else None
     duration = 5
     try:
         rec = sd.rec(int(duration * fs), samplerate=fs, channels=1, dtype="int16")
         sd.wait()
     except Exception:
         return None
-    data = rec.tobytes()
-    return _recognize(data, fs)
+    return _recognize(rec, fs)
 
 
 def listen_sync() -> str | None:
-    """同步录音识别，返回文字，失败返回 None。会阻塞约 5 秒。"""
+    """同步录音识别，返回文字，失败返回 None。
+    listen_mode: fixed 阻塞约 5 秒；vad 从开口录到尾部静音 vad_silence_ms 为止。"""
     return _listen_impl()
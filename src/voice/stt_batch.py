@@ -0,0 +1,146 @@
+"""批量语音转写 - 把排队中的音频文件合并成一次 model.generate 调用
+
+HTTP 上传先落盘（见 api.app 的 POST /stt），这里只接收文件路径：
+推理线程取出第一个任务后最多再等 batch_wait_ms 收集同批任务（不超过 max_batch 个），
+以 model.generate(input=[路径...], batch_size_s=...) 一次完成，按 key（文件名）把结果分发回各请求。
+stt.server.enabled 时整批交给独立进程的模型服务（API 进程不加载 FunASR），服务不可达才回退本进程模型。
+"""
+
+import queue
+import threading
+import time
+import wave
+from concurrent.futures import Future
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+UPLOAD_DIR = ROOT / "data" / "stt_uploads"
+
+_DEFAULT_BATCH_SIZE_S = 300
+_DEFAULT_MAX_BATCH = 16
+_DEFAULT_WAIT_MS = 50
+
+
+def _get_batch_config() -> dict:
+    try:
+        import yaml
+        cfg = ROOT / "config" / "zhyx.yaml"
+        if cfg.exists():
+            with open(cfg, encoding="utf-8") as f:
+                d = yaml.safe_load(f) or {}
+            return (d.get("stt") or {}).get("batch") or {}
+    except Exception:
+        pass
+    return {}
+
+
+def audio_duration(path: Path) -> float | None:
+    """WAV 直接读头部取时长；其他格式返回 None"""
+    try:
+        with wave.open(str(path), "rb") as w:
+            return w.getnframes() / float(w.getframerate())
+    except Exception:
+        return None
+
+
+class STTBatcher:
+    """单推理线程 + 任务队列；submit() 返回 Future[{"text", "duration"}]"""
+
+    def __init__(self, model_loader=None, batch_size_s: int = _DEFAULT_BATCH_SIZE_S,
+                 max_batch: int = _DEFAULT_MAX_BATCH, wait_ms: int = _DEFAULT_WAIT_MS) -> None:
+        self._model_loader = model_loader
+        self.batch_size_s = int(batch_size_s)
+        self.max_batch = max(1, int(max_batch))
+        self.wait_s = max(0, int(wait_ms)) / 1000
+        self._queue: queue.Queue = queue.Queue()
+        self._thread: threading.Thread | None = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.files = 0
+        self.audio_seconds = 0.0
+
+    def _model(self):
+        if self._model_loader is not None:
+            return self._model_loader()
+        from voice.stt import get_offline_model
+        return get_offline_model()
+
+    def submit(self, path: Path) -> Future:
+        fut: Future = Future()
+        self._queue.put((Path(path), fut))
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return fut
+
+    def stats(self) -> dict:
+        return {
+            "queued": self._queue.qsize(),
+            "batches": self.batches,
+            "files": self.files,
+            "audio_seconds": round(self.audio_seconds, 1),
+        }
+
+    def _collect(self) -> list[tuple[Path, Future]]:
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.wait_s
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return [(p, f) for p, f in batch if f.set_running_or_notify_cancel()]
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            if batch:
+                self._process(batch)
+
+    def _generate(self, paths: list[Path]) -> list:
+        if self._model_loader is None:
+            from voice import stt_server
+            if stt_server.is_enabled() and stt_server.ensure_server(wait=stt_server.DEFAULT_SPAWN_WAIT):
+                try:
+                    return stt_server.transcribe_files(paths, self.batch_size_s)
+                except OSError:
+                    pass  # 服务不可达，改用本进程模型
+        model = self._model()
+        if model is None:
+            raise RuntimeError("STT 模型不可用")
+        return model.generate(input=[str(p) for p in paths], batch_size_s=self.batch_size_s)
+
+    def _process(self, batch: list[tuple[Path, Future]]) -> None:
+        try:
+            res = self._generate([p for p, _ in batch])
+        except Exception as e:
+            for _, fut in batch:
+                fut.set_exception(e)
+            return
+        by_key = {str(r.get("key")): r for r in res or [] if isinstance(r, dict)}
+        self.batches += 1
+        for i, (path, fut) in enumerate(batch):
+            r = by_key.get(path.stem)
+            if r is None and res and i < len(res):
+                r = res[i]
+            dur = audio_duration(path)
+            self.files += 1
+            self.audio_seconds += dur or 0.0
+            fut.set_result({"text": ((r or {}).get("text") or "").strip(), "duration": dur})
+
+
+_batcher: STTBatcher | None = None
+
+
+def get_stt_batcher() -> STTBatcher:
+    global _batcher
+    if _batcher is None:
+        cfg = _get_batch_config()
+        _batcher = STTBatcher(
+            batch_size_s=cfg.get("batch_size_s") or _DEFAULT_BATCH_SIZE_S,
+            max_batch=cfg.get("max_batch") or _DEFAULT_MAX_BATCH,
+            wait_ms=cfg.get("wait_ms") if cfg.get("wait_ms") is not None else _DEFAULT_WAIT_MS,
+        )
+    return _batcher
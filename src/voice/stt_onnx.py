@@ -0,0 +1,157 @@
+"""ONNX Runtime 后端 - int8 量化 Paraformer（funasr_onnx），加载快、常驻内存小
+
+对外提供与 funasr.AutoModel 相同形状的 generate(input=..., fs=..., batch_size_s=...)，
+返回 [{"key", "text"}]，因此 stt._recognize_funasr 与批量转写无需区分后端。
+流程与 torch 版 AutoModel 一致：fsmn-vad 切分 → Paraformer 识别各段 → ct-punc 加标点。
+输入与 torch 版一致：16bit WAV 直接读取，其他格式（mp3 / m4a / webm 等）与 funasr 一样交给 ffmpeg 解码，
+任意采样率重采样到 16kHz。默认模型为 ModelScope 上已导出的 -onnx 版本，无需 torch 即可加载。
+"""
+
+import os
+import shutil
+import subprocess
+import wave
+from pathlib import Path
+
+import numpy as np
+
+# -pytorch 版模型需 funasr + torch 现场导出，这里用已导出的 -onnx 版本
+DEFAULT_ASR = "damo/speech_paraformer-large_asr_nat-zh-cn-16k-common-vocab8404-onnx"
+DEFAULT_VAD = "damo/speech_fsmn_vad_zh-cn-16k-common-onnx"
+DEFAULT_PUNC = "damo/punc_ct-transformer_zh-cn-common-vocab272727-onnx"
+_SAMPLE_RATE = 16000
+# 单段最长送入 Paraformer 的时长，过长的 VAD 段再按此切分
+_MAX_SEGMENT_S = 30
+
+
+def _resample(audio: np.ndarray, sr: int) -> np.ndarray:
+    if sr == _SAMPLE_RATE or not len(audio):
+        return audio
+    # 线性插值重采样（语音场景足够），避免为此引入 librosa
+    n = int(len(audio) * _SAMPLE_RATE / sr)
+    return np.interp(
+        np.linspace(0, len(audio) - 1, n, dtype=np.float64), np.arange(len(audio)), audio
+    ).astype(np.float32)
+
+
+def _load_wav(path: str) -> np.ndarray | None:
+    """16bit PCM WAV → 16kHz float32；不是此格式时返回 None"""
+    try:
+        with wave.open(path, "rb") as w:
+            if w.getsampwidth() != 2:
+                return None
+            pcm = np.frombuffer(w.readframes(w.getnframes()), dtype=np.int16)
+            if w.getnchannels() > 1:
+                pcm = pcm.reshape(-1, w.getnchannels())
+            sr = w.getframerate()
+    except (wave.Error, EOFError):
+        return None
+    from voice.stt import _to_float32
+    return _resample(_to_float32(pcm), sr)
+
+
+def _load_ffmpeg(path: str) -> np.ndarray:
+    """ffmpeg 解码为 16kHz 单声道 s16le（funasr 读取非 WAV 音频的同一方式）"""
+    if shutil.which("ffmpeg") is None:
+        raise ValueError(f"非 16bit WAV 音频需要 ffmpeg 解码: {path}")
+    proc = subprocess.run(
+        ["ffmpeg", "-nostdin", "-v", "error", "-i", path,
+         "-f", "s16le", "-ac", "1", "-ar", str(_SAMPLE_RATE), "-"],
+        capture_output=True,
+    )
+    if proc.returncode != 0:
+        raise ValueError(f"音频解码失败: {path}: {proc.stderr.decode('utf-8', 'replace').strip()[:200]}")
+    from voice.stt import _to_float32
+    return _to_float32(proc.stdout)
+
+
+def _load_audio(path: str) -> np.ndarray:
+    audio = _load_wav(path)
+    return audio if audio is not None else _load_ffmpeg(path)
+
+
+def _pred_text(item) -> str:
+    """funasr_onnx 各版本 preds 可能是 str 或 (text, tokens)"""
+    preds = item.get("preds") if isinstance(item, dict) else item
+    if isinstance(preds, (list, tuple)):
+        preds = preds[0] if preds else ""
+    return str(preds or "")
+
+
+class OnnxParaformer:
+    """funasr_onnx 的 Paraformer + Fsmn_vad + CT_Transformer 组合"""
+
+    def __init__(self, asr_dir: str = DEFAULT_ASR, vad_dir: str | None = DEFAULT_VAD,
+                 punc_dir: str | None = DEFAULT_PUNC, quantize: bool = True,
+                 intra_op_threads: int = 4, batch_size: int = 1) -> None:
+        from funasr_onnx import Paraformer
+
+        threads = int(intra_op_threads) if intra_op_threads else (os.cpu_count() or 4)
+        self.asr = Paraformer(asr_dir, batch_size=batch_size, quantize=quantize,
+                              intra_op_num_threads=threads)
+        self.vad = None
+        self.punc = None
+        if vad_dir:
+            from funasr_onnx import Fsmn_vad
+            self.vad = Fsmn_vad(vad_dir, quantize=quantize, intra_op_num_threads=threads)
+        if punc_dir:
+            from funasr_onnx import CT_Transformer
+            self.punc = CT_Transformer(punc_dir, quantize=quantize, intra_op_num_threads=threads)
+
+    def _segments(self, audio: np.ndarray) -> list[np.ndarray]:
+        spans: list[tuple[int, int]] = []
+        if self.vad is not None and len(audio) > _SAMPLE_RATE:
+            try:
+                res = self.vad(audio)
+                segs = res[0] if res and isinstance(res[0], list) and res[0] and isinstance(res[0][0], list) else res
+                spans = [(int(b) * 16, int(e) * 16) for b, e in segs or []]  # ms → 样本
+            except Exception:
+                spans = []
+        if not spans:
+            spans = [(0, len(audio))]
+        step = _MAX_SEGMENT_S * _SAMPLE_RATE
+        out = []
+        for b, e in spans:
+            for s in range(b, e, step):
+                seg = audio[s:min(e, s + step)]
+                if len(seg) >= _SAMPLE_RATE // 10:
+                    out.append(seg)
+        return out
+
+    def transcribe(self, audio: np.ndarray) -> str:
+        segs = self._segments(audio)
+        if not segs:
+            return ""
+        text = "".join(_pred_text(r) for r in self.asr(segs)).replace(" ", "")
+        if text and self.punc is not None:
+            try:
+                text = self.punc(text)[0]
+            except Exception:
+                pass
+        return text
+
+    def generate(self, input, fs: int = _SAMPLE_RATE, batch_size_s: int = 0, **kwargs) -> list[dict]:
+        items = input if isinstance(input, list) else [input]
+        out = []
+        for i, item in enumerate(items):
+            if isinstance(item, (str, Path)):
+                key = Path(item).stem
+                audio = _load_audio(str(item))
+            else:
+                from voice.stt import _to_float32
+                key = f"input{i}"
+                audio = _resample(_to_float32(item), int(fs or _SAMPLE_RATE))
+            out.append({"key": key, "text": self.transcribe(audio)})
+        return out
+
+
+def load_onnx_model(cfg: dict) -> OnnxParaformer:
+    """按 config stt.onnx 段创建 ONNX 后端；未安装 funasr_onnx 时抛出 ImportError"""
+    o = cfg.get("onnx") or {}
+    return OnnxParaformer(
+        asr_dir=o.get("model") or DEFAULT_ASR,
+        vad_dir=o.get("vad_model", DEFAULT_VAD),
+        punc_dir=o.get("punc_model", DEFAULT_PUNC),
+        quantize=bool(o.get("quantize", True)),
+        intra_op_threads=int(o.get("intra_op_threads") or 4),
+    )
@@ -0,0 +1,342 @@
+"""独立进程的 STT 模型服务 - 模型只加载一次，本机任意进程通过 unix socket 调用
+
+python -m voice.stt_server [--socket PATH] [--health]
+
+FunASR 推理是 CPU 密集型，放在形象进程里会与 HTTP 服务线程、pywebview 桥争抢 GIL，
+API 进程也无法复用已加载的模型。本服务独占一个进程：
+- 协议：每个请求/响应为一行 JSON；inline 音频时请求行后紧跟 "bytes" 个原始 int16 字节
+- 音频传输：优先 shared_memory（请求里只传名字与样本数，服务端零拷贝读取），也支持 inline
+- 排队：连接线程只负责收发，识别请求进入单一队列由推理线程依次处理；队列满时返回 busy
+- 批量识别：{"op": "transcribe_files", "paths": [...]} 识别本机音频文件，一次 model.generate 处理整批（API 的 POST /stt）
+- 健康检查：{"op": "health"} 返回模型是否就绪、排队数、已处理数、运行时长
+"""
+
+import argparse
+import json
+import os
+import queue
+import socket
+import socketserver
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import Future
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_SOCKET = ROOT / "data" / "stt.sock"
+_DEFAULT_MAX_QUEUE = 16
+_CONNECT_TIMEOUT = 2.0
+_REQUEST_TIMEOUT = 300.0
+# 后台启动服务后等待 socket 可用的默认时长（服务先监听、后加载模型，通常 1–3 秒即可连上）
+DEFAULT_SPAWN_WAIT = 15.0
+_spawned: subprocess.Popen | None = None
+_spawn_lock = threading.Lock()
+
+
+def _get_server_config() -> dict:
+    try:
+        import yaml
+        cfg = ROOT / "config" / "zhyx.yaml"
+        if cfg.exists():
+            with open(cfg, encoding="utf-8") as f:
+                d = yaml.safe_load(f) or {}
+            return (d.get("stt") or {}).get("server") or {}
+    except Exception:
+        pass
+    return {}
+
+
+def get_socket_path() -> Path:
+    p = _get_server_config().get("socket")
+    if not p:
+        return DEFAULT_SOCKET
+    p = Path(p)
+    return p if p.is_absolute() else ROOT / p
+
+
+def is_enabled() -> bool:
+    return bool(_get_server_config().get("enabled", False))
+
+
+def _read_line(f) -> dict | None:
+    line = f.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+def _attach_shm(name: str):
+    """只读挂载客户端创建的共享内存；创建方负责 unlink，这里不让 resource_tracker 接管"""
+    from multiprocessing import shared_memory
+    shm = shared_memory.SharedMemory(name=name)
+    if sys.version_info < (3, 13):
+        try:
+            from multiprocessing import resource_tracker
+            resource_tracker.unregister(shm._name, "shared_memory")
+        except Exception:
+            pass
+    return shm
+
+
+class STTServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """unix socket 服务；识别请求经 self.jobs 队列交给单个推理线程"""
+
+    daemon_threads = True
+
+    def __init__(self, path: Path, max_queue: int = _DEFAULT_MAX_QUEUE) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        if self.path.exists():
+            self.path.unlink()
+        self.jobs: queue.Queue = queue.Queue(maxsize=max_queue)
+        self.started_at = time.time()
+        self.processed = 0
+        self.model_ready = False
+        self.model_error: str | None = None
+        super().__init__(str(self.path), _Handler)
+        os.chmod(self.path, 0o600)
+
+    def load_model(self) -> None:
+        from voice import stt
+        try:
+            self.model_ready = stt.preload_local_model()
+            if not self.model_ready:
+                self.model_error = "FunASR 不可用"
+        except Exception as e:
+            self.model_error = str(e)
+
+    def worker(self) -> None:
+        from voice import stt
+        while True:
+            job, fut = self.jobs.get()
+            if fut.set_running_or_notify_cancel():
+                t0 = time.perf_counter()
+                try:
+                    kind, data, arg = job
+                    if kind == "files":
+                        resp = {"ok": True, "results": self._generate_files(stt, data, arg)}
+                    else:
+                        resp = {"ok": True, "text": stt._recognize_local(data, arg)}
+                    resp["elapsed"] = round(time.perf_counter() - t0, 3)
+                    fut.set_result(resp)
+                except Exception as e:
+                    fut.set_result({"ok": False, "error": str(e)})
+            self.processed += 1
+
+    @staticmethod
+    def _generate_files(stt, paths: list[str], batch_size_s: int) -> list[dict]:
+        model = stt.get_offline_model()
+        if model is None:
+            raise RuntimeError("STT 模型不可用")
+        res = model.generate(input=paths, batch_size_s=batch_size_s)
+        return [{"key": str(r.get("key")), "text": r.get("text") or ""} for r in res or [] if isinstance(r, dict)]
+
+    def health(self) -> dict:
+        return {
+            "ok": True,
+            "model_ready": self.model_ready,
+            "model_error": self.model_error,
+            "queued": self.jobs.qsize(),
+            "max_queue": self.jobs.maxsize,
+            "processed": self.processed,
+            "uptime": round(time.time() - self.started_at, 1),
+            "pid": os.getpid(),
+        }
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self) -> None:
+        server: STTServer = self.server  # type: ignore[assignment]
+        while True:
+            try:
+                req = _read_line(self.rfile)
+            except (OSError, ValueError) as e:
+                self._reply({"ok": False, "error": f"bad request: {e}"})
+                return
+            if req is None:
+                return
+            op = req.get("op")
+            if op == "health":
+                self._reply(server.health())
+            elif op == "transcribe":
+                self._reply(self._transcribe(server, req))
+            elif op == "transcribe_files":
+                paths = req.get("paths")
+                if not isinstance(paths, list) or not all(isinstance(p, str) for p in paths):
+                    self._reply({"ok": False, "error": "bad request: paths"})
+                else:
+                    self._reply(self._submit(server, ("files", paths, int(req.get("batch_size_s") or 300))))
+            else:
+                self._reply({"ok": False, "error": f"unknown op: {op}"})
+
+    def _transcribe(self, server: STTServer, req: dict) -> dict:
+        import numpy as np
+        from voice.stt import _to_float32
+
+        sample_rate = int(req.get("sample_rate") or 16000)
+        try:
+            if req.get("shm"):
+                shm = _attach_shm(req["shm"])
+                try:
+                    pcm = np.ndarray((int(req["samples"]),), dtype=np.int16, buffer=shm.buf)
+                    # 转 float32 即完成拷贝，之后共享内存可立即释放
+                    audio = _to_float32(pcm)
+                    del pcm
+                finally:
+                    shm.close()
+            else:
+                n = int(req.get("bytes") or 0)
+                audio = _to_float32(self.rfile.read(n))
+        except Exception as e:
+            return {"ok": False, "error": f"audio: {e}"}
+        return self._submit(server, ("pcm", audio, sample_rate))
+
+    def _submit(self, server: STTServer, job) -> dict:
+        """job 为 ("pcm", audio, sample_rate) 或 ("files", 路径列表, batch_size_s)；排队交给推理线程并等待结果"""
+        fut: Future = Future()
+        try:
+            server.jobs.put_nowait((job, fut))
+        except queue.Full:
+            return {"ok": False, "error": "busy", "queued": server.jobs.qsize()}
+        try:
+            return fut.result(timeout=_REQUEST_TIMEOUT)
+        except Exception as e:
+            fut.cancel()
+            return {"ok": False, "error": f"timeout: {e}"}
+
+    def _reply(self, obj: dict) -> None:
+        self.wfile.write((json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8"))
+        self.wfile.flush()
+
+
+def serve(path: Path | None = None, max_queue: int | None = None) -> None:
+    cfg = _get_server_config()
+    server = STTServer(path or get_socket_path(), max_queue or int(cfg.get("max_queue") or _DEFAULT_MAX_QUEUE))
+    # 先开始接受连接（健康检查可见加载进度），模型在推理线程启动前加载
+    threading.Thread(target=lambda: (server.load_model(), server.worker()), daemon=True).start()
+    print(f"[STT] 模型服务监听 {server.path}", flush=True)
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        try:
+            server.path.unlink()
+        except OSError:
+            pass
+
+
+# ---------- 客户端 ----------
+
+def _request(req: dict, payload: bytes | None = None, path: Path | None = None,
+             timeout: float = _REQUEST_TIMEOUT) -> dict:
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+        s.settimeout(_CONNECT_TIMEOUT)
+        s.connect(str(path or get_socket_path()))
+        s.settimeout(timeout)
+        s.sendall((json.dumps(req) + "\n").encode("utf-8"))
+        if payload:
+            s.sendall(payload)
+        with s.makefile("rb") as f:
+            resp = _read_line(f)
+    if resp is None:
+        raise ConnectionError("STT 服务关闭了连接")
+    return resp
+
+
+def health(path: Path | None = None) -> dict | None:
+    """服务不可达时返回 None"""
+    try:
+        return _request({"op": "health"}, path=path, timeout=_CONNECT_TIMEOUT)
+    except (OSError, ValueError, ConnectionError):
+        return None
+
+
+def transcribe(audio, sample_rate: int = 16000, path: Path | None = None,
+               use_shm: bool = True) -> str | None:
+    """把 int16 录音交给模型服务识别；服务不可达时抛出 OSError，服务端错误抛出 RuntimeError"""
+    import numpy as np
+
+    if isinstance(audio, (bytes, bytearray, memoryview)):
+        pcm = np.frombuffer(audio, dtype=np.int16)
+    else:
+        pcm = np.asarray(audio)
+        if pcm.dtype != np.int16:
+            pcm = (np.clip(pcm.astype(np.float32), -1.0, 1.0) * 32767).astype(np.int16)
+        pcm = pcm.reshape(-1) if pcm.ndim == 1 or pcm.shape[-1] == 1 else pcm.mean(axis=1).astype(np.int16)
+    req = {"op": "transcribe", "sample_rate": sample_rate}
+    if use_shm and pcm.nbytes:
+        from multiprocessing import shared_memory
+        shm = shared_memory.SharedMemory(create=True, size=pcm.nbytes)
+        try:
+            np.ndarray(pcm.shape, dtype=np.int16, buffer=shm.buf)[:] = pcm
+            req.update(shm=shm.name, samples=len(pcm))
+            resp = _request(req, path=path)
+        finally:
+            shm.close()
+            shm.unlink()
+    else:
+        data = np.ascontiguousarray(pcm).tobytes()
+        req["bytes"] = len(data)
+        resp = _request(req, data, path=path)
+    if not resp.get("ok"):
+        raise RuntimeError(resp.get("error") or "STT 服务错误")
+    return resp.get("text")
+
+
+def transcribe_files(paths: list, batch_size_s: int = 300, path: Path | None = None) -> list[dict]:
+    """把本机音频文件交给模型服务批量识别，返回 [{"key", "text"}]（key 为文件名去后缀）；
+    服务不可达时抛出 OSError，服务端错误抛出 RuntimeError"""
+    req = {"op": "transcribe_files", "paths": [str(Path(p).resolve()) for p in paths], "batch_size_s": batch_size_s}
+    resp = _request(req, path=path)
+    if not resp.get("ok"):
+        raise RuntimeError(resp.get("error") or "STT 服务错误")
+    return resp.get("results") or []
+
+
+def ensure_server(wait: float = 0) -> bool:
+    """服务未运行时在后台启动（stt.server.autostart），最多等待 wait 秒。
+    仅在健康检查连通后返回 True；刚启动、尚未监听时返回 False（已在启动中的进程不会重复拉起）"""
+    global _spawned
+    path = get_socket_path()
+    if health(path) is not None:
+        return True
+    if not _get_server_config().get("autostart", True):
+        return False
+    with _spawn_lock:
+        if _spawned is None or _spawned.poll() is not None:
+            env = os.environ.copy()
+            env["PYTHONPATH"] = os.pathsep.join(p for p in (str(ROOT / "src"), env.get("PYTHONPATH")) if p)
+            _spawned = subprocess.Popen(
+                [sys.executable, "-m", "voice.stt_server", "--socket", str(path)],
+                cwd=str(ROOT),
+                env=env,
+                start_new_session=True,
+            )
+    deadline = time.monotonic() + wait
+    while time.monotonic() < deadline:
+        if health(path) is not None:
+            return True
+        if _spawned.poll() is not None:
+            return False  # 服务进程启动即退出
+        time.sleep(0.2)
+    return False
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="知式 STT 模型服务")
+    parser.add_argument("--socket", help="unix socket 路径（默认 config stt.server.socket 或 data/stt.sock）")
+    parser.add_argument("--health", action="store_true", help="查询运行中服务的健康状态")
+    args = parser.parse_args()
+    path = Path(args.socket) if args.socket else None
+    if args.health:
+        h = health(path)
+        print(json.dumps(h, ensure_ascii=False, indent=2) if h else "STT 服务未运行")
+        return 0 if h else 1
+    serve(path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
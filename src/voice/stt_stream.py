@@ -0,0 +1,173 @@
+"""流式 STT - FunASR 在线 Paraformer（paraformer-zh-streaming），边说边识别
+
+录音回调每收满 600ms（chunk_size=[0, 10, 5]）就把这一块交给后台线程解码，并通过 on_partial
+回调推送当前累计的部分结果；松开麦克风时只剩最后不足 600ms 的尾块需要解码（is_final=True），
+识别结果几乎立即可用，延迟不再随说话时长增长。
+录音回调里只把原始样本拷贝进预分配的块缓冲（不转换格式、不拼接数组），float 转换在解码线程进行；
+解码完的块缓冲回收复用，整段录音只分配少数几块。
+"""
+
+import queue
+import threading
+
+_SAMPLE_RATE = 16000
+_DEFAULT_CHUNK = (0, 10, 5)  # 10 × 60ms = 600ms 一块，5 块 lookahead
+_ENCODER_LOOK_BACK = 4
+_DECODER_LOOK_BACK = 1
+
+_streaming_model = None
+_punc_model = None
+_model_lock = threading.Lock()
+
+
+def load_streaming_model(model_id: str = "paraformer-zh-streaming"):
+    """加载（并缓存）在线 Paraformer；funasr 不可用时返回 None"""
+    global _streaming_model
+    with _model_lock:
+        if _streaming_model is not None:
+            return _streaming_model
+        try:
+            from funasr import AutoModel
+        except ImportError:
+            return None
+        try:
+            _streaming_model = AutoModel(model=model_id, device="cpu", disable_update=True)
+        except Exception as e:
+            print(f"[STT] 流式模型加载失败: {e}", flush=True)
+            return None
+        return _streaming_model
+
+
+def _load_punc_model():
+    """流式模型输出不带标点，定稿时用 ct-punc 补全（加载失败则原样返回文本）"""
+    global _punc_model
+    with _model_lock:
+        if _punc_model is None:
+            try:
+                from funasr import AutoModel
+                _punc_model = AutoModel(model="ct-punc", device="cpu", disable_update=True)
+            except Exception:
+                _punc_model = False
+        return _punc_model or None
+
+
+def add_punctuation(text: str) -> str:
+    model = _load_punc_model()
+    if not model or not text:
+        return text
+    try:
+        res = model.generate(input=text)
+        return (res[0].get("text") or text) if res else text
+    except Exception:
+        return text
+
+
+class StreamingRecognizer:
+    """一次录音对应一个实例：feed() 在音频回调中调用，finish() 定稿并返回全文"""
+
+    def __init__(self, model, on_partial=None, sample_rate: int = _SAMPLE_RATE,
+                 chunk_size=_DEFAULT_CHUNK, punctuate: bool = True) -> None:
+        self._model = model
+        self._on_partial = on_partial
+        self._chunk_size = list(chunk_size)
+        # 每块样本数：chunk_size[1] × 60ms
+        self._stride = int(chunk_size[1]) * sample_rate * 60 // 1000
+        self._punctuate = punctuate
+        self._buf = None  # 正在填充的块缓冲 (stride, channels)，dtype 与录音一致
+        self._fill = 0
+        self._free: queue.SimpleQueue = queue.SimpleQueue()  # 解码完可复用的块缓冲
+        self._cache: dict = {}
+        self._parts: list[str] = []
+        self._queue: queue.Queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    @property
+    def text(self) -> str:
+        return "".join(self._parts)
+
+    def _take_buffer(self, dtype, channels: int):
+        import numpy as np
+
+        try:
+            buf = self._free.get_nowait()
+            if buf.dtype == dtype and buf.shape[1] == channels:
+                return buf
+        except queue.Empty:
+            pass
+        return np.empty((self._stride, channels), dtype=dtype)
+
+    def feed(self, block) -> None:
+        """追加一段录音（int16 或 float32，(n,) 或 (n, channels)）：拷贝进块缓冲，凑满 600ms 交给解码线程"""
+        import numpy as np
+
+        data = np.asarray(block)
+        if data.ndim == 1:
+            data = data.reshape(-1, 1)
+        off, n = 0, len(data)
+        while off < n:
+            if self._buf is None:
+                self._buf = self._take_buffer(data.dtype, data.shape[1])
+                self._fill = 0
+            k = min(self._stride - self._fill, n - off)
+            self._buf[self._fill:self._fill + k] = data[off:off + k]
+            self._fill += k
+            off += k
+            if self._fill == self._stride:
+                self._queue.put((self._buf, self._stride, False))
+                self._buf = None
+
+    def _decode(self, chunk, is_final: bool) -> None:
+        res = self._model.generate(
+            input=chunk,
+            cache=self._cache,
+            is_final=is_final,
+            chunk_size=self._chunk_size,
+            encoder_chunk_look_back=_ENCODER_LOOK_BACK,
+            decoder_chunk_look_back=_DECODER_LOOK_BACK,
+        )
+        piece = (res[0].get("text") or "") if res else ""
+        if piece:
+            self._parts.append(piece)
+            if self._on_partial and not is_final:
+                try:
+                    self._on_partial(self.text)
+                except Exception:
+                    pass
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            buf, n, is_final = item
+            try:
+                from voice.stt import _to_float32
+                self._decode(_to_float32(buf[:n]), is_final)
+            except Exception as e:
+                print(f"[STT] 流式识别异常: {e}", flush=True)
+            finally:
+                self._free.put(buf)
+
+    def finish(self, timeout: float | None = 30) -> str | None:
+        """送出尾块（is_final=True），等待解码线程处理完，返回定稿文本"""
+        import numpy as np
+
+        if self._buf is not None and self._fill:
+            tail, n = self._buf, self._fill
+        else:
+            # 尾块恰好为空时补 60ms 静音，模型需要非空输入才能冲刷缓存
+            n = self._stride // 10 or 1
+            tail = np.zeros((n, 1), dtype=np.float32)
+        self._buf, self._fill = None, 0
+        self._queue.put((tail, n, True))
+        self._queue.put(None)
+        self._thread.join(timeout)
+        text = self.text.strip()
+        if text and self._punctuate:
+            text = add_punctuation(text).strip()
+        return text or None
+
+    def cancel(self) -> None:
+        self._buf, self._fill = None, 0
+        self._queue.put(None)
@@ -1,16 +1,12 @@
 """TTS 模块 - 文本转语音，供形象口型同步"""
 
 import asyncio
-from collections import deque
 from pathlib import Path
 
+from voice.speech_queue import current_turn, get_speech_queue
+
 ROOT = Path(__file__).resolve().parents[2]
 TTS_DIR = ROOT / "assets" / "avatar" / "tts"
-AUDIO_FILE = TTS_DIR / "latest.mp3"
-
-_speak_queue: deque[str] = deque()
-_agent_round_done: bool = False
-_pending_clear: bool = False
 
 
 def _is_debug() -> bool:
@@ -63,11 +59,34 @@ def _get_rate() -> str:
     return "+0%"
 
 
-def _ensure_dir():
-    TTS_DIR.mkdir(parents=True, exist_ok=True)
+def _get_concurrency() -> int:
+    try:
+        import yaml
+        cfg = ROOT / "config" / "zhyx.yaml"
+        if cfg.exists():
+            with open(cfg, encoding="utf-8") as f:
+                d = yaml.safe_load(f) or {}
+            return max(1, int((d.get("tts") or {}).get("concurrency") or _DEFAULT_CONCURRENCY))
+    except Exception:
+        pass
+    return _DEFAULT_CONCURRENCY
+
+
+def _is_stream_enabled() -> bool:
+    try:
+        import yaml
+        cfg = ROOT / "config" / "zhyx.yaml"
+        if cfg.exists():
+            with open(cfg, encoding="utf-8") as f:
+                d = yaml.safe_load(f) or {}
+            return bool((d.get("tts") or {}).get("stream", True))
+    except Exception:
+        pass
+    return True
 
 
 _MAX_CHARS_PER_CHUNK = 400
+_DEFAULT_CONCURRENCY = 3
 
 
 def _split_for_tts(text: str) -> list[str]:
@@ -110,77 +129,261 @@ def _clean_tts_text(text: str) -> str:
     return s
 
 
-def push_queue(url: str) -> None:
-    _speak_queue.append(url.strip())
+def push_queue(url: str, turn: int | None = None) -> bool:
+    """入队供前端播放；turn 已被新一轮取代时丢弃并返回 False"""
+    return get_speech_queue().push(url, turn)
 
 
 def pop_queue() -> str | None:
-    if not _speak_queue:
-        return None
-    try:
-        return _speak_queue.popleft()
-    except IndexError:
-        return None
+    return get_speech_queue().pop()
 
 
 def mark_agent_round_done() -> None:
-    global _agent_round_done
-    _agent_round_done = True
+    """本轮回复结束。后台合成队列中尚有文本时，标记排在它们之后，待其入队后才生效"""
+    from voice.tts_worker import peek_tts_worker
+    turn = current_turn()
+    worker = peek_tts_worker()
+    if worker is not None and worker.backlog():
+        worker.submit_call(lambda: get_speech_queue().mark_round_done(turn), turn)
+    else:
+        get_speech_queue().mark_round_done(turn)
 
 
 def is_agent_round_done() -> bool:
-    return _agent_round_done
+    return get_speech_queue().is_round_done()
 
 
-def clear_tts_dir() -> None:
-    global _agent_round_done
-    if not TTS_DIR.exists():
-        _agent_round_done = False
-        return
+def clear_played_segments() -> None:
+    """一轮播放结束：释放已播放的内存分段（不涉及磁盘）"""
     try:
-        for f in TTS_DIR.glob("*.mp3"):
-            f.unlink(missing_ok=True)
+        from voice.tts_stream import get_segment_store
+        get_segment_store().release_played()
     except Exception:
         pass
-    _agent_round_done = False
 
 
 def schedule_clear_on_next_push() -> None:
-    global _pending_clear
-    _pending_clear = True
+    get_speech_queue().schedule_clear()
+
+
+def _is_no_audio(e: Exception) -> bool:
+    return "NoAudioReceived" in type(e).__name__ or "no audio" in str(e).lower()
+
+
+def _fallback_text(text: str) -> str:
+    return text.replace("Z.ai", "Z点ai").replace("GLM", "G L M")
+
+
+def _boundary_sink(boundaries: list | None):
+    return None if boundaries is None else (lambda off, dur, word: boundaries.append((off, dur, word)))
 
 
-async def _speak_one_chunk(text: str, voice: str, rate: str, out_path: Path) -> bool:
+def _mouth(engine, data: bytes, boundaries: list | None) -> bytes | None:
+    """合成完成时计算口型包络（tts.lipsync 关闭或无法计算时为 None，前端退回实时分析）"""
+    from voice import lipsync
+    if not lipsync.is_enabled():
+        return None
     try:
-        import edge_tts
-        communicate = edge_tts.Communicate(text, voice, rate=rate)
-        await communicate.save(str(out_path))
-        return True
+        return lipsync.envelope_for(engine, data, boundaries)
+    except Exception:
+        return None
+
+
+async def _synth_bytes(text: str, voice: str, rate: str, engine=None,
+                       boundaries: list | None = None) -> bytes | None:
+    """整段合成到内存；无音频时换用回退文本重试一次。引擎支持时词边界追加到 boundaries"""
+    from voice.tts_engines import get_tts_engine
+    engine = engine or get_tts_engine()
+    try:
+        return await engine.synthesize(text, voice, rate, on_boundary=_boundary_sink(boundaries))
     except Exception as e:
-        if "NoAudioReceived" in type(e).__name__ or "no audio" in str(e).lower():
+        if _is_no_audio(e):
             print(f"[TTS] NoAudioReceived: {text[:50]}...", flush=True)
-            fallback = text.replace("Z.ai", "Z点ai").replace("GLM", "G L M")
+            fallback = _fallback_text(text)
             if fallback != text:
+                if boundaries is not None:
+                    boundaries.clear()
                 try:
-                    import edge_tts
-                    communicate = edge_tts.Communicate(fallback, voice, rate=rate)
-                    await communicate.save(str(out_path))
-                    return True
+                    return await engine.synthesize(fallback, voice, rate, on_boundary=_boundary_sink(boundaries))
                 except Exception:
-                    return False
-            return False
+                    return None
+            return None
         raise
 
 
-async def speak_async(text: str, voice: str | None = None) -> str | None:
-    global _pending_clear
-    if _pending_clear:
-        _pending_clear = False
-        clear_tts_dir()
+def _cache_later(cache, key: str, data: bytes, mouth: bytes | None = None) -> None:
+    """缓存写盘放到线程池，不阻塞入队与播放（asyncio.run 退出前会等线程池完成）"""
+    def _put() -> None:
+        try:
+            cache.put_bytes(key, data, mouth)
+        except OSError:
+            pass
+    asyncio.get_running_loop().run_in_executor(None, _put)
+
+
+def _cache_url(path: Path) -> str:
+    return path.relative_to(TTS_DIR.parent).as_posix()
+
+
+async def _synth_cached(text: str, voice: str, rate: str, engine=None) -> str | None:
+    """先查内容寻址缓存，命中返回缓存文件 URL；未命中则整段合成存入内存分段，返回 tts/<id>"""
+    from voice.tts_cache import get_tts_cache
+    from voice.tts_engines import get_tts_engine
+    from voice.tts_stream import get_segment_store
+    engine = engine or get_tts_engine()
+    cache = get_tts_cache(engine.suffix)
+    key = cache.key(text, engine.cache_id(voice), rate) if cache.max_bytes > 0 else None
+    if key is not None:
+        hit = cache.get(key)
+        if hit is not None:
+            if _is_debug():
+                print(f"[TTS] 缓存命中: {text[:30]}", flush=True)
+            return _cache_url(hit)
+    boundaries: list = []
+    data = await _synth_bytes(text, voice, rate, engine, boundaries)
+    if not data:
+        return None
+    mouth = _mouth(engine, data, boundaries)
+    seg = get_segment_store().put(data, engine.mime, text, mouth)
+    if key is not None:
+        _cache_later(cache, key, data, mouth)
+    return seg.url
+
+
+async def _stream_one_chunk(text: str, voice: str, rate: str, seg, first: asyncio.Event,
+                            engine=None) -> bool:
+    """流式合成：音频块到达即写入 seg 并置位 first。返回是否完整合成"""
+    from voice.tts_engines import get_tts_engine
+    engine = engine or get_tts_engine()
+    fallback = _fallback_text(text)
+    boundaries: list = []
+    kw = {"on_boundary": _boundary_sink(boundaries)} if engine.supports_boundaries else {}
+    for t in [text] + ([fallback] if fallback != text else []):
+        boundaries.clear()
+        try:
+            async for data in engine.stream(t, voice, rate, **kw):
+                seg.append(data)
+                first.set()
+        except Exception as e:
+            if seg.size or not _is_no_audio(e):
+                # 已开始播放的分段只能截断；其他异常与非流式路径一致向上抛出
+                seg.finish(error=str(e))
+                if seg.size:
+                    return False
+                raise
+            print(f"[TTS] NoAudioReceived: {t[:50]}...", flush=True)
+            continue
+        if seg.size:
+            # 包络先于 finish 写入，等待 done 的口型请求总能拿到
+            seg.mouth = _mouth(engine, engine.finalize(seg.data()), boundaries)
+            seg.finish()
+            return True
+    seg.finish(error="no audio")
+    return False
+
+
+async def _synth_streaming(text: str, voice: str, rate: str, sem: asyncio.Semaphore,
+                           fills: list, engine=None) -> str | None:
+    """返回可立即入队的 URL：缓存命中为缓存文件，否则为收到首批音频的内存分段。
+    剩余音频由 fills 中的任务继续写入，合成完整后存入缓存。"""
+    from voice.tts_cache import get_tts_cache
+    from voice.tts_engines import get_tts_engine
+    from voice.tts_stream import get_segment_store
+    engine = engine or get_tts_engine()
+    cache = get_tts_cache(engine.suffix)
+    key = cache.key(text, engine.cache_id(voice), rate) if cache.max_bytes > 0 else None
+    if key is not None:
+        hit = cache.get(key)
+        if hit is not None:
+            return _cache_url(hit)
+    store = get_segment_store()
+    seg = store.create(text, engine.mime)
+    first = asyncio.Event()
+
+    async def _fill() -> None:
+        async with sem:
+            ok = await _stream_one_chunk(text, voice, rate, seg, first, engine)
+        first.set()
+        if ok and key is not None:
+            _cache_later(cache, key, engine.finalize(seg.data()), seg.mouth)
+
+    fill = asyncio.ensure_future(_fill())
+    fills.append(fill)
+    waiter = asyncio.ensure_future(first.wait())
+    await asyncio.wait({fill, waiter}, return_when=asyncio.FIRST_COMPLETED)
+    waiter.cancel()
+    if fill.done() and fill.exception() is not None:
+        store.release(seg.id)
+        raise fill.exception()
+    if not seg.size:
+        store.release(seg.id)
+        return None
+    return seg.url
+
+
+async def prewarm_tts(phrases: list[str], voice: str | None = None) -> dict:
+    """预先合成常用语句写入缓存（已缓存的跳过），返回缓存统计"""
+    from voice.tts_cache import get_tts_cache
+    from voice.tts_engines import get_tts_engine
+    engine = get_tts_engine()
+    cache = get_tts_cache(engine.suffix)
+    voice = voice or _get_voice()
+    rate = _get_rate()
+    if cache.max_bytes <= 0:
+        return cache.stats()
+    for phrase in phrases:
+        for chunk in _split_for_tts(_clean_tts_text(phrase)):
+            key = cache.key(chunk, engine.cache_id(voice), rate)
+            if cache.get(key) is not None:
+                continue
+            try:
+                boundaries: list = []
+                data = await _synth_bytes(chunk, voice, rate, engine, boundaries)
+                if data:
+                    cache.put_bytes(key, data, _mouth(engine, data, boundaries))
+            except Exception as e:
+                if _is_debug():
+                    print(f"[TTS] 预热失败: {chunk[:30]} ({e})", flush=True)
+    return cache.stats()
+
+
+def get_prewarm_phrases() -> list[str]:
     try:
-        import edge_tts
+        import yaml
+        cfg = ROOT / "config" / "zhyx.yaml"
+        if cfg.exists():
+            with open(cfg, encoding="utf-8") as f:
+                d = yaml.safe_load(f) or {}
+            return [str(p) for p in (d.get("tts") or {}).get("prewarm") or []]
+    except Exception:
+        pass
+    return []
+
+
+def _release_unqueued(tasks: list, queued: set) -> None:
+    """中途异常退出时，已合成但未入队的内存分段不会再被播放，立即释放"""
+    from voice.tts_stream import get_segment_store
+    for t in tasks:
+        if t.done() and not t.cancelled() and t.exception() is None and t.result() not in queued:
+            get_segment_store().release_url(t.result() or "")
+
+
+async def speak_async(text: str, voice: str | None = None, turn: int | None = None) -> str | None:
+    """合成并按顺序入队。turn 默认取当前上下文的轮次；该轮被新一轮取代时停止合成、不再入队"""
+    queue = get_speech_queue()
+    turn = current_turn() if turn is None else turn
+    if not queue.is_current(turn):
+        return None
+    if queue.take_pending_clear():
+        clear_played_segments()
+    from voice.tts_engines import get_tts_engine
+    try:
+        engine = get_tts_engine()
     except ImportError as e:
-        print(f"[TTS] 未安装 edge-tts: {e}", flush=True)
+        print(f"[TTS] 未安装 TTS 引擎依赖: {e}", flush=True)
+        return None
+    except Exception as e:
+        print(f"[TTS] TTS 引擎不可用: {e}", flush=True)
         return None
     raw = _clean_tts_text(text)
     if not raw or len(raw) < 2:
@@ -189,24 +392,54 @@ async def speak_async(text: str, voice: str | None = None) -> str | None:
         return None
     voice = voice or _get_voice()
     rate = _get_rate()
-    _ensure_dir()
-    import time
     chunks = _split_for_tts(raw)
     last_rel = None
     success_count = 0
-    for i, chunk in enumerate(chunks):
-        out_path = TTS_DIR / f"seg_{int(time.time()*1000)}_{i:02x}_{id(chunk) & 0xFFFF:04x}.mp3"
-        ok = await _speak_one_chunk(chunk, voice, rate, out_path)
-        if ok:
-            rel = "tts/" + out_path.name
-            push_queue(rel)
-            last_rel = rel
-            success_count += 1
-            if _is_debug():
-                print(f"[TTS] 入队: {rel} ({len(chunk)} 字)", flush=True)
-        else:
-            if _is_debug():
-                print(f"[TTS] 失败跳过: {chunk[:40]}...", flush=True)
+    # 各段并发合成（上限 tts.concurrency），但严格按顺序入队：第 1 段一合成完即可播放
+    sem = asyncio.Semaphore(_get_concurrency())
+
+    stream = _is_stream_enabled()
+    fills: list = []
+
+    async def _synth(chunk: str) -> str | None:
+        if stream:
+            # 流式：收到首批音频即返回 URL，其余音频由 fills 中的任务继续写入
+            return await _synth_streaming(chunk, voice, rate, sem, fills, engine)
+        async with sem:
+            return await _synth_cached(chunk, voice, rate, engine)
+
+    tasks = [asyncio.ensure_future(_synth(c)) for c in chunks]
+    queued: set = set()
+    loop = asyncio.get_running_loop()
+
+    def _cancel() -> None:
+        # 插话打断：取消本轮尚未完成的合成（由 begin_turn 在其他线程调用）；
+        # CancelledError 沿调用方向上传递，由 run_in_turn 收住
+        loop.call_soon_threadsafe(lambda: [t.cancel() for t in tasks + fills])
+
+    queue.on_cancel(turn, _cancel)
+    try:
+        for chunk, task in zip(chunks, tasks):
+            rel = await task
+            if rel is not None:
+                if not push_queue(rel, turn):
+                    break
+                queued.add(rel)
+                last_rel = rel
+                success_count += 1
+                if _is_debug():
+                    print(f"[TTS] 入队: {rel} ({len(chunk)} 字)", flush=True)
+            else:
+                if _is_debug():
+                    print(f"[TTS] 失败跳过: {chunk[:40]}...", flush=True)
+        # 等各流式分段写完（asyncio.run 返回时未完成的任务会被取消）
+        if fills:
+            await asyncio.gather(*fills, return_exceptions=True)
+    finally:
+        queue.remove_cancel(turn, _cancel)
+        for t in tasks + fills:
+            t.cancel()
+        _release_unqueued(tasks, queued)
     if success_count == 0 and _is_debug():
         print(f"[TTS] 全部 {len(chunks)} 段均失败，未入队", flush=True)
     return last_rel if success_count > 0 else None
@@ -217,4 +450,4 @@ def speak(text: str, voice: str | None = None) -> str | None:
 
 
 def has_pending() -> bool:
-    return len(_speak_queue) > 0
+    return get_speech_queue().has_pending()
@@ -0,0 +1,194 @@
+"""TTS 音频缓存 - 按 (规范化文本, 音色, 语速) 内容寻址，按总字节数 LRU 淘汰
+
+常用语句（"抱歉，我没有理解你的问题。"、出错提示、问候、确认）反复合成既费网络往返又产生新文件。
+缓存位于 assets/avatar/tts/cache/<sha256>.mp3（本地 Piper 引擎为 .wav），可直接由形象 HTTP 服务提供；
+音色标识带引擎名，切换 tts.engine 不会命中另一引擎的音频。待播放的分段只在内存中（tts_stream），与缓存目录无关。
+命中时刷新文件 mtime，重启后按 mtime 恢复 LRU 顺序。
+cache_max_mb 是整个缓存目录的预算：各引擎的音频格式共用，口型包络旁路文件（.mouth）也计入。
+"""
+
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import unicodedata
+from collections import OrderedDict
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_CACHE_DIR = ROOT / "assets" / "avatar" / "tts" / "cache"
+MOUTH_SUFFIX = ".mouth"
+_DEFAULT_MAX_MB = 64
+
+
+def _get_cache_max_bytes() -> int:
+    try:
+        import yaml
+        cfg = ROOT / "config" / "zhyx.yaml"
+        if cfg.exists():
+            with open(cfg, encoding="utf-8") as f:
+                d = yaml.safe_load(f) or {}
+            v = (d.get("tts") or {}).get("cache_max_mb")
+            if v is not None:
+                return int(float(v) * 1024 * 1024)
+    except Exception:
+        pass
+    return _DEFAULT_MAX_MB * 1024 * 1024
+
+
+def normalize_text(text: str) -> str:
+    """全角/半角统一、空白折叠，使仅排版不同的同一句话命中同一条缓存"""
+    s = unicodedata.normalize("NFKC", str(text))
+    return re.sub(r"\s+", " ", s).strip()
+
+
+class _CacheIndex:
+    """一个缓存目录的 LRU 索引：目录内所有音频格式共用一份 max_bytes 预算。
+    条目按文件名（<key><后缀>）记录，大小包含同名口型旁路文件"""
+
+    def __init__(self, root: Path, max_bytes: int) -> None:
+        self.root = Path(root)
+        self.max_bytes = int(max_bytes)
+        self.entries: OrderedDict[str, int] = OrderedDict()  # 文件名 → 字节数，末尾为最近使用
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.loaded = False
+        self.evictions = 0
+
+    def mouth_path(self, name: str) -> Path:
+        return self.root / f"{name.split('.', 1)[0]}{MOUTH_SUFFIX}"
+
+    def load(self) -> None:
+        """调用方持有 lock"""
+        self.loaded = True
+        try:
+            files = [(p.stat(), p) for p in self.root.iterdir()
+                     if p.suffix != MOUTH_SUFFIX and not p.name.startswith(".")]
+        except OSError:
+            return
+        for st, p in sorted(files, key=lambda x: x[0].st_mtime_ns):
+            try:
+                size = st.st_size + self.mouth_path(p.name).stat().st_size
+            except OSError:
+                size = st.st_size
+            self.entries[p.name] = size
+            self.bytes += size
+
+    def add(self, name: str, size: int) -> None:
+        with self.lock:
+            if not self.loaded:
+                self.load()
+            self.bytes -= self.entries.pop(name, 0)
+            self.entries[name] = size
+            self.bytes += size
+            while self.bytes > self.max_bytes and len(self.entries) > 1:
+                old, old_size = self.entries.popitem(last=False)
+                self.bytes -= old_size
+                self.evictions += 1
+                for p in (self.root / old, self.mouth_path(old)):
+                    try:
+                        p.unlink()
+                    except OSError:
+                        pass
+
+
+class TTSCache:
+    """线程安全；put 时超出 max_bytes 则从最久未用的条目开始删除。
+    同一目录的各音频格式传入同一个 index 即共用字节预算"""
+
+    def __init__(self, root: Path = DEFAULT_CACHE_DIR, max_bytes: int = _DEFAULT_MAX_MB * 1024 * 1024,
+                 suffix: str = ".mp3", index: _CacheIndex | None = None) -> None:
+        self._index = index or _CacheIndex(root, max_bytes)
+        self.root = self._index.root
+        self.max_bytes = self._index.max_bytes
+        self.suffix = suffix
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(text: str, voice: str, rate: str) -> str:
+        raw = f"{voice}\x00{rate}\x00{normalize_text(text)}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def path_for(self, key: str) -> Path:
+        return self.root / f"{key}{self.suffix}"
+
+    def get(self, key: str) -> Path | None:
+        idx = self._index
+        name = f"{key}{self.suffix}"
+        with idx.lock:
+            if not idx.loaded:
+                idx.load()
+            if name in idx.entries:
+                p = self.path_for(key)
+                if p.exists():
+                    idx.entries.move_to_end(name)
+                    self.hits += 1
+                    try:
+                        os.utime(p)
+                    except OSError:
+                        pass
+                    return p
+                idx.bytes -= idx.entries.pop(name)
+            self.misses += 1
+            return None
+
+    def mouth_path(self, key: str) -> Path:
+        return self.root / f"{key}{MOUTH_SUFFIX}"
+
+    def _write(self, dst: Path, data: bytes) -> None:
+        fd, tmp = tempfile.mkstemp(dir=self.root, prefix=".tmp-")
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, dst)
+
+    def put_bytes(self, key: str, data: bytes, mouth: bytes | None = None) -> Path:
+        """写入音频；mouth 为口型包络（lipsync），作为同名旁路文件保存、计入字节数并随音频一起淘汰"""
+        dst = self.path_for(key)
+        self.root.mkdir(parents=True, exist_ok=True)
+        if mouth:
+            self._write(self.mouth_path(key), mouth)
+        self._write(dst, data)
+        self._index.add(dst.name, len(data) + len(mouth or b""))
+        return dst
+
+    def stats(self) -> dict:
+        """命中率按本格式统计；条目数、字节数与淘汰数为整个目录共用的预算"""
+        idx = self._index
+        with idx.lock:
+            if not idx.loaded:
+                idx.load()
+            total = self.hits + self.misses
+            return {
+                "entries": len(idx.entries),
+                "bytes": idx.bytes,
+                "max_bytes": idx.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / total, 3) if total else 0.0,
+                "evictions": idx.evictions,
+            }
+
+
+_caches: dict[str, TTSCache] = {}
+
+
+def get_tts_cache(suffix: str = ".mp3") -> TTSCache:
+    """每种音频格式（对应 TTS 引擎）一个缓存实例，共用目录与 cache_max_mb 字节预算"""
+    cache = _caches.get(suffix)
+    if cache is None:
+        shared = next((c for c in _caches.values() if c.root == DEFAULT_CACHE_DIR), None)
+        index = shared._index if shared else _CacheIndex(DEFAULT_CACHE_DIR, _get_cache_max_bytes())
+        cache = _caches.setdefault(suffix, TTSCache(suffix=suffix, index=index))
+    return cache
+
+
+def mouth_path_for(url: str) -> Path | None:
+    """tts/cache/<key>.<ext> → 对应的口型包络文件（存在时）"""
+    name = str(url).split("?", 1)[0].rsplit("/", 1)[-1]
+    key = name.split(".", 1)[0]
+    if not re.fullmatch(r"[0-9a-f]{64}", key):
+        return None
+    p = DEFAULT_CACHE_DIR / f"{key}{MOUTH_SUFFIX}"
+    return p if p.exists() else None
@@ -0,0 +1,250 @@
+"""TTS 引擎 - 由 tts.engine 选择合成后端，统一为异步流式输出
+
+  edge   edge-tts（微软在线服务），输出 24kHz MP3；每段一次网络往返（300–1500ms），离线不可用
+  piper  本地 ONNX VITS（Piper 系模型，pip install piper-tts），纯 CPU 离线合成，输出 16bit PCM WAV
+
+引擎接口（TTSEngine）：
+  name / mime / suffix        缓存键、流式分段 Content-Type 与落盘扩展名
+  stream(text, voice, rate)   异步产出音频字节块，首块到达即可推给前端播放
+  synthesize(text, voice, rate) 整段音频字节（默认拼接 stream 再经 finalize）
+  finalize(data)              流式写完后修正容器头（WAV 的长度字段），再写入缓存
+  audio_seconds(data)         音频时长，供基准计算 RTF 与口型包络对齐
+  supports_boundaries         stream 可回调词边界（edge），供 MP3 生成口型包络
+新后端实现上述接口（stream 与 audio_seconds 为抽象方法，缺少时注册即报错）后用 register_engine 注册即可在配置中选用。
+"""
+
+import abc
+import asyncio
+import inspect
+import struct
+import threading
+from pathlib import Path
+from typing import AsyncIterator, Callable, Iterator
+
+ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_ENGINE = "edge"
+# edge-tts 默认输出格式 audio-24khz-48kbitrate-mono-mp3
+_EDGE_MP3_BITRATE = 48000
+# 流式 WAV 头的 data 长度未知，按惯例填最大值，播放器读到流结束为止
+_WAV_STREAM_SIZE = 0xFFFFFFFF - 36
+
+
+def _get_tts_config() -> dict:
+    try:
+        import yaml
+        cfg = ROOT / "config" / "zhyx.yaml"
+        if cfg.exists():
+            with open(cfg, encoding="utf-8") as f:
+                d = yaml.safe_load(f) or {}
+            return d.get("tts") or {}
+    except Exception:
+        pass
+    return {}
+
+
+def rate_to_scale(rate: str) -> float:
+    """edge-tts 风格语速（"+20%"）换算为时长缩放（length_scale，越小越快）"""
+    try:
+        pct = float(str(rate).strip().rstrip("%") or 0)
+    except ValueError:
+        return 1.0
+    return 1.0 / max(0.1, 1.0 + pct / 100.0)
+
+
+def wav_header(sample_rate: int, data_size: int = _WAV_STREAM_SIZE, channels: int = 1,
+               sample_width: int = 2) -> bytes:
+    byte_rate = sample_rate * channels * sample_width
+    return b"".join((
+        b"RIFF", struct.pack("<I", min(0xFFFFFFFF, data_size + 36)), b"WAVE",
+        b"fmt ", struct.pack("<IHHIIHH", 16, 1, channels, sample_rate, byte_rate,
+                             channels * sample_width, sample_width * 8),
+        b"data", struct.pack("<I", data_size),
+    ))
+
+
+class TTSEngine(abc.ABC):
+    name = ""
+    mime = "audio/mpeg"
+    suffix = ".mp3"
+    # 为 True 时 stream 接受 on_boundary(起点秒, 时长秒, 文本) 回调，用于无需解码即可生成口型包络
+    supports_boundaries = False
+
+    def cache_id(self, voice: str) -> str:
+        """参与缓存键的音色标识：不同引擎 / 模型的同一句话不能命中同一条缓存"""
+        return f"{self.name}:{voice}"
+
+    @abc.abstractmethod
+    async def stream(self, text: str, voice: str, rate: str) -> AsyncIterator[bytes]:
+        ...
+
+    async def synthesize(self, text: str, voice: str, rate: str, on_boundary=None) -> bytes:
+        kw = {"on_boundary": on_boundary} if on_boundary is not None and self.supports_boundaries else {}
+        parts = [b async for b in self.stream(text, voice, rate, **kw)]
+        return self.finalize(b"".join(parts))
+
+    def finalize(self, data: bytes) -> bytes:
+        return data
+
+    @abc.abstractmethod
+    def audio_seconds(self, data: bytes) -> float:
+        ...
+
+
+class EdgeTTSEngine(TTSEngine):
+    name = "edge"
+    mime = "audio/mpeg"
+    suffix = ".mp3"
+    supports_boundaries = True
+
+    def __init__(self, cfg: dict | None = None) -> None:
+        import edge_tts  # noqa: F401  未安装时在选择引擎时即报错
+
+    async def stream(self, text: str, voice: str, rate: str, on_boundary=None) -> AsyncIterator[bytes]:
+        import edge_tts
+        if on_boundary is None:
+            communicate = edge_tts.Communicate(text, voice, rate=rate)
+        else:
+            try:
+                # edge-tts 7 起默认只给 SentenceBoundary
+                communicate = edge_tts.Communicate(text, voice, rate=rate, boundary="WordBoundary")
+            except TypeError:
+                communicate = edge_tts.Communicate(text, voice, rate=rate)
+        async for ev in communicate.stream():
+            kind = ev.get("type")
+            if kind == "audio" and ev.get("data"):
+                yield ev["data"]
+            elif kind == "WordBoundary" and on_boundary is not None:
+                # offset / duration 单位为 100ns
+                on_boundary(ev.get("offset", 0) / 1e7, ev.get("duration", 0) / 1e7, ev.get("text", ""))
+
+    def audio_seconds(self, data: bytes) -> float:
+        return len(data) * 8 / _EDGE_MP3_BITRATE
+
+
+async def _iter_in_thread(produce: Callable[[], Iterator[bytes]]) -> AsyncIterator[bytes]:
+    """在线程中运行同步生成器（CPU 推理不阻塞事件循环），逐块转交给协程；消费方提前退出时让生成器停下"""
+    loop = asyncio.get_running_loop()
+    q: asyncio.Queue = asyncio.Queue()
+    stop = threading.Event()
+    done = object()
+
+    def _worker() -> None:
+        try:
+            for chunk in produce():
+                if stop.is_set():
+                    break
+                loop.call_soon_threadsafe(q.put_nowait, chunk)
+            loop.call_soon_threadsafe(q.put_nowait, done)
+        except BaseException as e:
+            loop.call_soon_threadsafe(q.put_nowait, e)
+
+    threading.Thread(target=_worker, daemon=True, name="tts-engine").start()
+    try:
+        while True:
+            item = await q.get()
+            if item is done:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop.set()
+
+
+class PiperEngine(TTSEngine):
+    """Piper（VITS 导出的 ONNX 模型）。按句合成，每句的 PCM 合成完即产出，首块之前先发 WAV 头"""
+
+    name = "piper"
+    mime = "audio/wav"
+    suffix = ".wav"
+
+    def __init__(self, cfg: dict | None = None) -> None:
+        import piper  # noqa: F401
+
+        cfg = cfg or {}
+        model = cfg.get("model")
+        if not model:
+            raise ValueError("tts.piper.model 未配置（Piper .onnx 模型路径）")
+        p = Path(model)
+        self.model_path = p if p.is_absolute() else ROOT / p
+        self.config_path = cfg.get("config")
+        self.speaker = cfg.get("speaker")
+        self._voice = None
+        self._lock = threading.Lock()
+
+    def load(self):
+        with self._lock:
+            if self._voice is None:
+                from piper import PiperVoice
+                self._voice = PiperVoice.load(str(self.model_path), config_path=self.config_path)
+            return self._voice
+
+    @property
+    def sample_rate(self) -> int:
+        return int(self.load().config.sample_rate)
+
+    def cache_id(self, voice: str) -> str:
+        return f"{self.name}:{self.model_path.stem}:{self.speaker}"
+
+    def _pcm(self, text: str, rate: str) -> Iterator[bytes]:
+        voice = self.load()
+        scale = rate_to_scale(rate)
+        if hasattr(voice, "synthesize_stream_raw"):  # piper-tts < 1.3
+            yield from voice.synthesize_stream_raw(text, length_scale=scale, speaker_id=self.speaker)
+            return
+        from piper import SynthesisConfig
+        syn = SynthesisConfig(length_scale=scale, speaker_id=self.speaker)
+        for chunk in voice.synthesize(text, syn_config=syn):
+            yield chunk.audio_int16_bytes
+
+    async def stream(self, text: str, voice: str, rate: str) -> AsyncIterator[bytes]:
+        header_sent = False
+        async for pcm in _iter_in_thread(lambda: self._pcm(text, rate)):
+            if not pcm:
+                continue
+            if not header_sent:
+                yield wav_header(self.sample_rate)
+                header_sent = True
+            yield pcm
+
+    def finalize(self, data: bytes) -> bytes:
+        if len(data) < 44 or data[:4] != b"RIFF":
+            return data
+        return wav_header(self.sample_rate, len(data) - 44) + data[44:]
+
+    def audio_seconds(self, data: bytes) -> float:
+        return max(0, len(data) - 44) / (self.sample_rate * 2)
+
+
+_ENGINES: dict[str, Callable[[dict], TTSEngine]] = {
+    "edge": EdgeTTSEngine,
+    "piper": PiperEngine,
+}
+_instances: dict[str, TTSEngine] = {}
+_instances_lock = threading.Lock()
+
+
+def register_engine(name: str, factory: Callable[[dict], TTSEngine]) -> None:
+    if inspect.isclass(factory) and inspect.isabstract(factory):
+        missing = ", ".join(sorted(factory.__abstractmethods__))
+        raise TypeError(f"TTS 引擎 {name} 未实现: {missing}")
+    _ENGINES[name] = factory
+    _instances.pop(name, None)
+
+
+def get_engine_name() -> str:
+    return str(_get_tts_config().get("engine") or DEFAULT_ENGINE).strip().lower()
+
+
+def get_tts_engine(name: str | None = None) -> TTSEngine:
+    """按名称（默认 tts.engine）返回引擎单例；依赖未安装时抛出 ImportError"""
+    name = name or get_engine_name()
+    with _instances_lock:
+        eng = _instances.get(name)
+        if eng is None:
+            factory = _ENGINES.get(name)
+            if factory is None:
+                raise ValueError(f"未知 TTS 引擎: {name}（可选 {', '.join(_ENGINES)}）")
+            eng = factory(_get_tts_config().get(name) or {})
+            _instances[name] = eng
+        return eng
@@ -0,0 +1,242 @@
+"""TTS 分段内存存储 - 合成的音频只放内存，由形象 HTTP 服务经 /tts/<id> 直接下发
+
+每段合成结果（流式或整段）都是一个 StreamSegment，speak_async 把 tts/<id> 入队，前端拉取播放：
+合成未完成时以 HTTP/1.1 chunked 边到达边下发，已完成则带 Content-Length 并支持 Range。
+语音路径上不写盘、不扫描目录；内容寻址缓存（tts_cache）的写入在线程池中进行，不阻塞入队。
+
+生命周期（引用计数）：
+  创建时计 1（播放方持有），HTTP 下发期间读者各计 1；
+  前端上报 playback-segment-done 时释放播放方引用，归零即从内存移除；
+  一轮播放结束（playback-done）时清理已下发但未上报的分段；
+  总字节超出 tts.segment_store_mb 时，从最早的已下发完毕分段开始淘汰，尚未播放的分段不受影响。
+每段记录：
+  created        开始合成
+  first_byte     收到第一批音频（合成侧首字节延迟）
+  first_served   第一批音频写给前端（端到端首音延迟，time-to-first-audio）
+"""
+
+import re
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+URL_PREFIX = "tts/"
+_DEFAULT_MAX_MB = 32
+_STATS_WINDOW = 200
+_ID_RE = re.compile(r"^[0-9a-f]{32}$")
+
+
+def _get_store_max_bytes() -> int:
+    try:
+        import yaml
+        cfg = ROOT / "config" / "zhyx.yaml"
+        if cfg.exists():
+            with open(cfg, encoding="utf-8") as f:
+                d = yaml.safe_load(f) or {}
+            v = (d.get("tts") or {}).get("segment_store_mb")
+            if v is not None:
+                return int(float(v) * 1024 * 1024)
+    except Exception:
+        pass
+    return _DEFAULT_MAX_MB * 1024 * 1024
+
+
+def segment_id_from_url(url: str) -> str | None:
+    """从 tts/<id> 或前端上报的完整 URL 中取出分段 id；缓存文件等其他 URL 返回 None"""
+    tail = str(url or "").split("?", 1)[0].rstrip("/")
+    head, _, seg_id = tail.rpartition("/")
+    if not head.endswith("tts") or not _ID_RE.match(seg_id):
+        return None
+    return seg_id
+
+
+class StreamSegment:
+    """单写者（合成协程）多读者（HTTP 线程）的增长型音频缓冲"""
+
+    def __init__(self, text: str = "", mime: str = "audio/mpeg", store: "SegmentStore | None" = None) -> None:
+        self.id = uuid.uuid4().hex
+        self.text = text
+        self.mime = mime
+        self.created = time.perf_counter()
+        self.first_byte: float | None = None
+        self.first_served: float | None = None
+        self.done = False
+        self.error: str | None = None
+        self.mouth: bytes | None = None  # 口型包络（lipsync，uint8 每 20ms 一帧），合成结束时写入
+        self.refs = 1
+        self._accounted = 0  # 已计入 store 总字节数的部分，由 store 锁保护
+        self._buf = bytearray()
+        self._cond = threading.Condition()
+        self._store = store
+
+    @property
+    def url(self) -> str:
+        return f"{URL_PREFIX}{self.id}"
+
+    @property
+    def size(self) -> int:
+        return len(self._buf)
+
+    def append(self, data: bytes) -> None:
+        if not data:
+            return
+        with self._cond:
+            if self.first_byte is None:
+                self.first_byte = time.perf_counter()
+            self._buf += data
+            self._cond.notify_all()
+        if self._store is not None:
+            self._store._grow(self, len(data))
+
+    def finish(self, error: str | None = None) -> None:
+        with self._cond:
+            self.done = True
+            self.error = error
+            self._cond.notify_all()
+
+    def data(self) -> bytes:
+        with self._cond:
+            return bytes(self._buf)
+
+    def wait_done(self, timeout: float = 30) -> bool:
+        with self._cond:
+            return self._cond.wait_for(lambda: self.done, timeout)
+
+    def read_from(self, offset: int, timeout: float = 30) -> tuple[bytes, bool]:
+        """阻塞直到 offset 之后有新数据或合成结束；返回 (新数据, 是否已结束且读完)"""
+        with self._cond:
+            if len(self._buf) <= offset and not self.done:
+                self._cond.wait(timeout)
+            chunk = bytes(self._buf[offset:])
+            return chunk, self.done and offset + len(chunk) >= len(self._buf)
+
+    def mark_served(self) -> None:
+        if self.first_served is None:
+            self.first_served = time.perf_counter()
+            if self._store is not None:
+                self._store.record(self)
+
+
+class SegmentStore:
+    def __init__(self, max_bytes: int = _DEFAULT_MAX_MB * 1024 * 1024) -> None:
+        self._segments: OrderedDict[str, StreamSegment] = OrderedDict()
+        self.max_bytes = int(max_bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+        self._synth_ttfb: deque = deque(maxlen=_STATS_WINDOW)
+        self._ttfa: deque = deque(maxlen=_STATS_WINDOW)
+
+    def create(self, text: str = "", mime: str = "audio/mpeg") -> StreamSegment:
+        """新建增长型分段（流式合成边写边下发），引用计数为 1"""
+        seg = StreamSegment(text, mime, self)
+        with self._lock:
+            self._segments[seg.id] = seg
+        return seg
+
+    def put(self, data: bytes, mime: str = "audio/mpeg", text: str = "",
+            mouth: bytes | None = None) -> StreamSegment:
+        """存入已合成完整的音频"""
+        seg = self.create(text, mime)
+        seg.mouth = mouth
+        seg.append(data)
+        seg.finish()
+        return seg
+
+    def get(self, seg_id: str) -> StreamSegment | None:
+        with self._lock:
+            return self._segments.get(seg_id)
+
+    def acquire(self, seg_id: str) -> StreamSegment | None:
+        """HTTP 读者持有引用，下发期间不会因上报而提前移除"""
+        with self._lock:
+            seg = self._segments.get(seg_id)
+            if seg is not None:
+                seg.refs += 1
+            return seg
+
+    def release(self, seg_id: str) -> bool:
+        """释放一个引用，归零即移除；返回是否已移除"""
+        with self._lock:
+            seg = self._segments.get(seg_id)
+            if seg is None:
+                return False
+            seg.refs -= 1
+            if seg.refs > 0:
+                return False
+            self._drop(seg)
+            return True
+
+    def release_url(self, url: str) -> bool:
+        seg_id = segment_id_from_url(url)
+        return self.release(seg_id) if seg_id else False
+
+    def release_played(self) -> int:
+        """一轮播放结束：移除已下发完毕且无读者的分段（前端漏报 segment-done 时兜底）"""
+        with self._lock:
+            stale = [s for s in self._segments.values()
+                     if s.done and s.first_served is not None and s.refs <= 1]
+            for seg in stale:
+                self._drop(seg)
+            return len(stale)
+
+    def _drop(self, seg: StreamSegment) -> None:
+        if self._segments.pop(seg.id, None) is not None:
+            self._bytes -= seg._accounted
+
+    def _grow(self, seg: StreamSegment, n: int) -> None:
+        with self._lock:
+            if seg.id not in self._segments:
+                return
+            seg._accounted += n
+            self._bytes += n
+            for old in list(self._segments.values()):
+                if self._bytes <= self.max_bytes:
+                    break
+                if old.done and old.first_served is not None:
+                    self._drop(old)
+                    self.evictions += 1
+
+    def record(self, seg: StreamSegment) -> None:
+        with self._lock:
+            if seg.first_byte is not None:
+                self._synth_ttfb.append((seg.first_byte - seg.created) * 1000)
+            if seg.first_served is not None:
+                self._ttfa.append((seg.first_served - seg.created) * 1000)
+
+    @staticmethod
+    def _summary(values) -> dict:
+        vals = sorted(values)
+        if not vals:
+            return {"count": 0}
+        return {
+            "count": len(vals),
+            "avg_ms": round(sum(vals) / len(vals), 1),
+            "p50_ms": round(vals[len(vals) // 2], 1),
+            "p95_ms": round(vals[min(len(vals) - 1, int(len(vals) * 0.95))], 1),
+            "last_ms": round(values[-1], 1),
+        }
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "segments": len(self._segments),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+                "synth_first_byte": self._summary(list(self._synth_ttfb)),
+                "time_to_first_audio": self._summary(list(self._ttfa)),
+            }
+
+
+_store: SegmentStore | None = None
+
+
+def get_segment_store() -> SegmentStore:
+    global _store
+    if _store is None:
+        _store = SegmentStore(_get_store_max_bytes())
+    return _store
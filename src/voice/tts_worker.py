@@ -0,0 +1,180 @@
+"""后台 TTS 合成 - 朗读请求交给常驻线程里的事件循环，对话循环无需等待合成
+
+chat_with_mcp_tools 的 on_speak 以前是完整的 speak_async：朗读 reasoning 或中间回复时，
+下一轮 LLM 请求要等整段合成结束才发出。改用 speak_background 后：
+  - 文本进入后台队列立即返回，LLM 请求、工具调用与合成并行进行；
+  - 队列按提交顺序逐条合成，播放顺序不变；
+  - 未完成的条目超过 tts.max_pending 时，提交方等待最早的一条完成（背压），避免合成积压过多；
+  - 本轮结束标记（mark_agent_round_done）也排进队列，在此前的文本都入队后才生效；
+  - 条目带所属轮次，用户插话后旧轮次的条目直接跳过，正在合成的由 speak_async 自行取消。
+"""
+
+import asyncio
+import concurrent.futures
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Awaitable, Callable
+
+ROOT = Path(__file__).resolve().parents[2]
+_DEFAULT_MAX_PENDING = 4
+
+
+def _get_worker_config() -> dict:
+    try:
+        import yaml
+        cfg = ROOT / "config" / "zhyx.yaml"
+        if cfg.exists():
+            with open(cfg, encoding="utf-8") as f:
+                d = yaml.safe_load(f) or {}
+            return d.get("tts") or {}
+    except Exception:
+        pass
+    return {}
+
+
+def _is_background_enabled() -> bool:
+    return bool(_get_worker_config().get("background", True))
+
+
+class TTSWorker:
+    def __init__(self, max_pending: int = _DEFAULT_MAX_PENDING,
+                 speak: Callable[..., Awaitable] | None = None) -> None:
+        self.max_pending = max(1, int(max_pending))
+        self._speak = speak
+        self._lock = threading.Lock()
+        self._pending: deque[concurrent.futures.Future] = deque()
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._jobs: asyncio.Queue | None = None
+        self._started = threading.Event()
+        self.submitted = 0
+        self.skipped = 0
+        self.backpressure_waits = 0
+
+    def _ensure_started(self) -> None:
+        with self._lock:
+            if self._loop is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+        threading.Thread(target=self._run, daemon=True, name="tts-worker").start()
+        self._started.wait()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self._loop)
+        self._jobs = asyncio.Queue()
+        self._started.set()
+        self._loop.run_until_complete(self._consume())
+
+    async def _consume(self) -> None:
+        from voice.speech_queue import get_speech_queue
+        while True:
+            fut, turn, job = await self._jobs.get()
+            try:
+                if not fut.set_running_or_notify_cancel():
+                    continue
+                if turn is not None and not get_speech_queue().is_current(turn):
+                    self.skipped += 1
+                    fut.set_result(None)
+                    continue
+                try:
+                    r = job()
+                    if asyncio.iscoroutine(r):
+                        r = await r
+                    fut.set_result(r)
+                except asyncio.CancelledError:
+                    fut.set_result(None)  # 插话打断
+                except Exception as e:
+                    print(f"[TTS] 后台合成失败: {e}", flush=True)
+                    fut.set_exception(e)
+            finally:
+                with self._lock:
+                    try:
+                        self._pending.remove(fut)
+                    except ValueError:
+                        pass
+
+    def _submit(self, job: Callable[[], object], turn: int | None) -> concurrent.futures.Future:
+        self._ensure_started()
+        fut: concurrent.futures.Future = concurrent.futures.Future()
+        with self._lock:
+            self._pending.append(fut)
+            self.submitted += 1
+        self._loop.call_soon_threadsafe(self._jobs.put_nowait, (fut, turn, job))
+        return fut
+
+    def submit(self, text: str, voice: str | None = None, turn: int | None = None) -> concurrent.futures.Future:
+        """排队朗读 text，立即返回；Future 的结果为 speak_async 的返回值"""
+        speak = self._speak
+        if speak is None:
+            from voice.tts import speak_async as speak
+        return self._submit(lambda: speak(text, voice, turn), turn)
+
+    def submit_call(self, fn: Callable[[], object], turn: int | None = None) -> concurrent.futures.Future:
+        """在此前排队的文本之后执行 fn（如本轮结束标记）"""
+        return self._submit(fn, turn)
+
+    def backlog(self) -> int:
+        with self._lock:
+            return len(self._pending)
+
+    async def wait_backlog(self) -> None:
+        """背压：未完成条目超过 max_pending 时，等待最早的条目完成"""
+        waited = False
+        while True:
+            with self._lock:
+                if len(self._pending) <= self.max_pending:
+                    break
+                oldest = self._pending[0]
+            waited = True
+            try:
+                # shield：调用方被取消（插话）时不连带取消后台条目
+                await asyncio.shield(asyncio.wrap_future(oldest))
+            except Exception:
+                pass
+        if waited:
+            self.backpressure_waits += 1
+
+    async def drain(self) -> None:
+        """等待当前已提交的条目全部完成"""
+        with self._lock:
+            futs = list(self._pending)
+        if futs:
+            await asyncio.wait([asyncio.wrap_future(f) for f in futs])
+
+    def stats(self) -> dict:
+        return {
+            "pending": self.backlog(),
+            "max_pending": self.max_pending,
+            "submitted": self.submitted,
+            "skipped_stale": self.skipped,
+            "backpressure_waits": self.backpressure_waits,
+        }
+
+
+_worker: TTSWorker | None = None
+_worker_lock = threading.Lock()
+
+
+def get_tts_worker() -> TTSWorker:
+    global _worker
+    with _worker_lock:
+        if _worker is None:
+            max_pending = _get_worker_config().get("max_pending") or _DEFAULT_MAX_PENDING
+            _worker = TTSWorker(int(max_pending))
+        return _worker
+
+
+def peek_tts_worker() -> TTSWorker | None:
+    return _worker
+
+
+async def speak_background(text: str, voice: str | None = None) -> None:
+    """on_speak 的非阻塞版本：交给后台合成后立即返回，仅在积压超过阈值时等待"""
+    from voice.speech_queue import current_turn
+    from voice.tts import speak_async
+    if not _is_background_enabled():
+        await speak_async(text, voice)
+        return
+    worker = get_tts_worker()
+    worker.submit(text, voice, current_turn())
+    await worker.wait_backlog()
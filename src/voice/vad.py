@@ -0,0 +1,126 @@
+"""VAD 端点检测 - 免按键收音：检测到说话开始录，尾部静音达到阈值即停
+
+EnergyVAD 按 30ms 帧计算能量（dBFS）与过零率：能量高于自适应噪声底一定幅度、且过零率不像
+高频嘶声时判为语音。Endpointer 在其上维护状态机：
+  等待 → 连续若干语音帧确认起点（带上 preroll 环形缓冲里的前导音频，避免吞掉首字）
+  录音 → 连续静音达到 silence_ms 判定结束；超过 max_s 强制结束
+等待超过 timeout_s 仍无人说话则放弃。
+"""
+
+from collections import deque
+
+import numpy as np
+
+_SAMPLE_RATE = 16000
+_FRAME_MS = 30
+
+
+class EnergyVAD:
+    """能量 + 过零率的轻量 VAD，噪声底在非语音帧上指数平滑跟踪"""
+
+    def __init__(self, sample_rate: int = _SAMPLE_RATE, margin_db: float = 12.0,
+                 min_db: float = -50.0, max_zcr: float = 0.35) -> None:
+        self.sample_rate = sample_rate
+        self.margin_db = margin_db
+        self.min_db = min_db
+        self.max_zcr = max_zcr
+        self.noise_db: float | None = None
+
+    def frame_features(self, frames: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """frames: (n, frame_len) int16 → (dBFS, 过零率)，逐帧向量化计算"""
+        x = frames.astype(np.float32) * (1.0 / 32768.0)
+        rms = np.sqrt(np.mean(x * x, axis=1) + 1e-12)
+        db = 20.0 * np.log10(rms)
+        signs = np.signbit(x)
+        zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / max(1, x.shape[1] - 1)
+        return db, zcr
+
+    def is_speech(self, frames: np.ndarray) -> np.ndarray:
+        db, zcr = self.frame_features(frames)
+        out = np.zeros(len(db), dtype=bool)
+        for i in range(len(db)):
+            if self.noise_db is None:
+                self.noise_db = float(db[i])
+            threshold = max(self.noise_db + self.margin_db, self.min_db)
+            speech = db[i] > threshold and zcr[i] < self.max_zcr
+            if not speech:
+                # 只在非语音帧更新噪声底；上升慢、下降快
+                alpha = 0.05 if db[i] > self.noise_db else 0.3
+                self.noise_db += alpha * (float(db[i]) - self.noise_db)
+            out[i] = speech
+        return out
+
+
+class Endpointer:
+    """逐块喂入 int16 音频；done 为 True 后 audio() 返回从起点（含 preroll）到终点的录音"""
+
+    def __init__(
+        self,
+        sample_rate: int = _SAMPLE_RATE,
+        silence_ms: int = 800,
+        preroll_ms: int = 300,
+        min_speech_ms: int = 90,
+        max_s: float = 30.0,
+        timeout_s: float = 8.0,
+        vad: EnergyVAD | None = None,
+    ) -> None:
+        self.sample_rate = sample_rate
+        self.frame_len = sample_rate * _FRAME_MS // 1000
+        self.vad = vad or EnergyVAD(sample_rate)
+        self._silence_frames = max(1, silence_ms // _FRAME_MS)
+        self._onset_frames = max(1, min_speech_ms // _FRAME_MS)
+        self._max_frames = int(max_s * 1000 / _FRAME_MS)
+        self._timeout_frames = int(timeout_s * 1000 / _FRAME_MS)
+        self._preroll: deque = deque(maxlen=max(1, preroll_ms // _FRAME_MS) + self._onset_frames)
+        self._frames: list[np.ndarray] = []
+        self._rest = np.zeros(0, dtype=np.int16)
+        self._run_speech = 0
+        self._run_silence = 0
+        self._waited = 0
+        self.started = False
+        self.done = False
+        self.timed_out = False
+
+    def feed(self, block: np.ndarray) -> bool:
+        """喂入一段录音（(n,) 或 (n, 1) int16），返回是否已到达终点"""
+        if self.done:
+            return True
+        data = np.asarray(block, dtype=np.int16).reshape(-1)
+        if len(self._rest):
+            data = np.concatenate((self._rest, data))
+        n = len(data) // self.frame_len
+        self._rest = data[n * self.frame_len:].copy()
+        if n == 0:
+            return False
+        frames = data[: n * self.frame_len].reshape(n, self.frame_len)
+        for frame, speech in zip(frames, self.vad.is_speech(frames)):
+            self._step(frame, bool(speech))
+            if self.done:
+                break
+        return self.done
+
+    def _step(self, frame: np.ndarray, speech: bool) -> None:
+        if not self.started:
+            self._preroll.append(frame)
+            self._waited += 1
+            self._run_speech = self._run_speech + 1 if speech else 0
+            if self._run_speech >= self._onset_frames:
+                self.started = True
+                self._frames = list(self._preroll)
+                self._run_silence = 0
+            elif self._waited >= self._timeout_frames:
+                self.done = self.timed_out = True
+            return
+        self._frames.append(frame)
+        self._run_silence = 0 if speech else self._run_silence + 1
+        if self._run_silence >= self._silence_frames or len(self._frames) >= self._max_frames:
+            # 去掉尾部大部分静音，只留约 200ms
+            keep = max(0, self._run_silence - 200 // _FRAME_MS)
+            if keep:
+                del self._frames[-keep:]
+            self.done = True
+
+    def audio(self) -> np.ndarray | None:
+        if not self.started or not self._frames:
+            return None
+        return np.concatenate(self._frames)
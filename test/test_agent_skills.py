@@ -0,0 +1,92 @@
+"""Agent Skills 索引测试"""
+
+import os
+
+
+def _write_skill(base, name, desc="d"):
+    d = base / name
+    d.mkdir(parents=True, exist_ok=True)
+    (d / "SKILL.md").write_text(f"---\nname: {name}\ndescription: {desc}\n---\n\n# {name}\n", encoding="utf-8")
+    return d / "SKILL.md"
+
+
+def test_catalog_incremental_refresh(tmp_path):
+    from agent_skills.catalog import SkillCatalog
+
+    cat = SkillCatalog()
+    _write_skill(tmp_path, "a")
+    assert [e["name"] for e in cat.refresh([tmp_path])] == ["a"]
+    v = cat.version
+    assert cat.refresh([tmp_path])[0]["description"] == "d"
+    assert cat.version == v
+
+    # 先建目录、后写 SKILL.md（智能体创建 skill 的常见顺序）
+    (tmp_path / "b").mkdir()
+    assert len(cat.refresh([tmp_path])) == 1
+    _write_skill(tmp_path, "b")
+    assert [e["name"] for e in cat.refresh([tmp_path])] == ["a", "b"]
+
+    md = _write_skill(tmp_path, "a", desc="changed description")
+    os.utime(md, ns=(1, 1))
+    assert cat.refresh([tmp_path])[0]["description"] == "changed description"
+
+    md.unlink()
+    assert [e["name"] for e in cat.refresh([tmp_path])] == ["b"]
+
+
+def test_load_skill_reads_body_and_files(tmp_path, monkeypatch):
+    from agent_skills import loader
+
+    md = _write_skill(tmp_path, "pdf")
+    (md.parent / "forms.md").write_text("表单说明", encoding="utf-8")
+    monkeypatch.setattr(loader, "_get_skill_directories", lambda: [tmp_path])
+
+    r = loader.load_skill({"name": "pdf"})
+    assert r["content"].startswith("# pdf")
+    assert r["files"] == ["forms.md"]
+    assert loader.load_skill({"name": "pdf", "file": "forms.md"})["content"] == "表单说明"
+    assert "error" in loader.load_skill({"name": "pdf", "file": "../pdf/../../etc/passwd"})
+    assert "error" in loader.load_skill({"name": "missing"})
+
+
+def test_bm25_ranks_chinese_and_updates_incrementally(tmp_path):
+    from agent_skills.catalog import SkillCatalog
+    from agent_skills.index import SkillIndex
+
+    _write_skill(tmp_path, "pdf", desc="PDF 表单填写、合并与文字提取")
+    _write_skill(tmp_path, "xlsx", desc="Excel 电子表格公式与图表")
+    _write_skill(tmp_path, "weather", desc="查询城市天气预报")
+    cat = SkillCatalog()
+    index = SkillIndex(tmp_path / "index.json")
+    index.sync(cat.refresh([tmp_path]), version=cat.version)
+
+    assert index.search("帮我填写这个表单", 1)[0][0] == "pdf"
+    assert index.search("明天北京天气怎么样", 1)[0][0] == "weather"
+
+    (tmp_path / "weather" / "SKILL.md").unlink()
+    _write_skill(tmp_path, "translate", desc="中英文翻译")
+    assert index.sync(cat.refresh([tmp_path]), version=cat.version)
+    assert all(name != "weather" for name, _ in index.search("天气", 3))
+
+    # 从磁盘恢复后结果一致
+    reloaded = SkillIndex(tmp_path / "index.json")
+    reloaded.sync(cat.refresh([tmp_path]), version=cat.version)
+    assert reloaded.search("翻译", 1)[0][0] == "translate"
+
+
+def test_inline_context_injects_only_ranked_bodies(tmp_path, monkeypatch):
+    from agent_skills import index, loader
+
+    skills = tmp_path / "skills"
+    _write_skill(skills, "pdf", desc="PDF 表单填写、合并与文字提取")
+    _write_skill(skills, "weather", desc="查询城市天气预报")
+    cfg = {"enabled": ["pdf", "weather"], "top_k": 1, "index_path": str(tmp_path / "a.json")}
+    monkeypatch.setattr(loader, "_get_skill_directories", lambda: [skills])
+    monkeypatch.setattr(loader, "_get_skills_config", lambda: cfg)
+    monkeypatch.setattr(loader, "get_writable_skills_dir", lambda: None)
+
+    ctx = loader.get_agent_skill_context("明天天气怎么样")
+    assert "## Skill: weather" in ctx and "## Skill: pdf" not in ctx and "**pdf**" not in ctx
+
+    assert index.get_skill_index(tmp_path / "a.json") is index.get_skill_index(tmp_path / "a.json")
+    assert index.get_skill_index(tmp_path / "b.json").path == (tmp_path / "b.json").resolve()
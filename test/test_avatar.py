@@ -0,0 +1,57 @@
+"""avatar 形象 HTTP 服务测试（不启动 pywebview 窗口）"""
+
+import gzip
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+
+
+def _start(monkeypatch, root):
+    from avatar import window
+    monkeypatch.setattr(window, "AVATAR_DIR", root)
+    monkeypatch.setattr(window, "_port", [0])
+    threading.Thread(target=window._start_server, daemon=True).start()
+    while not window._port[0]:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{window._port[0]}/"
+
+
+def _get(url, **headers):
+    try:
+        with urllib.request.urlopen(urllib.request.Request(url, headers=headers)) as r:
+            return r.status, r.headers, r.read()
+    except urllib.error.HTTPError as e:
+        return e.code, e.headers, b""
+
+
+def test_static_assets_etag_conditional_get_and_precompressed(tmp_path, monkeypatch):
+    model = tmp_path / "models" / "demo" / "demo.model.json"
+    model.parent.mkdir(parents=True)
+    raw = b'{"motions": {}}' * 200
+    model.write_bytes(raw)
+    (tmp_path / "app.html").write_text("<html></html>", encoding="utf-8")
+    base = _start(monkeypatch, tmp_path)
+
+    status, headers, body = _get(base + "models/demo/demo.model.json")
+    assert status == 200 and body == raw and headers["Content-Encoding"] is None
+    assert headers["Cache-Control"] == "public, max-age=86400" and headers["Last-Modified"]
+    etag = headers["ETag"]
+    assert _get(base + "models/demo/demo.model.json", **{"If-None-Match": etag})[0] == 304
+    assert _get(base + "models/demo/demo.model.json",
+                **{"If-Modified-Since": headers["Last-Modified"]})[0] == 304
+    assert _get(base + "app.html")[1]["Cache-Control"] == "no-cache"
+
+    gz = model.with_name(model.name + ".gz")
+    gz.write_bytes(gzip.compress(raw))
+    status, headers, body = _get(base + "models/demo/demo.model.json", **{"Accept-Encoding": "br, gzip"})
+    assert status == 200 and headers["Content-Encoding"] == "gzip" and gzip.decompress(body) == raw
+    assert headers["ETag"] != etag and headers["Content-Type"] == "application/json"
+    assert _get(base + "models/demo/demo.model.json", **{"Accept-Encoding": "gzip;q=0"})[2] == raw
+
+    # 原文件更新后旧的预压缩文件不再使用
+    st = gz.stat()
+    os.utime(model, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+    status, headers, body = _get(base + "models/demo/demo.model.json", **{"Accept-Encoding": "gzip"})
+    assert headers["Content-Encoding"] is None and body == raw
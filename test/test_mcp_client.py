@@ -0,0 +1,116 @@
+"""MCP 客户端测试（不启动真实 MCP 服务器）"""
+
+import asyncio
+import threading
+import time
+
+
+class _FakeSess:
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self.order = []
+
+    async def call_tool(self, name, arguments=None):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        self.order.append((arguments or {}).get("caller"))
+        await asyncio.sleep(0.02)
+        self.active -= 1
+        return name
+
+
+def _loop_in_thread():
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    return loop
+
+
+def test_dispatcher_limit_and_fairness():
+    from mcp_client.client import _ServerDispatcher
+
+    loop = _loop_in_thread()
+    sess = _FakeSess()
+    disp = _ServerDispatcher("fake", loop, sess, max_in_flight=2)
+    futs = [disp.submit("t", {"caller": "api"}, caller="api") for _ in range(6)]
+    futs += [disp.submit("t", {"caller": "voice"}, caller="voice") for _ in range(2)]
+    assert all(f.result(timeout=5) == "t" for f in futs)
+    assert sess.peak == 2
+    # voice 不会排在 api 的全部积压之后
+    assert "voice" in sess.order[:6]
+    assert disp.stats()["in_flight"] == 0
+    loop.call_soon_threadsafe(loop.stop)
+
+
+def test_call_tool_cancelled_with_turn_frees_server_slot(monkeypatch):
+    from mcp_client.client import MCPToolSession, _ServerDispatcher
+    from voice import speech_queue
+
+    class _HangingSess:
+        def __init__(self):
+            self.started = threading.Event()
+            self.cancelled = threading.Event()
+
+        async def call_tool(self, name, arguments=None):
+            self.started.set()
+            try:
+                await asyncio.sleep(30)
+            except asyncio.CancelledError:
+                self.cancelled.set()
+                raise
+
+    monkeypatch.setattr(speech_queue, "_queue", speech_queue.SpeechQueue())
+    loop = _loop_in_thread()
+    sess = _HangingSess()
+    disp = _ServerDispatcher("fake", loop, sess, max_in_flight=1)
+    session = MCPToolSession()
+    session._tool_to_session = {"slow": 0}
+    session._server_holders = [{"dispatcher": disp, "loop": loop}]
+
+    async def _turn():
+        turn = speech_queue.current_turn()
+        call = asyncio.ensure_future(speech_queue.run_in_turn(session.call_tool("slow", {}, caller="voice"), turn))
+        await asyncio.get_running_loop().run_in_executor(None, sess.started.wait, 5)
+        speech_queue.begin_turn()  # 用户插话：上一轮作废
+        return await call
+
+    assert asyncio.run(_turn()) is None
+    assert sess.cancelled.wait(5)  # 服务器侧的调用也被取消
+    for _ in range(100):
+        if disp.stats()["in_flight"] == 0:
+            break
+        time.sleep(0.01)
+    assert disp.stats()["in_flight"] == 0
+    loop.call_soon_threadsafe(loop.stop)
+
+
+def test_tool_metrics_prometheus():
+    from mcp_client.metrics import ToolMetrics
+
+    m = ToolMetrics()
+    m.record("search", 0.3, 10, 200)
+    m.record("search", 200.0, 10, 50, timeout=True)
+    text = m.render_prometheus([{"name": "shell", "in_flight": 1, "queued": 2}])
+    assert 'zhyx_mcp_tool_calls_total{tool="search"} 2' in text
+    assert 'zhyx_mcp_tool_timeouts_total{tool="search"} 1' in text
+    assert 'zhyx_mcp_tool_duration_seconds_bucket{tool="search",le="0.5"} 1' in text
+    assert 'zhyx_mcp_tool_duration_seconds_bucket{tool="search",le="+Inf"} 2' in text
+    assert 'zhyx_mcp_server_queue_depth{server="shell"} 2' in text
+    snap = m.snapshot()
+    assert snap["tools"]["search"]["response_bytes"] == 250
+
+
+def test_image_block_goes_to_blob_store(tmp_path):
+    import base64
+    import json
+    import struct
+    from mcp_client.blobs import BlobStore, content_block_to_text
+
+    png = b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", 640, 480) + b"\0" * 20
+    block = {"type": "image", "data": base64.b64encode(png).decode(), "mimeType": "image/png"}
+    store = BlobStore(tmp_path)
+    ref = json.loads(content_block_to_text(block, store))
+    assert (ref["width"], ref["height"], ref["size"]) == (640, 480, len(png))
+    assert bytes(store.open(ref["sha256"])) == png
+    # 同一内容重复写入返回同一路径
+    assert json.loads(content_block_to_text(block, store))["path"] == ref["path"]
@@ -0,0 +1,68 @@
+"""skill_runner 执行池测试"""
+
+from skill_runner.pool import SkillRunnerPool
+
+
+def test_run_streams_output_and_exit_code(tmp_path):
+    script = tmp_path / "s.py"
+    script.write_text(
+        "import os, sys\n"
+        "print('args', sys.argv[1:], os.getcwd())\n"
+        "print('warn', file=sys.stderr)\n"
+        "if '--hang' in sys.argv:\n"
+        "    import time; time.sleep(30)\n"
+        "sys.exit(3)\n",
+        encoding="utf-8",
+    )
+    pool = SkillRunnerPool(workers=1, preload=[], timeout=5)
+    try:
+        events = list(pool.run(str(script), ["x"], cwd=str(tmp_path)))
+        assert events[-1] == ("exit", 3)
+        out = "".join(d for k, d in events if k == "stdout")
+        assert "['x']" in out and str(tmp_path) in out
+        assert "warn" in "".join(d for k, d in events if k == "stderr")
+
+        res = pool.run_collect(str(script), ["--hang"], timeout=1)
+        assert res["timed_out"] and res["exit_code"] == -9
+    finally:
+        pool.close()
+
+
+def test_timeout_kills_spawned_children(tmp_path):
+    import os
+    import time
+
+    pidfile = tmp_path / "child.pid"
+    script = tmp_path / "spawn.py"
+    script.write_text(
+        "import subprocess, sys, time\n"
+        "child = subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(60)'])\n"
+        f"open({str(pidfile)!r}, 'w').write(str(child.pid))\n"
+        "time.sleep(60)\n",
+        encoding="utf-8",
+    )
+    pool = SkillRunnerPool(workers=1, preload=[], timeout=5)
+    try:
+        assert pool.run_collect(str(script), timeout=1)["timed_out"]
+    finally:
+        pool.close()
+    pid = int(pidfile.read_text())
+    for _ in range(50):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            break
+        time.sleep(0.05)
+    else:
+        raise AssertionError("脚本派生的子进程在超时后仍存活")
+
+
+def test_api_refuses_scripts_when_disabled(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import skill_runner
+    from api.app import app
+
+    monkeypatch.setattr(skill_runner, "is_enabled", lambda: False)
+    r = TestClient(app).post("/skills/run", json={"script": "pdf/scripts/x.py"})
+    assert r.status_code == 403
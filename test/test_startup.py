@@ -0,0 +1,33 @@
+"""启动编排测试"""
+
+import threading
+import time
+
+from core.startup import StartupOrchestrator
+
+
+def test_components_run_in_parallel_and_report_readiness():
+    orch = StartupOrchestrator()
+    gate = threading.Event()
+    seen = []
+    orch.add_listener(lambda s: seen.append({n: c["state"] for n, c in s["components"].items()}))
+    orch.register("slow", lambda: gate.wait(5))
+    orch.register("fail", lambda: False)
+    orch.register("boom", lambda: 1 / 0)
+
+    t0 = time.perf_counter()
+    orch.start()
+    assert time.perf_counter() - t0 < 0.5  # 不阻塞调用方
+    assert orch.wait("fail", 1) and orch.wait("boom", 1)
+    assert not orch.is_ready("slow") and not orch.status()["ready"]
+
+    gate.set()
+    assert orch.wait("slow", 1)
+    st = orch.status()
+    assert st["ready"]
+    assert {n: c["state"] for n, c in st["components"].items()} == {
+        "slow": "ready", "fail": "failed", "boom": "failed",
+    }
+    assert st["components"]["boom"]["error"] == "division by zero"
+    assert seen[-1]["slow"] == "ready"
+    assert orch.wait("unregistered", 0)  # 未注册的组件视为就绪
@@ -0,0 +1,605 @@
+"""voice 模块测试（不依赖麦克风与 FunASR 模型）"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+
+from voice.stt_stream import StreamingRecognizer
+
+
+class _FakeStreamingModel:
+    """每次解码返回块序号，记录 is_final 与块长度"""
+
+    def __init__(self):
+        self.calls = []
+
+    def generate(self, input, cache, is_final, **kwargs):
+        self.calls.append((len(input), is_final))
+        return [{"text": str(len(self.calls))}]
+
+
+def test_streaming_recognizer_chunks_and_partials():
+    model = _FakeStreamingModel()
+    partials = []
+    rec = StreamingRecognizer(model, on_partial=partials.append, punctuate=False)
+    block = np.zeros((1600, 1), dtype=np.int16)  # 100ms
+    for _ in range(13):  # 1.3s → 两个 600ms 块 + 100ms 尾块
+        rec.feed(block)
+    text = rec.finish()
+    assert model.calls == [(9600, False), (9600, False), (1600, True)]
+    assert partials == ["1", "12"]
+    assert text == "123"
+
+    # 回调只拷贝原始样本，块边界跨越录音块时内容与顺序不变
+    seen = []
+    model.generate = lambda input, cache, is_final, **kw: seen.append(np.array(input)) or [{"text": ""}]
+    rec = StreamingRecognizer(model, punctuate=False)
+    ramp = np.arange(20000, dtype=np.int16)
+    for i in range(0, len(ramp), 1024):
+        rec.feed(ramp[i:i + 1024].reshape(-1, 1))
+    rec.finish()
+    assert [len(x) for x in seen] == [9600, 9600, 800]
+    assert np.allclose(np.concatenate(seen), ramp / 32768.0)
+
+
+def test_endpointer_trims_to_speech_with_preroll():
+    from voice.vad import Endpointer
+
+    fs = 16000
+    rng = np.random.default_rng(0)
+    noise = lambda s: (rng.normal(0, 30, int(s * fs))).astype(np.int16)  # noqa: E731
+    t = np.arange(int(1.0 * fs)) / fs
+    speech = (np.sin(2 * np.pi * 220 * t) * 8000).astype(np.int16)
+    audio = np.concatenate([noise(1.0), speech, noise(2.0)])
+
+    ep = Endpointer(fs, silence_ms=600, preroll_ms=300)
+    done_at = None
+    for i in range(0, len(audio), 480):
+        if ep.feed(audio[i:i + 480].reshape(-1, 1)):
+            done_at = i
+            break
+    assert done_at is not None and done_at < int(2.8 * fs)  # 说完约 0.6s 后即停，不等录满
+    rec = ep.audio()
+    assert 1.2 * fs < len(rec) < 1.6 * fs  # 1s 语音 + preroll + 保留的少量尾音
+
+
+def test_endpointer_times_out_on_silence():
+    from voice.vad import Endpointer
+
+    ep = Endpointer(16000, timeout_s=1.0)
+    silence = np.zeros(16000 * 2, dtype=np.int16)
+    assert ep.feed(silence)
+    assert ep.timed_out and ep.audio() is None
+
+
+def test_ring_buffer_zero_copy_and_overflow():
+    from voice.audio_buffer import AudioRingBuffer
+
+    ring = AudioRingBuffer(10)
+    ring.write(np.arange(4, dtype=np.int16).reshape(-1, 1))
+    ring.write(np.arange(4, 8, dtype=np.int16).reshape(-1, 1))
+    view = ring.view()
+    assert np.shares_memory(view, ring._data)
+    assert view.reshape(-1).tolist() == list(range(8)) and ring.overflow_samples == 0
+
+    ring.write(np.arange(8, 13, dtype=np.int16).reshape(-1, 1))  # 回绕，丢弃 0..2
+    assert ring.overflow_samples == 3 and len(ring) == 10
+    assert ring.view().reshape(-1).tolist() == list(range(3, 13))
+    assert all(np.shares_memory(v, ring._data) for v in ring.views())
+
+    ring.write(np.arange(100, 125, dtype=np.int16))  # 单块超过容量
+    assert ring.view().reshape(-1).tolist() == list(range(115, 125))
+    assert ring.overflow_samples == 3 + 10 + 15
+
+
+def test_stt_server_shared_memory_and_health(tmp_path, monkeypatch):
+    import threading
+
+    from voice import stt, stt_server
+
+    monkeypatch.setattr(stt, "_recognize_local", lambda audio, sr: f"{len(audio)}:{audio.max():.2f}")
+    monkeypatch.setattr(stt, "preload_local_model", lambda: True)
+    sock = tmp_path / "stt.sock"
+    srv = stt_server.STTServer(sock)
+    threading.Thread(target=lambda: (srv.load_model(), srv.worker()), daemon=True).start()
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    try:
+        pcm = np.full((1600, 1), 16384, dtype=np.int16)
+        assert stt_server.transcribe(pcm, path=sock) == "1600:0.50"
+        assert stt_server.transcribe(pcm.tobytes(), path=sock, use_shm=False) == "1600:0.50"
+        h = stt_server.health(sock)
+        assert h["model_ready"] and h["processed"] == 2
+        monkeypatch.setattr(stt_server, "get_socket_path", lambda: sock)
+        assert stt_server.ensure_server()
+
+        # 启用服务时 POST /stt 的批量识别整批交给服务进程，不在本进程加载模型
+        from voice import stt_batch
+
+        class _FakeModel:
+            def generate(self, input, batch_size_s):
+                return [{"key": Path(p).stem, "text": f"srv:{batch_size_s}"} for p in input]
+
+        monkeypatch.setattr(stt, "get_offline_model", _FakeModel)
+        monkeypatch.setattr(stt_server, "is_enabled", lambda: True)
+        _write_wav(tmp_path / "b0.wav", 1)
+        _write_wav(tmp_path / "b1.wav", 2)
+        batcher = stt_batch.STTBatcher(batch_size_s=120, wait_ms=200)
+
+        def _no_local_model():
+            raise AssertionError("API 进程不应加载模型")
+
+        monkeypatch.setattr(batcher, "_model", _no_local_model)
+        futs = [batcher.submit(tmp_path / "b0.wav"), batcher.submit(tmp_path / "b1.wav")]
+        assert [f.result(timeout=5) for f in futs] == [
+            {"text": "srv:120", "duration": 1.0}, {"text": "srv:120", "duration": 2.0}]
+        assert batcher.batches == 1 and stt_server.health(sock)["processed"] == 3
+    finally:
+        srv.shutdown()
+        srv.server_close()
+
+    # 刚拉起、尚未监听的服务不算就绪，也不会被重复启动
+    spawned = []
+
+    class _Proc:
+        def __init__(self, *a, **k):
+            spawned.append(a)
+
+        def poll(self):
+            return None
+
+    monkeypatch.setattr(stt_server, "get_socket_path", lambda: tmp_path / "missing.sock")
+    monkeypatch.setattr(stt_server, "_get_server_config", lambda: {"autostart": True})
+    monkeypatch.setattr(stt_server, "_spawned", None)
+    monkeypatch.setattr(stt_server.subprocess, "Popen", _Proc)
+    assert not stt_server.ensure_server()
+    assert not stt_server.ensure_server(wait=0.3)
+    assert len(spawned) == 1
+
+
+def _write_wav(path, seconds, fs=16000):
+    import wave
+
+    with wave.open(str(path), "wb") as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(fs)
+        w.writeframes(np.zeros(int(seconds * fs), dtype=np.int16).tobytes())
+
+
+def test_stt_endpoint_batches_uploads(tmp_path, monkeypatch):
+    from fastapi.testclient import TestClient
+
+    from api.app import app
+    from voice import stt_batch
+
+    calls = []
+
+    class _FakeModel:
+        def generate(self, input, batch_size_s):
+            calls.append(list(input))
+            return [{"key": Path(p).stem, "text": f"t{Path(p).suffix}"} for p in input]
+
+    batcher = stt_batch.STTBatcher(model_loader=_FakeModel, wait_ms=200)
+    monkeypatch.setattr(stt_batch, "get_stt_batcher", lambda: batcher)
+    monkeypatch.setattr(stt_batch, "UPLOAD_DIR", tmp_path / "uploads")
+    for i in range(3):
+        _write_wav(tmp_path / f"a{i}.wav", 1 + i)
+
+    client = TestClient(app)
+    files = [("files", (f"a{i}.wav", open(tmp_path / f"a{i}.wav", "rb"), "audio/wav")) for i in range(3)]
+    r = client.post("/stt", files=files, data={"lang": "zh"})  # 普通表单字段被忽略
+    assert r.status_code == 200
+    results = r.json()["results"]
+    assert [x["file"] for x in results] == ["a0.wav", "a1.wav", "a2.wav"]
+    assert [x["duration"] for x in results] == [1.0, 2.0, 3.0]
+    assert len(calls) == 1 and len(calls[0]) == 3  # 一次 generate 处理整批
+
+    r = client.post("/stt?format=ndjson", content=(tmp_path / "a0.wav").read_bytes(),
+                    headers={"content-type": "audio/wav"})
+    lines = [json.loads(x) for x in r.text.splitlines()]
+    assert len(lines) == 1 and lines[0]["text"] == "t.wav"
+    assert not any((tmp_path / "uploads").iterdir())  # 上传临时文件已清理
+
+
+def test_onnx_backend_generate_matches_automodel_shape(tmp_path, monkeypatch):
+    from voice.stt_onnx import OnnxParaformer
+
+    m = OnnxParaformer.__new__(OnnxParaformer)
+    m.asr = lambda segs: [{"preds": ("你 好", ["你", "好"])} for _ in segs]
+    m.vad = lambda audio: [[[0, 500], [1000, 1800]]]
+    m.punc = lambda text: (text + "。", [])
+    _write_wav(tmp_path / "clip.wav", 2)
+    res = m.generate(input=[str(tmp_path / "clip.wav")], batch_size_s=300)
+    assert res == [{"key": "clip", "text": "你好你好。"}]
+
+    # 数组输入按 fs 重采样到 16kHz；非 WAV 文件与 torch 版一样经 ffmpeg 解码
+    seen = []
+    m.vad = lambda audio: seen.append(len(audio)) or [[[0, 500]]]
+    m.generate(input=[np.zeros(16000, dtype=np.int16)], fs=8000)
+    assert seen == [32000]
+
+    from voice import stt_onnx
+
+    class _Done:
+        returncode, stdout, stderr = 0, np.zeros(24000, dtype=np.int16).tobytes(), b""
+
+    monkeypatch.setattr(stt_onnx.shutil, "which", lambda name: "/usr/bin/ffmpeg")
+    monkeypatch.setattr(stt_onnx.subprocess, "run", lambda cmd, **kw: _Done)
+    (tmp_path / "clip.m4a").write_bytes(b"not a wav")
+    assert m.generate(input=[str(tmp_path / "clip.m4a")])[0]["key"] == "clip" and seen[-1] == 24000
+
+
+def test_tts_cache_normalized_keys_and_lru_by_bytes(tmp_path):
+    from voice.tts_cache import TTSCache
+
+    cache = TTSCache(tmp_path / "cache", max_bytes=25)
+    voice, rate = "zh-CN-XiaoxiaoNeural", "+0%"
+    k1 = cache.key("抱歉，我没有理解你的问题。", voice, rate)
+    assert k1 == cache.key(" 抱歉,我没有理解你的问题。 ", voice, rate)  # NFKC + 空白
+    assert k1 != cache.key("抱歉，我没有理解你的问题。", voice, "+20%")
+
+    assert cache.get(k1) is None
+    p1 = cache.put_bytes(k1, b"x" * 10)
+    assert cache.get(k1) == p1
+    k2, k3 = cache.key("你好", voice, rate), cache.key("好的", voice, rate)
+    cache.put_bytes(k2, b"y" * 10)
+    cache.get(k1)  # k1 变为最近使用
+    cache.put_bytes(k3, b"z" * 10)  # 超出 25 字节，淘汰最久未用的 k2
+    assert cache.get(k2) is None and cache.get(k1) and cache.get(k3)
+    st = cache.stats()
+    assert st["entries"] == 2 and st["bytes"] == 20 and st["evictions"] == 1
+    assert st["hits"] == 4 and st["misses"] == 2
+
+    reopened = TTSCache(tmp_path / "cache", max_bytes=25)  # 重启后从目录恢复
+    assert reopened.get(k1) is not None and reopened.stats()["entries"] == 2
+
+
+def test_tts_cache_budget_shared_across_formats_and_counts_mouth(tmp_path, monkeypatch):
+    from voice import tts_cache
+
+    monkeypatch.setattr(tts_cache, "_caches", {})
+    monkeypatch.setattr(tts_cache, "DEFAULT_CACHE_DIR", tmp_path)
+    monkeypatch.setattr(tts_cache, "_get_cache_max_bytes", lambda: 25)
+    mp3, wav = tts_cache.get_tts_cache(".mp3"), tts_cache.get_tts_cache(".wav")
+    k1, k2 = mp3.key("你好", "edge:v", "+0%"), wav.key("你好", "piper:v", "+0%")
+    mp3.put_bytes(k1, b"x" * 10, mouth=b"m" * 5)
+    assert wav.stats()["bytes"] == 15  # 口型旁路文件计入，两种格式看到同一份预算
+    wav.put_bytes(k2, b"y" * 10, mouth=b"n" * 5)
+    assert mp3.get(k1) is None and not mp3.mouth_path(k1).exists()  # 合计超出 25 字节，淘汰另一格式的旧条目
+    assert wav.get(k2) is not None and wav.stats()["evictions"] == 1
+
+    reopened = tts_cache.TTSCache(tmp_path, 25, ".wav")  # 重启后按音频 + 旁路文件恢复字节数
+    assert reopened.stats()["bytes"] == 15 and reopened.stats()["entries"] == 1
+
+
+def test_speak_async_streams_segments_in_order(tmp_path, monkeypatch):
+    import asyncio
+    import sys
+    import types
+
+    from voice import tts, tts_cache
+    from voice.tts_stream import get_segment_store
+
+    class _Communicate:
+        def __init__(self, text, voice, rate=None):
+            self.text = text
+
+        async def stream(self):
+            delay = 0.05 if self.text.startswith("第二") else 0.15
+            for i in range(2):
+                await asyncio.sleep(delay)
+                yield {"type": "audio", "data": f"{self.text}{i}".encode()}
+
+    monkeypatch.setitem(sys.modules, "edge_tts", types.SimpleNamespace(Communicate=_Communicate))
+    monkeypatch.setattr(tts, "TTS_DIR", tmp_path / "tts")
+    monkeypatch.setattr(tts, "_is_stream_enabled", lambda: True)
+    monkeypatch.setattr(tts, "_split_for_tts", lambda raw: ["第一段", "第二段"])
+    monkeypatch.setattr(tts_cache, "_caches", {".mp3": tts_cache.TTSCache(tmp_path / "tts" / "cache", 1 << 20)})
+    pushed = []
+    monkeypatch.setattr(tts, "push_queue", lambda url, turn=None: pushed.append(url) or True)
+
+    asyncio.run(tts.speak_async("第一段。第二段。"))
+    assert len(pushed) == 2 and all(u.startswith("tts/") and "." not in u for u in pushed)
+    segs = [get_segment_store().get(u.rsplit("/", 1)[1]) for u in pushed]
+    assert [s.text for s in segs] == ["第一段", "第二段"]  # 第二段先合成完，仍按顺序入队
+    assert segs[0].data() == "第一段0第一段1".encode() and segs[0].done
+
+    pushed.clear()
+    asyncio.run(tts.speak_async("第一段。第二段。"))  # 完整合成后已写入缓存
+    assert all(u.startswith("tts/cache/") for u in pushed)
+
+
+def test_pluggable_engine_streams_wav_and_caches_per_engine(tmp_path, monkeypatch):
+    import asyncio
+    import wave
+
+    from voice import tts, tts_cache, tts_engines
+
+    class _LocalEngine(tts_engines.TTSEngine):
+        name, mime, suffix = "local", "audio/wav", ".wav"
+
+        def __init__(self, cfg):
+            self.calls = 0
+
+        async def stream(self, text, voice, rate):
+            self.calls += 1
+            yield tts_engines.wav_header(16000)
+            async for pcm in tts_engines._iter_in_thread(lambda: iter([b"\x01\x00" * 160] * 3)):
+                yield pcm
+
+        def finalize(self, data):
+            return tts_engines.wav_header(16000, len(data) - 44) + data[44:]
+
+        def audio_seconds(self, data):
+            return max(0, len(data) - 44) / 32000
+
+    class _Incomplete(tts_engines.TTSEngine):
+        async def stream(self, text, voice, rate):
+            yield b""
+
+    try:
+        tts_engines.register_engine("incomplete", _Incomplete)
+        raise AssertionError("缺少 audio_seconds 的引擎不应注册成功")
+    except TypeError as e:
+        assert "audio_seconds" in str(e)
+
+    monkeypatch.setattr(tts_engines, "_instances", {})
+    monkeypatch.setitem(tts_engines._ENGINES, "local", _LocalEngine)
+    monkeypatch.setattr(tts_engines, "get_engine_name", lambda: "local")
+    monkeypatch.setattr(tts, "TTS_DIR", tmp_path / "tts")
+    monkeypatch.setattr(tts, "_is_stream_enabled", lambda: False)
+    monkeypatch.setattr(tts_cache, "_caches", {})
+    monkeypatch.setattr(tts_cache, "DEFAULT_CACHE_DIR", tmp_path / "tts" / "cache")
+    pushed = []
+    monkeypatch.setattr(tts, "push_queue", lambda url, turn=None: pushed.append(url) or True)
+
+    asyncio.run(tts.speak_async("本地合成测试"))
+    asyncio.run(tts.speak_async("本地合成测试"))
+    engine = tts_engines.get_tts_engine()
+    assert engine.calls == 1 and pushed[0].startswith("tts/") and pushed[1].startswith("tts/cache/")
+    assert not list((tmp_path / "tts").glob("*.wav"))  # 首次合成只进内存，缓存在后台写入
+    with wave.open(str(tmp_path / pushed[1]), "rb") as w:  # 长度字段已按实际数据修正
+        assert w.getframerate() == 16000 and w.getnframes() == 480
+    assert tts_engines.rate_to_scale("+25%") == 0.8 and tts_engines.rate_to_scale("0%") == 1.0
+
+
+def test_segment_store_refcount_cap_and_http_route(monkeypatch):
+    import json
+    import threading
+    import time
+    import urllib.error
+    import urllib.request
+
+    from avatar import window
+    from voice import speech_queue, tts_stream
+
+    store = tts_stream.SegmentStore(max_bytes=10)
+    played = store.put(b"x" * 6)
+    played.mark_served()
+    pending = store.put(b"y" * 6)  # 超出上限：淘汰已下发的分段，未播放的保留
+    assert store.get(played.id) is None and store.get(pending.id) is pending
+    assert store.stats()["bytes"] == 6 and store.stats()["evictions"] == 1
+    reader = store.acquire(pending.id)
+    assert not store.release_url("http://127.0.0.1:1/" + pending.url) and reader.refs == 1
+    assert store.release(pending.id) and store.stats()["bytes"] == 0
+
+    monkeypatch.setattr(tts_stream, "_store", tts_stream.SegmentStore(1 << 20))
+    monkeypatch.setattr(speech_queue, "_queue", speech_queue.SpeechQueue())
+    monkeypatch.setattr(window, "_port", [0])
+    threading.Thread(target=window._start_server, daemon=True).start()
+    while not window._port[0]:
+        time.sleep(0.01)
+    base = f"http://127.0.0.1:{window._port[0]}/"
+    seg = tts_stream.get_segment_store().put(b"abcdef", "audio/mpeg")
+    speech_queue.get_speech_queue().push(seg.url)
+    req = urllib.request.Request(base + seg.url, headers={"Range": "bytes=2-3"})
+    with urllib.request.urlopen(req) as r:
+        assert r.status == 206 and r.read() == b"cd" and r.headers["Content-Type"] == "audio/mpeg"
+    with urllib.request.urlopen(base + seg.url) as r:
+        assert r.read() == b"abcdef" and r.headers["Accept-Ranges"] == "bytes"
+    done = urllib.request.Request(base + "api/playback-segment-done", method="POST",
+                                  data=json.dumps({"url": base + seg.url}).encode())
+    urllib.request.urlopen(done).close()
+    try:
+        urllib.request.urlopen(base + seg.url)
+        raise AssertionError("已释放的分段仍可访问")
+    except urllib.error.HTTPError as e:
+        assert e.code == 404
+
+
+def test_new_turn_cancels_previous_answer_and_drops_segments(tmp_path, monkeypatch):
+    import asyncio
+    import threading
+    import time
+
+    from voice import speech_queue, tts, tts_cache, tts_engines, tts_stream
+
+    class _SlowEngine(tts_engines.TTSEngine):
+        name = "slow"
+
+        def __init__(self, cfg):
+            self.cancelled = 0
+
+        async def stream(self, text, voice, rate):
+            try:
+                for i in range(50):
+                    yield f"{text}{i}".encode()
+                    await asyncio.sleep(0.02)
+            except asyncio.CancelledError:
+                self.cancelled += 1
+                raise
+
+        def audio_seconds(self, data):
+            return len(data) * 8 / 48000
+
+    monkeypatch.setattr(tts_engines, "_instances", {})
+    monkeypatch.setitem(tts_engines._ENGINES, "slow", _SlowEngine)
+    monkeypatch.setattr(tts_engines, "get_engine_name", lambda: "slow")
+    monkeypatch.setattr(tts, "_is_stream_enabled", lambda: True)
+    monkeypatch.setattr(tts_cache, "_caches", {".mp3": tts_cache.TTSCache(tmp_path / "cache", 0)})
+    monkeypatch.setattr(tts_stream, "_store", tts_stream.SegmentStore(1 << 20))
+    monkeypatch.setattr(speech_queue, "_queue", speech_queue.SpeechQueue())
+    queue = speech_queue.get_speech_queue()
+    result = {}
+
+    async def _answer():
+        await tts.speak_async("第一句回答")  # 首段入队后仍在继续写入剩余音频
+        await asyncio.sleep(5)  # 模拟仍在进行的 LLM / 工具调用
+        await tts.speak_async("不应再合成")
+        return "done"
+
+    turn = speech_queue.begin_turn()
+    worker = threading.Thread(target=lambda: result.update(r=asyncio.run(speech_queue.run_in_turn(_answer(), turn))))
+    worker.start()
+    deadline = time.monotonic() + 5
+    while not queue.has_pending():
+        assert time.monotonic() < deadline, "首段未入队"
+        time.sleep(0.01)
+    t0 = time.perf_counter()
+    new_turn = speech_queue.begin_turn()
+    worker.join(2)
+    assert not worker.is_alive() and time.perf_counter() - t0 < 1 and result["r"] is None
+    assert new_turn == turn + 1 and queue.poll() == (None, new_turn, False)
+    assert tts_stream.get_segment_store().stats()["segments"] == 0  # 旧分段已释放
+    assert tts_engines.get_tts_engine().cancelled == 1  # 合成被取消，未写完 50 块
+    assert not queue.push("tts/" + "0" * 32, turn)  # 作废轮次的入队被拒绝
+
+
+def test_background_tts_worker_overlaps_and_applies_backpressure(monkeypatch):
+    import asyncio
+    import time
+
+    from voice import speech_queue, tts, tts_worker
+
+    spoken = []
+
+    async def _slow_speak(text, voice=None, turn=None):
+        await asyncio.sleep(0.1)
+        spoken.append(text)
+
+    worker = tts_worker.TTSWorker(max_pending=2, speak=_slow_speak)
+    monkeypatch.setattr(tts_worker, "_worker", worker)
+    monkeypatch.setattr(tts_worker, "_is_background_enabled", lambda: True)
+    monkeypatch.setattr(speech_queue, "_queue", speech_queue.SpeechQueue(release=lambda url: None))
+    queue = speech_queue.get_speech_queue()
+
+    async def _agent():
+        t0 = time.perf_counter()
+        await tts_worker.speak_background("思考过程")
+        first = time.perf_counter() - t0  # 不等合成即返回，可立即发起下一轮 LLM
+        for i in range(4):
+            await tts_worker.speak_background(f"第{i}句")
+        tts.mark_agent_round_done()
+        return first, time.perf_counter() - t0, queue.is_round_done()
+
+    first, total, done_early = asyncio.run(speech_queue.run_in_turn(_agent(), speech_queue.begin_turn()))
+    assert first < 0.05 and 0.2 < total < 0.45 and not done_early  # 积压超过 2 条时才等待
+    asyncio.run(worker.drain())
+    assert spoken == ["思考过程", "第0句", "第1句", "第2句", "第3句"] and queue.is_round_done()
+
+    stale = speech_queue.get_speech_queue().turn
+    worker.submit("占位")  # 占住后台，下一条仍在排队时用户插话
+    worker.submit("旧一轮", turn=stale)
+    speech_queue.begin_turn()
+    asyncio.run(worker.drain())
+    assert "旧一轮" not in spoken and worker.stats()["skipped_stale"] == 1
+
+
+def test_lipsync_envelope_from_pcm_boundaries_and_cache_sidecar(tmp_path, monkeypatch):
+    from voice import lipsync, tts_cache, tts_engines, tts_stream
+
+    sr = 16000
+    t = np.arange(sr) / sr
+    tone = (np.sin(2 * np.pi * 220 * t) * 12000).astype(np.int16)
+    pcm = np.concatenate([np.zeros(sr // 2, dtype=np.int16), tone])  # 0.5s 静音 + 1s 声音
+    env = lipsync.envelope_from_pcm(pcm, sr)
+    assert len(env) == 75 and env[:20].max() < 0.05 and env[30:70].min() > 0.9
+
+    wav = tts_engines.wav_header(sr, len(pcm) * 2) + pcm.tobytes()
+    engine = type("E", (), {"mime": "audio/wav"})()
+    mouth = lipsync.envelope_for(engine, wav)
+    assert mouth is not None and len(mouth) == 75
+    assert np.allclose(lipsync.decode(lipsync.encode(mouth)), np.frombuffer(mouth, np.uint8) / 255.0)
+
+    # MP3 无需解码：“你好”两个字各开合一次，0.2s 附近为两字之间
+    env = lipsync.envelope_from_boundaries([(0.0, 0.4, "你好"), (0.6, 0.2, "A")], total_s=1.0)
+    assert len(env) == 50 and env[4] > 0.8 and env[9] < 0.2 and env[14] > 0.8 and env[25] == 0
+
+    monkeypatch.setattr(tts_stream, "_store", tts_stream.SegmentStore(1 << 20))
+    seg = tts_stream.get_segment_store().put(b"abc", "audio/mpeg", mouth=b"\x00\xff")
+    assert lipsync.mouth_for_url(seg.url) == {"fps": 50, "data": "AP8="}
+    growing = tts_stream.get_segment_store().create("合成中")
+    assert lipsync.mouth_for_url(growing.url) == {"url": f"{growing.url}/mouth"}
+
+    monkeypatch.setattr(tts_cache, "DEFAULT_CACHE_DIR", tmp_path)
+    cache = tts_cache.TTSCache(tmp_path, 1 << 20, ".mp3")
+    key = cache.key("你好", "edge:v", "+0%")
+    cache.put_bytes(key, b"mp3", mouth=b"\x10\x20")
+    assert lipsync.mouth_for_url(f"tts/cache/{key}.mp3") == lipsync.encode(b"\x10\x20")
+
+
+def test_events_endpoint_pushes_segments_and_round_done(monkeypatch):
+    import json
+    import threading
+    import time
+    import urllib.request
+
+    from avatar import window
+    from core import events
+    from voice import speech_queue, tts_stream
+
+    monkeypatch.setattr(events, "_bus", events.EventBus())
+    monkeypatch.setattr(tts_stream, "_store", tts_stream.SegmentStore(1 << 20))
+    monkeypatch.setattr(speech_queue, "_queue", speech_queue.SpeechQueue())
+    monkeypatch.setattr(window, "_port", [0])
+    threading.Thread(target=window._start_server, daemon=True).start()
+    while not window._port[0]:
+        time.sleep(0.01)
+    queue = speech_queue.get_speech_queue()
+    early = tts_stream.get_segment_store().put(b"a", mouth=b"\x80")
+    queue.push(early.url)  # 连接前已入队的分段在建立连接时推送
+
+    def read_event(resp):
+        name = data = None
+        while True:
+            line = resp.readline().decode("utf-8").rstrip("\n")
+            if line.startswith("event: "):
+                name = line[7:]
+            elif line.startswith("data: "):
+                data = json.loads(line[6:])
+            elif not line and name:
+                return name, data
+
+    with urllib.request.urlopen(f"http://127.0.0.1:{window._port[0]}/api/events", timeout=5) as r:
+        assert r.headers["Content-Type"].startswith("text/event-stream")
+        assert read_event(r)[0] == "status"
+        name, data = read_event(r)
+        assert name == "speak" and data["url"] == early.url and data["mouth"]["data"] == "gA=="
+        assert read_event(r) == ("round", {"turn": 0, "agent_done": False})
+        late = tts_stream.get_segment_store().put(b"b")
+        queue.push(late.url)
+        queue.mark_round_done()
+        assert read_event(r) == ("speak", {"url": late.url, "turn": 0})
+        assert read_event(r) == ("round", {"turn": 0, "agent_done": True})
+        assert not queue.has_pending()  # 推送连接取走的分段不会再被轮询取到
+        turn = queue.begin_turn()
+        assert read_event(r) == ("round", {"turn": turn, "agent_done": False})
+
+        # 多个连接：分段只取出一次，广播给每个连接
+        with urllib.request.urlopen(f"http://127.0.0.1:{window._port[0]}/api/events", timeout=5) as r2:
+            assert read_event(r2)[0] == "status"
+            assert read_event(r2) == ("round", {"turn": turn, "agent_done": False})
+            seg = tts_stream.get_segment_store().put(b"c")
+            queue.push(seg.url, turn)
+            assert read_event(r) == ("speak", {"url": seg.url, "turn": turn})
+            assert read_event(r2) == ("speak", {"url": seg.url, "turn": turn})
+
+    # 未送达前端的分段按原顺序放回队首；已作废轮次的分段不放回
+    a, b = tts_stream.get_segment_store().put(b"d"), tts_stream.get_segment_store().put(b"e")
+    queue.push(a.url)
+    queue.push(b.url)
+    assert queue.poll()[0] == a.url and queue.poll()[0] == b.url
+    assert queue.requeue([a.url, b.url], turn - 1) == 0
+    assert queue.requeue([a.url, b.url], turn) == 2
+    assert queue.poll()[0] == a.url and queue.poll()[0] == b.url